@@ -133,6 +133,9 @@ ALLOWED_HOSTS = [
 LOG_DIR = ENV_TOKENS['LOG_DIR']
 
 CACHES = ENV_TOKENS['CACHES']
+COURSE_STRUCTURE_LOCAL_CACHE_BYTES = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_LOCAL_CACHE_BYTES', COURSE_STRUCTURE_LOCAL_CACHE_BYTES
+)
 # Cache used for location mapping -- called many times with the same key/value
 # in a given request.
 if 'loc_cache' not in CACHES:
@@ -396,6 +396,10 @@ MODULESTORE = {
     }
 }
 
+# Byte budget of the process-local cache of serialized course structures
+# that sits in front of the 'course_structure_cache'. 0 disables it.
+COURSE_STRUCTURE_LOCAL_CACHE_BYTES = 64 * 1024 * 1024
+
 ############################ DJANGO_BUILTINS ################################
 # Change DEBUG in your environment settings files, not here
 DEBUG = False
@@ -173,6 +173,9 @@ CACHES = {
     },
 }
 
+# Don't keep course structures between tests
+COURSE_STRUCTURE_LOCAL_CACHE_BYTES = 0
+
 # hide ratelimit warnings while running tests
 filterwarnings('ignore', message='No request passed to the backend, unable to rate-limit')
 
@@ -1,5 +1,8 @@
 import logging
+import os
 import re
+import threading
+from collections import OrderedDict
 
 from django.contrib.staticfiles.storage import staticfiles_storage
 from django.contrib.staticfiles import finders
@@ -13,21 +16,104 @@ from opaque_keys.edx.locator import AssetLocator
 
 log = logging.getLogger(__name__)
 
+# The maximum number of rewritten static urls to keep in the process-level cache
+STATIC_URL_CACHE_SIZE = 10000
+
+_URL_REPLACE_REGEXES = {}
+
 
 def _url_replace_regex(prefix):
     """
-    Match static urls in quotes that don't end in '?raw'.
+    Match static urls in quotes that don't end in '?raw'. The pattern is
+    compiled once per prefix.
 
     To anyone contemplating making this more complicated:
     http://xkcd.com/1171/
     """
-    return ur"""
-        (?x)                      # flags=re.VERBOSE
-        (?P<quote>\\?['"])        # the opening quotes
-        (?P<prefix>{prefix})      # the prefix
-        (?P<rest>.*?)             # everything else in the url
-        (?P=quote)                # the first matching closing quote
-        """.format(prefix=prefix)
+    regex = _URL_REPLACE_REGEXES.get(prefix)
+    if regex is None:
+        regex = _URL_REPLACE_REGEXES[prefix] = re.compile(ur"""
+            (?x)                      # flags=re.VERBOSE
+            (?P<quote>\\?['"])        # the opening quotes
+            (?P<prefix>{prefix})      # the prefix
+            (?P<rest>.*?)             # everything else in the url
+            (?P=quote)                # the first matching closing quote
+            """.format(prefix=prefix))
+    return regex
+
+
+class StaticUrlCache(object):
+    """
+    A bounded, least recently used cache of the urls that static urls have been
+    rewritten to. The cached urls depend on the files collected into
+    staticfiles_storage, so the cache is cleared whenever the storage is
+    replaced or reconfigured, or collectstatic writes a new manifest.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._urls = OrderedDict()
+        self._storage_version = None
+        self._lock = threading.Lock()
+
+    def validate(self):
+        """
+        Clears the cache if staticfiles_storage has changed since it was filled.
+        """
+        storage_version = _staticfiles_storage_version()
+        with self._lock:
+            if self._storage_version != storage_version:
+                self._urls.clear()
+                self._storage_version = storage_version
+
+    def get(self, key):
+        """
+        Returns the cached url for key, or None.
+        """
+        with self._lock:
+            url = self._urls.pop(key, None)
+            if url is not None:
+                self._urls[key] = url
+            return url
+
+    def set(self, key, url):
+        """
+        Caches url for key, evicting the least recently used url if the cache is full.
+        """
+        with self._lock:
+            self._urls.pop(key, None)
+            if len(self._urls) >= self.max_size:
+                self._urls.popitem(last=False)
+            self._urls[key] = url
+
+    def clear(self):
+        """
+        Removes all cached urls.
+        """
+        with self._lock:
+            self._urls.clear()
+            self._storage_version = None
+
+
+_STATIC_URL_CACHE = StaticUrlCache(STATIC_URL_CACHE_SIZE)
+
+
+def _staticfiles_storage_version():
+    """
+    Returns a value which changes whenever the urls generated by staticfiles_storage
+    may have changed. Django resets the storage behind staticfiles_storage when the
+    static files settings change, and storages with a collectstatic manifest change
+    their urls when the manifest is rewritten. The storages themselves are part of
+    the value, so that their ids cannot be reused while it is cached.
+    """
+    storage = getattr(staticfiles_storage, '_wrapped', staticfiles_storage)
+    manifest_mtime = None
+    manifest_name = getattr(storage, 'manifest_name', None)
+    if manifest_name:
+        try:
+            manifest_mtime = os.path.getmtime(storage.path(manifest_name))
+        except (OSError, NotImplementedError):
+            pass
+    return (staticfiles_storage, storage, manifest_mtime)
 
 
 def try_staticfiles_lookup(path):
@@ -150,21 +236,26 @@ def replace_static_urls(text, data_directory=None, course_id=None, static_asset_
     static_asset_path: Path for static assets, which overrides data_directory and course_namespace, if nonempty
     """
 
-    def replace_static_url(original, prefix, quote, rest):
+    modulestore_types = {}
+
+    def get_modulestore_type():
         """
-        Replace a single matched url.
+        Return the type of the modulestore of the course, looking it up at most once for the whole text.
         """
-        # Don't mess with things that end in '?raw'
-        if rest.endswith('?raw'):
-            return original
+        if not static_asset_path and course_id:
+            if course_id not in modulestore_types:
+                modulestore_types[course_id] = modulestore().get_modulestore_type(course_id)
+            return modulestore_types[course_id]
+        return None
+
+    def resolve_static_url(prefix, rest, modulestore_type):
+        """
+        Return the url that a matched url resolves to, and whether that url can be cached.
+        """
+        cacheable = True
 
-        # In debug mode, if we can find the url as is,
-        if settings.DEBUG and finders.find(rest, True):
-            return original
         # if we're running with a MongoBacked store course_namespace is not None, then use studio style urls
-        elif (not static_asset_path) \
-                and course_id \
-                and modulestore().get_modulestore_type(course_id) != ModuleStoreEnum.Type.xml:
+        if modulestore_type is not None and modulestore_type != ModuleStoreEnum.Type.xml:
             # first look in the static file pipeline and see if we are trying to reference
             # a piece of static content which is in the edx-platform repo (e.g. JS associated with an xmodule)
 
@@ -174,6 +265,7 @@ def replace_static_urls(text, data_directory=None, course_id=None, static_asset_
             except Exception as err:
                 log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
                     rest, str(err)))
+                cacheable = False
 
             if exists_in_staticfiles_storage:
                 url = staticfiles_storage.url(rest)
@@ -199,7 +291,36 @@ def replace_static_urls(text, data_directory=None, course_id=None, static_asset_
                 log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
                     rest, str(err)))
                 url = "".join([prefix, course_path])
+                cacheable = False
+
+        return url, cacheable
+
+    def replace_static_url(original, prefix, quote, rest):
+        """
+        Replace a single matched url.
+        """
+        # Don't mess with things that end in '?raw'
+        if rest.endswith('?raw'):
+            return original
+
+        # In debug mode, if we can find the url as is,
+        if settings.DEBUG:
+            if finders.find(rest, True):
+                return original
+            url, __ = resolve_static_url(prefix, rest, get_modulestore_type())
+        # Otherwise, static files only change with the storage, so reuse the url this path resolved to before
+        else:
+            modulestore_type = get_modulestore_type()
+            cache_key = (course_id, static_asset_path, data_directory, modulestore_type, prefix, rest)
+            url = _STATIC_URL_CACHE.get(cache_key)
+            if url is None:
+                url, cacheable = resolve_static_url(prefix, rest, modulestore_type)
+                if cacheable:
+                    _STATIC_URL_CACHE.set(cache_key, url)
 
         return "".join([quote, url, quote])
 
+    if not settings.DEBUG:
+        _STATIC_URL_CACHE.validate()
+
     return process_static_urls(text, replace_static_url, data_dir=static_asset_path or data_directory)
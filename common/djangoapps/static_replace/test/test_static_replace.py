@@ -83,6 +83,36 @@ def test_storage_url_not_exists(mock_storage):
     mock_storage.url.assert_called_once_with('data_dir/file.png')
 
 
+@patch('static_replace.staticfiles_storage', autospec=True)
+def test_storage_url_cached(mock_storage):
+    mock_storage.exists.return_value = True
+    mock_storage.url.return_value = '/static/file.png'
+
+    for __ in range(2):
+        assert_equals('"/static/file.png"', replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY))
+    mock_storage.exists.assert_called_once_with('file.png')
+    mock_storage.url.assert_called_once_with('file.png')
+
+
+@patch('static_replace.staticfiles_storage', autospec=True)
+def test_storage_error_not_cached(mock_storage):
+    mock_storage.exists.side_effect = Exception
+
+    for __ in range(2):
+        assert_equals('"/static/data_dir/file.png"', replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY))
+    assert_equals(mock_storage.exists.call_count, 2)
+
+
+@patch('static_replace.StaticContent', autospec=True)
+@patch('static_replace.modulestore', autospec=True)
+def test_modulestore_type_looked_up_once(mock_modulestore, mock_static_content):
+    mock_modulestore.return_value = Mock(MongoModuleStore)
+    mock_static_content.convert_legacy_static_url_with_course_id.return_value = "c4x://mock_url"
+
+    replace_static_urls('"/static/file1.png" "/static/file2.png"', DATA_DIRECTORY, course_id=COURSE_KEY)
+    mock_modulestore.return_value.get_modulestore_type.assert_called_once_with(COURSE_KEY)
+
+
 @patch('static_replace.StaticContent', autospec=True)
 @patch('static_replace.modulestore', autospec=True)
 def test_mongo_filestore(mock_modulestore, mock_static_content):
@@ -153,6 +183,7 @@ def test_regex():
           )
 
     regex = _url_replace_regex('/static/')
+    assert_true(_url_replace_regex('/static/') is regex)
 
     for s in yes:
         print 'Should match: {0!r}'.format(s)
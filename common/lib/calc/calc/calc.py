@@ -2,11 +2,17 @@
 Parser and evaluator for FormulaResponse and NumericalResponse
 
 Uses pyparsing to parse. Main function as of now is evaluator().
+
+Parsing is much slower than evaluating, so expressions which are evaluated
+repeatedly (e.g. for each of the samples of a FormulaResponse) should be
+compiled once with compile_expression(), which also caches them.
 """
 
 import math
 import operator
 import numbers
+import threading
+from collections import OrderedDict
 import numpy
 import scipy.constants
 import functions
@@ -61,6 +67,9 @@ DEFAULT_VARIABLES = {
     'q': scipy.constants.e  # Fund. Charge: 1.602176565e-19 (Coulombs)
 }
 
+# Maximum number of compiled expressions kept by compile_expression.
+COMPILED_EXPRESSION_CACHE_SIZE = 1024
+
 # We eliminated the following extreme suffixes:
 #   P (1e15), E (1e18), Z (1e21), Y (1e24),
 #   f (1e-15), a (1e-18), z (1e-21), y (1e-24)
@@ -93,7 +102,17 @@ def lower_dict(input_dict):
 
 # The following few functions define evaluation actions, which are run on lists
 # of results from each parse component. They convert the strings and (previously
-# calculated) numbers into the number that component represents.
+# calculated) numbers into the number that component represents. Besides numbers,
+# they accept NumPy arrays holding one number per sample (see
+# CompiledExpression.evaluate_samples).
+
+def is_value(token):
+    """
+    Return whether the token is a (previously calculated) number or array of
+    numbers, rather than a string.
+    """
+    return isinstance(token, (numbers.Number, numpy.ndarray))
+
 
 def super_float(text):
     """
@@ -122,7 +141,7 @@ def eval_atom(parse_result):
     In the case of parenthesis, ignore them.
     """
     # Find first number in the list
-    result = next(k for k in parse_result if isinstance(k, numbers.Number))
+    result = next(k for k in parse_result if is_value(k))
     return result
 
 
@@ -136,7 +155,7 @@ def eval_power(parse_result):
     # `reduce` will go from left to right; reverse the list.
     parse_result = reversed(
         [k for k in parse_result
-         if isinstance(k, numbers.Number)]  # Ignore the '^' marks.
+         if is_value(k)]  # Ignore the '^' marks.
     )
     # Having reversed it, raise `b` to the power of `a`.
     power = reduce(lambda a, b: b ** a, parse_result)
@@ -155,10 +174,15 @@ def eval_parallel(parse_result):
     """
     if len(parse_result) == 1:
         return parse_result[0]
+    values = [e for e in parse_result if is_value(e)]
+    if any(isinstance(e, numpy.ndarray) for e in values):
+        has_zero = reduce(numpy.logical_or, [e == 0 for e in values])
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            result = 1. / sum(1. / e for e in values)
+        return numpy.where(has_zero, float('nan'), result)
     if 0 in parse_result:
         return float('nan')
-    reciprocals = [1. / e for e in parse_result
-                   if isinstance(e, numbers.Number)]
+    reciprocals = [1. / e for e in values]
     return 1. / sum(reciprocals)
 
 
@@ -173,12 +197,12 @@ def eval_sum(parse_result):
     total = 0.0
     current_op = operator.add
     for token in parse_result:
-        if token == '+':
+        if is_value(token):
+            total = current_op(total, token)
+        elif token == '+':
             current_op = operator.add
         elif token == '-':
             current_op = operator.sub
-        else:
-            total = current_op(total, token)
     return total
 
 
@@ -191,12 +215,12 @@ def eval_product(parse_result):
     prod = 1.0
     current_op = operator.mul
     for token in parse_result:
-        if token == '*':
+        if is_value(token):
+            prod = current_op(prod, token)
+        elif token == '*':
             current_op = operator.mul
         elif token == '/':
             current_op = operator.truediv
-        else:
-            prod = current_op(prod, token)
     return prod
 
 
@@ -224,38 +248,185 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
      python numbers.
     -Unary functions are passed as a dictionary from string to function.
     """
-    # No need to go further.
-    if math_expr.strip() == "":
-        return float('nan')
+    return compile_expression(math_expr, case_sensitive).evaluate(variables, functions)
 
-    # Parse the tree.
-    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
-    math_interpreter.parse_algebra()
 
-    # Get our variables together.
-    all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
+_COMPILED_EXPRESSIONS = OrderedDict()
+_COMPILED_EXPRESSIONS_LOCK = threading.Lock()
 
-    # ...and check them
-    math_interpreter.check_variables(all_variables, all_functions)
 
-    # Create a recursion to evaluate the tree.
-    if case_sensitive:
-        casify = lambda x: x
-    else:
-        casify = lambda x: x.lower()  # Lowercase for case insens.
-
-    evaluate_actions = {
-        'number': eval_number,
-        'variable': lambda x: all_variables[casify(x[0])],
-        'function': lambda x: all_functions[casify(x[0])](x[1]),
-        'atom': eval_atom,
-        'power': eval_power,
-        'parallel': eval_parallel,
-        'product': eval_product,
-        'sum': eval_sum
-    }
-
-    return math_interpreter.reduce_tree(evaluate_actions)
+def compile_expression(math_expr, case_sensitive=False):
+    """
+    Return a CompiledExpression for the given string of math.
+
+    The COMPILED_EXPRESSION_CACHE_SIZE most recently used compiled
+    expressions are cached, keyed by `math_expr` and `case_sensitive`.
+    Raises a pyparsing ParseException if `math_expr` can't be parsed.
+    """
+    key = (math_expr, case_sensitive)
+    with _COMPILED_EXPRESSIONS_LOCK:
+        compiled = _COMPILED_EXPRESSIONS.pop(key, None)
+        if compiled is not None:
+            # Move it to the most recently used end.
+            _COMPILED_EXPRESSIONS[key] = compiled
+            return compiled
+
+    compiled = CompiledExpression(math_expr, case_sensitive)
+    with _COMPILED_EXPRESSIONS_LOCK:
+        _COMPILED_EXPRESSIONS[key] = compiled
+        while len(_COMPILED_EXPRESSIONS) > COMPILED_EXPRESSION_CACHE_SIZE:
+            _COMPILED_EXPRESSIONS.popitem(last=False)
+    return compiled
+
+
+class CompiledExpression(object):
+    """
+    A math expression which is parsed once, and can then be evaluated any
+    number of times with different variables and functions.
+
+    Instances are immutable, so they may be shared between threads.
+    """
+    def __init__(self, math_expr, case_sensitive=False):
+        """
+        Parse `math_expr` and compile its tree into nested Python functions.
+        """
+        self.math_expr = math_expr
+        self.case_sensitive = case_sensitive
+
+        # No need to go further.
+        if math_expr.strip() == "":
+            self.math_interpreter = None
+            self._evaluate_tree = None
+            return
+
+        self.math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+        self.math_interpreter.parse_algebra()
+        self._evaluate_tree = self._compile_node(self.math_interpreter.tree)
+
+    def _casify(self, name):
+        """
+        Return the name as it is looked up in the variables or functions.
+        """
+        return name if self.case_sensitive else name.lower()
+
+    def _compile_node(self, node):
+        """
+        Return a function of the variables and functions dictionaries which
+        computes the value of the node, as `ParseAugmenter.reduce_tree` does
+        with the evaluation actions above.
+        """
+        if not isinstance(node, ParseResults):
+            # Then it is a terminal node, which evaluates to itself.
+            return lambda all_variables, all_functions: node
+
+        node_name = node.getName()
+        if node_name == 'number':
+            # Numbers don't depend on anything, so compute them right away.
+            number = eval_number(list(node))
+            return lambda all_variables, all_functions: number
+        if node_name == 'variable':
+            variable_name = self._casify(node[0])
+            return lambda all_variables, all_functions: all_variables[variable_name]
+        if node_name == 'function':
+            function_name = self._casify(node[0])
+            evaluate_argument = self._compile_node(node[1])
+            return lambda all_variables, all_functions: all_functions[function_name](
+                evaluate_argument(all_variables, all_functions)
+            )
+
+        if node_name not in COMPILED_ACTIONS:  # pragma: no cover
+            raise Exception(u"Unknown branch name '{}'".format(node_name))
+        action = COMPILED_ACTIONS[node_name]
+        evaluate_kids = [self._compile_node(kid) for kid in node]
+        return lambda all_variables, all_functions: action(
+            [evaluate_kid(all_variables, all_functions) for evaluate_kid in evaluate_kids]
+        )
+
+    def evaluate(self, variables, functions):
+        """
+        Evaluate the expression; like `evaluator`, but without parsing it again.
+        """
+        if self._evaluate_tree is None:
+            return float('nan')
+
+        # Get our variables together...
+        all_variables, all_functions = add_defaults(variables, functions, self.case_sensitive)
+        # ...and check them
+        self.math_interpreter.check_variables(all_variables, all_functions)
+
+        return self._evaluate_tree(all_variables, all_functions)
+
+    def evaluate_samples(self, variables_list, functions):
+        """
+        Evaluate the expression for each of the dictionaries of variables in
+        `variables_list`, and return the list of results.
+
+        When possible, the expression is evaluated only once, with NumPy arrays
+        holding the values of each variable in all samples. Samples whose
+        result is not finite, and all samples if the functions used don't
+        support arrays, are evaluated one by one instead, so that the results
+        and errors are the same as those of `evaluate`.
+        """
+        if self._evaluate_tree is None:
+            return [float('nan')] * len(variables_list)
+
+        results = self._evaluate_vectorized(variables_list, functions)
+        if results is None:
+            return [self.evaluate(variables, functions) for variables in variables_list]
+
+        return [
+            result if numpy.isfinite(result) else self.evaluate(variables, functions)
+            for result, variables in zip(results, variables_list)
+        ]
+
+    def _evaluate_vectorized(self, variables_list, functions):
+        """
+        Evaluate the expression once for all samples, returning the list of
+        results, or None if that isn't possible.
+        """
+        if not variables_list:
+            return []
+
+        variable_names = set(variables_list[0])
+        if any(set(variables) != variable_names for variables in variables_list):
+            return None
+
+        arrays = {}
+        for name in variable_names:
+            array = numpy.array([variables[name] for variables in variables_list])
+            if array.dtype.kind in 'biu':
+                # Avoid integer overflow and integer powers.
+                array = array.astype(float)
+            elif array.dtype.kind not in 'fc':
+                return None
+            arrays[name] = array
+
+        all_variables, all_functions = add_defaults(arrays, functions, self.case_sensitive)
+        self.math_interpreter.check_variables(all_variables, all_functions)
+
+        try:
+            with numpy.errstate(all='ignore'):
+                results = numpy.asarray(self._evaluate_tree(all_variables, all_functions))
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+        if results.shape == ():
+            # The expression doesn't depend on the samples.
+            results = results.repeat(len(variables_list))
+        if results.shape != (len(variables_list),) or results.dtype.kind not in 'fc':
+            return None
+        return results.tolist()
+
+
+# The evaluation actions of the nodes which CompiledExpression doesn't compile
+# specially.
+COMPILED_ACTIONS = {
+    'atom': eval_atom,
+    'power': eval_power,
+    'parallel': eval_parallel,
+    'product': eval_product,
+    'sum': eval_sum
+}
 
 
 class ParseAugmenter(object):
@@ -5,6 +5,7 @@ Unit tests for calc.py
 import unittest
 import numpy
 import calc
+from mock import patch
 from pyparsing import ParseException
 
 # numpy's default behavior when it evaluates a function outside its domain
@@ -559,3 +560,75 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+
+class CompiledExpressionTest(unittest.TestCase):
+    """
+    Run tests for calc.compile_expression and CompiledExpression
+    """
+
+    def test_cache(self):
+        """
+        Compiled expressions should be reused for the same expression and case sensitivity
+        """
+        compiled = calc.compile_expression('x^2 + 1')
+        self.assertIs(calc.compile_expression('x^2 + 1'), compiled)
+        self.assertIsNot(calc.compile_expression('x^2 + 1', case_sensitive=True), compiled)
+        self.assertEqual(compiled.evaluate({'x': 3.0}, {}), 10.0)
+        self.assertEqual(compiled.evaluate({'x': 2.0}, {}), 5.0)
+
+    def test_cache_size(self):
+        """
+        The least recently used compiled expressions should be evicted
+        """
+        with patch('calc.calc.COMPILED_EXPRESSION_CACHE_SIZE', 2):
+            first = calc.compile_expression('1+1')
+            second = calc.compile_expression('2+2')
+            self.assertIs(calc.compile_expression('1+1'), first)
+            calc.compile_expression('3+3')
+            self.assertIs(calc.compile_expression('1+1'), first)
+            self.assertIsNot(calc.compile_expression('2+2'), second)
+
+    def test_evaluate_samples(self):
+        """
+        Evaluating samples at once should give the same results as one by one
+        """
+        samples = [{'x': 0.5, 'y': 2.0}, {'x': -1.0, 'y': 3.0}, {'x': 4.0, 'y': 0.0}]
+        expressions = [
+            'x^2 + y/2', '-x*y', 'sin(x) + cos(y)', 'x || y', 'sqrt(x)', 'y^x', '3k*x', 'x*i + y',
+            'arccot(x)', 'fact(y)',
+        ]
+        for expression in expressions:
+            results = calc.compile_expression(expression).evaluate_samples(samples, {})
+            self.assertEqual(len(results), len(samples))
+            for result, sample in zip(results, samples):
+                expected = calc.evaluator(sample, {}, expression)
+                if numpy.isnan(expected):
+                    self.assertTrue(numpy.isnan(result), expression)
+                else:
+                    self.assertAlmostEqual(result, expected, msg=expression)
+
+    def test_evaluate_samples_errors(self):
+        """
+        Errors in any sample should be raised as by evaluator
+        """
+        samples = [{'x': 1.0}, {'x': 0.0}]
+        with self.assertRaises(ZeroDivisionError):
+            calc.compile_expression('1/x').evaluate_samples(samples, {})
+        with self.assertRaises(ValueError):
+            calc.compile_expression('(x-1)^0.5').evaluate_samples(samples, {})
+
+    def test_evaluate_samples_without_variables(self):
+        """
+        Expressions which don't use the sample variables should give one result per sample
+        """
+        self.assertEqual(calc.compile_expression('2*3').evaluate_samples([{'x': 1.0}, {'x': 2.0}], {}), [6.0, 6.0])
+        results = calc.compile_expression('').evaluate_samples([{'x': 1.0}, {'x': 2.0}], {})
+        self.assertTrue(all(numpy.isnan(result) for result in results))
+
+    def test_evaluate_samples_undefined_variable(self):
+        """
+        Undefined variables should be reported as by evaluator
+        """
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'z'):
+            calc.compile_expression('x+z').evaluate_samples([{'x': 1.0}, {'x': 2.0}], {})
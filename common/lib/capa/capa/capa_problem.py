@@ -13,11 +13,14 @@ Main module which shows problems (of "capa" type).
 This is used by capa_module.
 """
 
+from collections import OrderedDict
 from copy import deepcopy
 from datetime import datetime
+import hashlib
 import logging
 import os.path
 import re
+import threading
 
 from lxml import etree
 from pytz import UTC
@@ -56,8 +59,103 @@ html_problem_semantics = [
     "openendedrubric",
 ]
 
+# maximum number of parsed problems kept by the parsed problem cache
+PARSED_PROBLEM_CACHE_SIZE = 500
+
 log = logging.getLogger(__name__)
 
+
+#-----------------------------------------------------------------------------
+# cache of the seed-independent results of parsing problems
+
+
+class ParsedProblem(object):
+    """
+    The seed-independent results of parsing a problem's XML: the element tree,
+    with its includes resolved and the IDs of its responses and their inputs
+    assigned, and which elements of the tree are the responses and inputs.
+
+    The tree is never modified; each LoncapaProblem gets its own copy.
+    """
+    def __init__(self, problem_text, tree, response_layout):
+        """
+        Arguments:
+            problem_text (string): the problem's XML, as it was parsed.
+            tree (etree.Element): the parsed problem.
+            response_layout (list): (response element, list of input elements)
+                pairs, for each response in the problem.
+        """
+        self.problem_text = problem_text
+        positions = {element: position for position, element in enumerate(tree.iter())}
+        self.tree = deepcopy(tree)
+        self.response_layout = [
+            (positions[response], [positions[inputfield] for inputfield in inputfields])
+            for response, inputfields in response_layout
+        ]
+
+    def instantiate(self):
+        """
+        Return a copy of the tree, and the response layout of that copy.
+        """
+        tree = deepcopy(self.tree)
+        elements = list(tree.iter())
+        return tree, [
+            (elements[response], [elements[inputfield] for inputfield in inputfields])
+            for response, inputfields in self.response_layout
+        ]
+
+
+class ParsedProblemCache(object):
+    """
+    A process-wide least recently used cache of ParsedProblems, keyed by
+    problem ID and problem text, so that a problem's XML is only parsed again
+    when its definition changes.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._parsed_problems = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(problem_id, problem_text):
+        """
+        Return the cache key of the given problem.
+        """
+        if isinstance(problem_text, unicode):
+            problem_text = problem_text.encode('utf-8')
+        return (problem_id, hashlib.md5(problem_text).hexdigest())
+
+    def get(self, key):
+        """
+        Return the ParsedProblem cached for `key`, or None.
+        """
+        with self._lock:
+            parsed_problem = self._parsed_problems.pop(key, None)
+            if parsed_problem is not None:
+                # Move it to the most recently used end.
+                self._parsed_problems[key] = parsed_problem
+            return parsed_problem
+
+    def set(self, key, parsed_problem):
+        """
+        Cache `parsed_problem` for `key`.
+        """
+        with self._lock:
+            self._parsed_problems[key] = parsed_problem
+            while len(self._parsed_problems) > self.max_size:
+                self._parsed_problems.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all cached ParsedProblems.
+        """
+        with self._lock:
+            self._parsed_problems.clear()
+
+
+PARSED_PROBLEM_CACHE = ParsedProblemCache(PARSED_PROBLEM_CACHE_SIZE)
+
+
 #-----------------------------------------------------------------------------
 # main class for this module
 
@@ -156,27 +254,18 @@ class LoncapaProblem(object):
         self.done = state.get('done', False)
         self.input_state = state.get('input_state', {})
 
-        # Convert startouttext and endouttext to proper <text></text>
-        problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
-        problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
-        self.problem_text = problem_text
-
-        # parse problem XML file into an element tree
-        self.tree = etree.XML(problem_text)
-
-        self.make_xml_compatible(self.tree)
-
-        # handle any <include file="foo"> tags
-        self._process_includes()
+        # parse problem XML file into an element tree with ID's assigned to its
+        # responses and inputs, or get a copy of the one already parsed.
+        self.tree, response_layout = self._parse_problem(problem_text)
 
         # construct script processor context (eg for customresponse problems)
         self.context = self._extract_context(self.tree)
 
-        # Pre-parse the XML tree: modifies it to add ID's and perform some in-place
-        # transformations.  This also creates the dict (self.responders) of Response
+        # Pre-parse the XML tree: performs some in-place transformations.
+        # This also creates the dict (self.responders) of Response
         # instances for each question in the problem. The dict has keys = xml subtree of
         # Response, values = Response instance
-        self._preprocess_problem(self.tree)
+        self._preprocess_problem(self.tree, response_layout)
 
         if not self.student_answers:  # True when student_answers is an empty dict
             self.set_initial_display()
@@ -195,6 +284,40 @@ class LoncapaProblem(object):
 
         self.extracted_tree = self._extract_html(self.tree)
 
+    def _parse_problem(self, problem_text):
+        """
+        Parse problem_text into an element tree, returning it along with the
+        response layout built by _assign_ids.
+
+        Parsing doesn't depend on the seed, so the results are cached in
+        PARSED_PROBLEM_CACHE, except for problems which include files.
+        """
+        cache_key = ParsedProblemCache.key(self.problem_id, problem_text)
+        parsed_problem = PARSED_PROBLEM_CACHE.get(cache_key)
+        if parsed_problem is not None:
+            self.problem_text = parsed_problem.problem_text
+            return parsed_problem.instantiate()
+
+        # Convert startouttext and endouttext to proper <text></text>
+        problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
+        problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
+        self.problem_text = problem_text
+
+        self.tree = etree.XML(problem_text)
+
+        self.make_xml_compatible(self.tree)
+
+        # handle any <include file="foo"> tags
+        # The included files may change without the problem changing, so
+        # problems with includes are not cached.
+        has_includes = bool(self.tree.findall('.//include'))
+        self._process_includes()
+
+        response_layout = self._assign_ids(self.tree)
+        if not has_includes:
+            PARSED_PROBLEM_CACHE.set(cache_key, ParsedProblem(problem_text, self.tree, response_layout))
+        return self.tree, response_layout
+
     def make_xml_compatible(self, tree):
         """
         Adjust tree xml in-place for compatibility before creating
@@ -437,7 +560,7 @@ class LoncapaProblem(object):
             if 'filesubmission' in responder.allowed_inputfields and student_answers is not None:
                 results = responder.evaluate_answers(student_answers, oldcmap)
             else:
-                results = responder.evaluate_answers(self.student_answers, oldcmap)
+                results = responder.evaluate_answers(self.student_answers, oldcmap, rescoring=student_answers is None)
             newcmap.update(results)
 
         self.correct_map = newcmap
@@ -824,19 +947,17 @@ class LoncapaProblem(object):
 
         return tree
 
-    def _preprocess_problem(self, tree):  # private
+    def _assign_ids(self, tree):
         """
         Assign IDs to all the responses
         Assign sub-IDs to all entries (textline, schematic, etc.)
-        Annoted correctness and value
         In-place transformation
 
-        Also create capa Response instances for each responsetype and save as self.responders
-
-        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        Returns a list of (response element, list of input elements) pairs, in
+        the order of the responses.
         """
+        response_layout = []
         response_id = 1
-        self.responders = {}
         for response in tree.xpath('//' + "|//".join(responsetypes.registry.registered_tags())):
             response_id_str = self.problem_id + "_" + str(response_id)
             # create and save ID for this response
@@ -857,6 +978,25 @@ class LoncapaProblem(object):
                 entry.attrib['id'] = "%s_%i_%i" % (self.problem_id, response_id, answer_id)
                 answer_id = answer_id + 1
 
+            response_layout.append((response, inputfields))
+        return response_layout
+
+    def _preprocess_problem(self, tree, response_layout=None):  # private
+        """
+        Assign IDs to all the responses and entries, unless response_layout
+        was already built by _assign_ids
+        Annoted correctness and value
+        In-place transformation
+
+        Also create capa Response instances for each responsetype and save as self.responders
+
+        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        """
+        if response_layout is None:
+            response_layout = self._assign_ids(tree)
+
+        self.responders = {}
+        for response, inputfields in response_layout:
             # instantiate capa Response
             responsetype_cls = responsetypes.registry.get_class_for_tag(response.tag)
             responder = responsetype_cls(response, inputfields, self.context, self.capa_system, self.capa_module)
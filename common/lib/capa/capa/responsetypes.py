@@ -11,6 +11,7 @@ Used by capa_problem.py
 # standard library imports
 import abc
 import cgi
+import hashlib
 import inspect
 import json
 import logging
@@ -36,7 +37,7 @@ from shapely.geometry import Point, MultiPoint
 import dogstats_wrapper as dog_stats_api
 
 # specific library imports
-from calc import evaluator, UndefinedVariable
+from calc import compile_expression, evaluator, UndefinedVariable
 from . import correctmap
 from .registry import TagRegistry
 from datetime import datetime
@@ -266,14 +267,19 @@ class LoncapaResponse(object):
 
         return tree
 
-    def evaluate_answers(self, student_answers, old_cmap):
+    def evaluate_answers(self, student_answers, old_cmap, rescoring=False):
         """
         Called by capa_problem.LoncapaProblem to evaluate student answers, and to
         generate hints (if any).
 
+        When `rescoring`, the score which `prepare_scores` cached for the answers,
+        if any, is used rather than grading them again.
+
         Returns the new CorrectMap, with (correctness,msg,hint,hintmode) for each answer_id.
         """
-        new_cmap = self.get_score(student_answers)
+        new_cmap = self.get_prepared_score(student_answers) if rescoring else None
+        if new_cmap is None:
+            new_cmap = self.get_score(student_answers)
         self.get_hints(convert_files_to_filenames(
             student_answers), new_cmap, old_cmap)
         return new_cmap
@@ -508,6 +514,51 @@ class LoncapaResponse(object):
         """
         pass
 
+    def prepare_scores(self, answers):
+        """
+        Grade many student answers at once, for bulk rescoring, and cache their
+        scores in the capa system's cache, so that rescoring each student's
+        answer later doesn't grade it again.
+
+        Only responses with a `get_scores` method, which grades a list of
+        answers, and a `grading_definition` method can prepare scores.
+        """
+        cache = self.capa_system.cache
+        if cache is None:
+            return
+        answers = list(set(answers))
+        for answer, score in zip(answers, self.get_scores(answers)):
+            # Answers which can't be interpreted are left for get_score to explain.
+            if score is not None:
+                cache.set(self.score_cache_key(answer), score.get_dict())
+
+    def get_prepared_score(self, student_answers):
+        """
+        Return the CorrectMap which `prepare_scores` cached for the student's
+        answer, or None if there is none.
+        """
+        cache = self.capa_system.cache
+        if cache is None or not hasattr(self, 'get_scores'):
+            return None
+        answer = student_answers.get(self.answer_id)
+        if not isinstance(answer, basestring):
+            return None
+        cached = cache.get(self.score_cache_key(answer))
+        if cached is None:
+            return None
+        cmap = CorrectMap()
+        cmap.set_dict(cached)
+        return cmap
+
+    def score_cache_key(self, answer):
+        """
+        Return the key under which the score of `answer` is cached.  It depends
+        on everything that grading the answer depends on, so that a score is
+        never used for a different definition of the response.
+        """
+        data = json.dumps([type(self).__name__, etree.tostring(self.xml), self.grading_definition(), answer])
+        return "capa.score.{}".format(hashlib.md5(data).hexdigest())
+
     def check_hint_condition(self, hxml_set, student_answers):
         """
         Return a list of hints to show.
@@ -1882,6 +1933,28 @@ class NumericalResponse(LoncapaResponse):
         else:
             return CorrectMap(self.answer_id, is_correct)
 
+    def get_scores(self, answers):
+        """
+        Grade many student answers to this response at once.  Each distinct
+        answer is evaluated once.
+
+        Returns a list with, for each answer, the CorrectMap that `get_score`
+        returns for it, or None if the answer could not be interpreted.
+        """
+        scores = {}
+        for answer in set(answers):
+            try:
+                scores[answer] = self.get_score({self.answer_id: answer})
+            except StudentInputError:
+                scores[answer] = None
+        return [scores[answer] for answer in answers]
+
+    def grading_definition(self):
+        """
+        Return the contextualized values, besides the XML, which grading depends on.
+        """
+        return [self.correct_answer, self.tolerance, self.answer_range, self.inclusion]
+
     def compare_answer(self, ans1, ans2):
         """
         Outside-facing function that lets us compare two numerical answers,
@@ -3185,56 +3258,50 @@ class FormulaResponse(LoncapaResponse):
         """
         _ = self.capa_system.i18n.ugettext
 
-        out = []
-        for var_dict in var_dict_list:
-            try:
-                out.append(evaluator(
-                    var_dict,
-                    dict(),
-                    answer,
-                    case_sensitive=self.case_sensitive,
-                ))
-            except UndefinedVariable as err:
+        try:
+            # The answer is parsed once, and evaluated for all the samples at once
+            # when possible.
+            return compile_expression(answer, self.case_sensitive).evaluate_samples(var_dict_list, dict())
+        except UndefinedVariable as err:
+            log.debug(
+                'formularesponse: undefined variable in formula=%s',
+                cgi.escape(answer)
+            )
+            raise StudentInputError(
+                _("Invalid input: {bad_input} not permitted in answer.").format(bad_input=err.message)
+            )
+        except ValueError as err:
+            if 'factorial' in err.message:
+                # This is thrown when fact() or factorial() is used in a formularesponse answer
+                #   that tests on negative and/or non-integer inputs
+                # err.message will be: `factorial() only accepts integral values` or
+                # `factorial() not defined for negative values`
                 log.debug(
-                    'formularesponse: undefined variable in formula=%s',
+                    ('formularesponse: factorial function used in response '
+                     'that tests negative and/or non-integer inputs. '
+                     'Provided answer was: %s'),
                     cgi.escape(answer)
                 )
                 raise StudentInputError(
-                    _("Invalid input: {bad_input} not permitted in answer.").format(bad_input=err.message)
+                    _("factorial function not permitted in answer "
+                      "for this problem. Provided answer was: "
+                      "{bad_input}").format(bad_input=cgi.escape(answer))
                 )
-            except ValueError as err:
-                if 'factorial' in err.message:
-                    # This is thrown when fact() or factorial() is used in a formularesponse answer
-                    #   that tests on negative and/or non-integer inputs
-                    # err.message will be: `factorial() only accepts integral values` or
-                    # `factorial() not defined for negative values`
-                    log.debug(
-                        ('formularesponse: factorial function used in response '
-                         'that tests negative and/or non-integer inputs. '
-                         'Provided answer was: %s'),
-                        cgi.escape(answer)
-                    )
-                    raise StudentInputError(
-                        _("factorial function not permitted in answer "
-                          "for this problem. Provided answer was: "
-                          "{bad_input}").format(bad_input=cgi.escape(answer))
-                    )
-                # If non-factorial related ValueError thrown, handle it the same as any other Exception
-                log.debug('formularesponse: error %s in formula', err)
-                raise StudentInputError(
-                    _("Invalid input: Could not parse '{bad_input}' as a formula.").format(
-                        bad_input=cgi.escape(answer)
-                    )
+            # If non-factorial related ValueError thrown, handle it the same as any other Exception
+            log.debug('formularesponse: error %s in formula', err)
+            raise StudentInputError(
+                _("Invalid input: Could not parse '{bad_input}' as a formula.").format(
+                    bad_input=cgi.escape(answer)
                 )
-            except Exception as err:
-                # traceback.print_exc()
-                log.debug('formularesponse: error %s in formula', err)
-                raise StudentInputError(
-                    _("Invalid input: Could not parse '{bad_input}' as a formula").format(
-                        bad_input=cgi.escape(answer)
-                    )
+            )
+        except Exception as err:
+            # traceback.print_exc()
+            log.debug('formularesponse: error %s in formula', err)
+            raise StudentInputError(
+                _("Invalid input: Could not parse '{bad_input}' as a formula").format(
+                    bad_input=cgi.escape(answer)
                 )
-        return out
+            )
 
     def randomize_variables(self, samples):
         """
@@ -3267,7 +3334,14 @@ class FormulaResponse(LoncapaResponse):
         var_dict_list = self.randomize_variables(samples)
         student_result = self.tupleize_answers(given, var_dict_list)
         instructor_result = self.tupleize_answers(expected, var_dict_list)
+        return self.compare_results(student_result, instructor_result)
 
+    def compare_results(self, student_result, instructor_result):
+        """
+        Given the results of evaluating a student answer and the expected
+        answer for the same samples, return whether the student answer is
+        "correct" or "incorrect".
+        """
         correct = all(compare_with_tolerance(student, instructor, self.tolerance)
                       for student, instructor in zip(student_result, instructor_result))
         if correct:
@@ -3275,6 +3349,36 @@ class FormulaResponse(LoncapaResponse):
         else:
             return "incorrect"
 
+    def get_scores(self, answers):
+        """
+        Grade many student answers to this response at once.  All of the
+        answers are checked against the same samples, for which the expected
+        answer is evaluated once, and each distinct answer is evaluated once,
+        for all of the samples at once.
+
+        Returns a list with, for each answer, the CorrectMap of its
+        correctness, or None if the answer could not be interpreted.
+        """
+        var_dict_list = self.randomize_variables(self.samples)
+        instructor_result = self.tupleize_answers(self.correct_answer, var_dict_list)
+
+        scores = {}
+        for answer in set(answers):
+            try:
+                student_result = self.tupleize_answers(answer, var_dict_list)
+            except StudentInputError:
+                scores[answer] = None
+            else:
+                correctness = self.compare_results(student_result, instructor_result)
+                scores[answer] = CorrectMap(self.answer_id, correctness)
+        return [scores[answer] for answer in answers]
+
+    def grading_definition(self):
+        """
+        Return the contextualized values, besides the XML, which grading depends on.
+        """
+        return [self.correct_answer, self.samples, self.tolerance, self.case_sensitive]
+
     def compare_answer(self, ans1, ans2):
         """
         An external interface for comparing whether a and b are equal.
@@ -0,0 +1,557 @@
+"""
+A pool of persistent sandboxed Python processes for capa's safe_exec.
+
+Starting a sandboxed Python process, and importing numpy, scipy and friends in
+it, takes much longer than running most problem code.  The processes of this
+pool are started once, in the same sandbox that codejail uses, with those
+modules already imported.  Each execution then runs in a child process forked
+from one of them, so that executions can't affect each other, with the
+configured codejail limits applied to the child.
+
+The pooled process forks before reading the request, so that the request only
+passes through the child.  The child writes its results to a pipe of its own,
+after closing every other file descriptor it inherited, and the pooled process
+checks them and sends them to the pool along with the child's exit status, so
+that it is the only one writing to the pool.  The pool processes are recycled
+after a number of executions, when they grow beyond a memory limit, and after
+any execution which didn't end cleanly.  A process which sends anything
+unexpected is retired, and the execution retried in a new process.  Whenever
+the pool can't be used, executions fall back to codejail's one-shot
+`safe_exec`.
+
+The pool is disabled until `configure_pool` is called with a positive size,
+and is only used once codejail is configured to run sandboxed Python.
+"""
+import json
+import logging
+import os
+import os.path
+import Queue
+import select
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+from codejail import jail_code
+from codejail.safe_exec import safe_exec as codejail_safe_exec
+from codejail.safe_exec import json_safe, SafeExecException
+from dogapi import dog_stats_api
+
+
+log = logging.getLogger(__name__)
+
+# The program run by each pooled process.  It is given the modules to import
+# and the codejail limits as arguments.
+WORKER_CODE = r'''
+import fcntl, json, os, resource, select, signal, struct, sys, time, traceback
+
+for modname in json.loads(sys.argv[1]):
+    try:
+        __import__(modname)
+    except Exception:
+        pass
+
+HEADER = struct.Struct(">I")
+
+
+def read_exact(fd, size):
+    data = []
+    while size:
+        chunk = os.read(fd, size)
+        if not chunk:
+            break
+        data.append(chunk)
+        size -= len(chunk)
+    return "".join(data)
+
+
+def write_frame(fd, data):
+    data = HEADER.pack(len(data)) + data
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def vm_size():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmSize:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def jsonable(value):
+    if not isinstance(value, (type(None), bool, int, long, float, str, unicode, list, tuple, dict)):
+        return False
+    try:
+        json.dumps(value)
+    except Exception:
+        return False
+    return True
+
+
+def run_child(size, results_fd):
+    os.setsid()
+    request = json.loads(read_exact(0, size))
+    limits = request["limits"]
+    if limits.get("CPU"):
+        resource.setrlimit(resource.RLIMIT_CPU, (limits["CPU"], limits["CPU"]))
+    if limits.get("VMEM"):
+        # The modules imported above are not counted against the limit.
+        vmem = vm_size() + limits["VMEM"]
+        resource.setrlimit(resource.RLIMIT_AS, (vmem, vmem))
+    if limits.get("FSIZE"):
+        resource.setrlimit(resource.RLIMIT_FSIZE, (limits["FSIZE"], limits["FSIZE"]))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+    # The code can only write to its own results pipe: the pool's channel, and
+    # any other descriptor inherited from the pooled process, are closed.
+    if results_fd < 3:
+        results_fd = fcntl.fcntl(results_fd, fcntl.F_DUPFD, 3)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.closerange(3, results_fd)
+    os.closerange(results_fd + 1, os.sysconf("SC_OPEN_MAX"))
+
+    os.chdir(request["tmpdir"])
+    os.environ["TMPDIR"] = os.path.join(request["tmpdir"], "tmp")
+    sys.path[:0] = [os.path.abspath(path) for path in request["python_path"]]
+
+    globals_dict = request["globals"]
+    try:
+        exec request["code"] in globals_dict
+        error = None
+    except BaseException:
+        error = traceback.format_exc()
+    results = {
+        "nonce": request["nonce"],
+        "error": error,
+        "globals": dict(
+            (key, value) for key, value in globals_dict.iteritems()
+            if key != "__builtins__" and jsonable(value)
+        ),
+    }
+    write_frame(results_fd, json.dumps(results))
+    os._exit(0)
+
+
+def parse_results(data):
+    # The child's output is only trusted if it is a single frame of JSON.
+    if len(data) < HEADER.size or HEADER.unpack(data[:HEADER.size])[0] != len(data) - HEADER.size:
+        return None
+    try:
+        return json.loads(data[HEADER.size:])
+    except ValueError:
+        return None
+
+
+while True:
+    header = read_exact(0, HEADER.size)
+    if len(header) < HEADER.size:
+        break
+    results_r, results_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(results_r)
+            run_child(HEADER.unpack(header)[0], results_w)
+        finally:
+            os._exit(1)
+    os.close(results_w)
+
+    realtime = float(sys.argv[2])
+    deadline = time.time() + realtime if realtime else None
+    killed = False
+    status = None
+    chunks = []
+    while status is None:
+        # Keep reading the results while waiting, so the child can't block on
+        # a full pipe.
+        if select.select([results_r], [], [], 0.002)[0]:
+            chunk = os.read(results_r, 65536)
+            if chunk:
+                chunks.append(chunk)
+        waited_pid, waited_status = os.waitpid(pid, os.WNOHANG)
+        if waited_pid:
+            status = waited_status
+        elif deadline and time.time() > deadline and not killed:
+            os.kill(pid, signal.SIGKILL)
+            killed = True
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    while select.select([results_r], [], [], 0)[0]:
+        chunk = os.read(results_r, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(results_r)
+
+    results = None
+    if status == 0 and not killed:
+        results = parse_results("".join(chunks))
+    write_frame(1, json.dumps({
+        "results": results,
+        "status": status,
+        "killed": killed,
+        "maxrss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }))
+'''
+
+_HEADER = struct.Struct(">I")
+
+
+class SandboxWorkerError(Exception):
+    """
+    Raised when a pooled process can't be used, and should be discarded.
+    """
+    pass
+
+
+class SandboxPoolUnavailable(Exception):
+    """
+    Raised when no pooled process is available for an execution.
+    """
+    pass
+
+
+def _sandbox_cmdline():
+    """
+    Return the command line that codejail uses to start sandboxed Python.
+    """
+    command = jail_code.COMMANDS['python']
+    cmdline = []
+    if command.get('user'):
+        cmdline.extend(['sudo', '-u', command['user']])
+    cmdline.extend(command['cmdline_start'])
+    return cmdline
+
+
+class SandboxWorker(object):
+    """
+    One persistent sandboxed Python process.
+    """
+    def __init__(self, preimports):
+        limits = jail_code.LIMITS
+        self.process = subprocess.Popen(
+            _sandbox_cmdline() + ['-c', WORKER_CODE, json.dumps(preimports), str(limits.get('REALTIME') or 0)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            close_fds=True,
+        )
+        self.pid = os.getpid()
+        self.runs = 0
+        self.maxrss = 0
+
+    def execute(self, request, timeout):
+        """
+        Send an execution request to the process, and return its results and
+        the process's status report.  The results are None if the execution
+        didn't end cleanly.
+
+        Raises SandboxWorkerError if the process doesn't respond properly.
+        """
+        self.runs += 1
+        data = json.dumps(request)
+        try:
+            self.process.stdin.write(_HEADER.pack(len(data)) + data)
+            self.process.stdin.flush()
+        except (IOError, OSError) as err:
+            raise SandboxWorkerError("Couldn't send request: {}".format(err))
+
+        frame = self._read_frame(time.time() + timeout)
+        try:
+            report = json.loads(frame)
+            results = report.pop('results')
+            self.maxrss = int(report['maxrss'])
+        except (ValueError, TypeError, KeyError, AttributeError) as err:
+            raise SandboxWorkerError("Received a malformed status report: {!r}".format(err))
+        if 'status' not in report or 'killed' not in report:
+            raise SandboxWorkerError("Received an incomplete status report")
+        if results is not None and not _are_valid_results(results, request['nonce']):
+            raise SandboxWorkerError("Received unexpected results")
+        return results, report
+
+    def _read_frame(self, deadline):
+        """
+        Read one length-prefixed frame from the process, by the deadline.
+        """
+        header = self._read_exact(_HEADER.size, deadline)
+        return self._read_exact(_HEADER.unpack(header)[0], deadline)
+
+    def _read_exact(self, size, deadline):
+        """
+        Read exactly `size` bytes from the process, by the deadline.
+        """
+        fd = self.process.stdout.fileno()
+        data = []
+        while size:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise SandboxWorkerError("Timed out waiting for the sandbox")
+            chunk = os.read(fd, size)
+            if not chunk:
+                raise SandboxWorkerError("The sandbox exited")
+            data.append(chunk)
+            size -= len(chunk)
+        return "".join(data)
+
+    def close(self):
+        """
+        Stop the process.
+        """
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        try:
+            self.process.kill()
+        except OSError:
+            pass
+        self.process.wait()
+
+
+def _are_valid_results(results, nonce):
+    """
+    Return whether `results` are well-formed results of the execution `nonce`.
+    """
+    return (
+        isinstance(results, dict) and
+        results.get('nonce') == nonce and
+        isinstance(results.get('error'), (type(None), basestring)) and
+        isinstance(results.get('globals'), dict)
+    )
+
+
+class SandboxPool(object):
+    """
+    A pool of up to `size` SandboxWorkers, started on demand.
+    """
+    def __init__(self, size, max_runs=100, max_memory=256 * 1024 * 1024, wait_timeout=5, preimports=None):
+        """
+        Arguments:
+            size (int): the maximum number of pooled processes.
+            max_runs (int): the number of executions after which a process is recycled.
+            max_memory (int): the size in bytes beyond which a process is recycled.
+            wait_timeout (float): the number of seconds to wait for a process to
+                become available before falling back to a one-shot execution.
+            preimports (list): the modules to import in the pooled processes,
+                by default those which capa code can use without importing them.
+        """
+        self.size = size
+        self.max_runs = max_runs
+        self.max_memory = max_memory
+        self.wait_timeout = wait_timeout
+        if preimports is None:
+            # Imported here since safe_exec imports this module.
+            from .safe_exec import ASSUMED_IMPORTS
+            preimports = [modname for _, modname in ASSUMED_IMPORTS]
+        self.preimports = preimports
+        self._idle = Queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+
+    def _checkout(self):
+        """
+        Return an idle worker, starting a new one if the pool isn't full.
+        """
+        try:
+            return self._idle.get_nowait()
+        except Queue.Empty:
+            pass
+
+        worker = self._start()
+        if worker is not None:
+            return worker
+
+        dog_stats_api.increment('capa.safe_exec.pool.queued')
+        with dog_stats_api.timer('capa.safe_exec.pool.wait_time'):
+            try:
+                return self._idle.get(timeout=self.wait_timeout)
+            except Queue.Empty:
+                raise SandboxPoolUnavailable("No sandbox became available")
+
+    def _start(self):
+        """
+        Start a new worker, or return None if the pool is full.
+        """
+        with self._lock:
+            start = self._started < self.size
+            if start:
+                self._started += 1
+        if not start:
+            return None
+        try:
+            with dog_stats_api.timer('capa.safe_exec.pool.start_time'):
+                return SandboxWorker(self.preimports)
+        except Exception:
+            self._discard(None)
+            raise
+
+    def _checkin(self, worker):
+        """
+        Return a worker to the pool, recycling it if it has been used enough.
+        """
+        if worker.runs >= self.max_runs or worker.maxrss > self.max_memory:
+            dog_stats_api.increment('capa.safe_exec.pool.recycled')
+            self._discard(worker)
+        else:
+            self._idle.put(worker)
+
+    def _discard(self, worker):
+        """
+        Stop a worker, making room for a new one.
+        """
+        if worker is not None:
+            worker.close()
+        with self._lock:
+            self._started -= 1
+
+    def execute(self, code, globals_dict, python_path=None, extra_files=None, slug=None):
+        """
+        Execute `code` in a pooled process, like codejail's `safe_exec`.
+
+        A pooled process which doesn't respond properly is retired, and the
+        code is executed again in a newly started process.
+
+        Raises SandboxPoolUnavailable or SandboxWorkerError if the pool couldn't
+        be used, and SafeExecException if the code failed.
+        """
+        worker = self._checkout()
+        if worker.pid != os.getpid():
+            # The worker was started by the process this one was forked from.
+            self._discard(worker)
+            raise SandboxPoolUnavailable("The sandbox belongs to another process")
+
+        try:
+            results, status = self._execute_in(worker, code, globals_dict, python_path, extra_files)
+        except SandboxWorkerError as err:
+            log.warning("Retiring a sandbox which failed to execute %s: %s", slug, err)
+            dog_stats_api.increment('capa.safe_exec.pool.retired')
+            worker = self._start()
+            if worker is None:
+                raise SandboxPoolUnavailable("No sandbox could be started to execute again")
+            results, status = self._execute_in(worker, code, globals_dict, python_path, extra_files)
+
+        if results is None:
+            # The execution was killed, or garbled its results, and may have
+            # left the process in an unknown state.
+            self._discard(worker)
+            log.warning("Sandboxed execution of %s didn't end cleanly: %r", slug, status)
+            if status['killed']:
+                reason = "killed after exceeding its time limit"
+            elif status['status'] == 0:
+                reason = "its results were malformed"
+            else:
+                reason = "exited with status {}".format(status['status'])
+            raise SafeExecException("Couldn't execute jailed code: {}".format(reason))
+
+        self._checkin(worker)
+        if results['error']:
+            raise SafeExecException("Couldn't execute jailed code: {}".format(results['error']))
+        globals_dict.update(results['globals'])
+
+    def _execute_in(self, worker, code, globals_dict, python_path, extra_files):
+        """
+        Execute `code` in `worker`, returning its results and status report
+        like `SandboxWorker.execute`.  The worker is discarded if it fails.
+        """
+        tmpdir = _make_sandbox_dir(python_path or [], extra_files or [])
+        try:
+            request = {
+                'nonce': uuid.uuid4().hex,
+                'code': code,
+                'globals': json_safe(globals_dict),
+                'python_path': [os.path.basename(path) for path in python_path or []],
+                'tmpdir': tmpdir,
+                'limits': dict(jail_code.LIMITS),
+            }
+            timeout = (jail_code.LIMITS.get('REALTIME') or 60) + self.wait_timeout
+            try:
+                return worker.execute(request, timeout)
+            except Exception:
+                self._discard(worker)
+                raise
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def close(self):
+        """
+        Stop all idle workers.
+        """
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except Queue.Empty:
+                break
+
+
+def _make_sandbox_dir(python_path, extra_files):
+    """
+    Create the directory that an execution runs in, holding the extra files and
+    copies of the python path entries, like codejail does.
+    """
+    tmpdir = tempfile.mkdtemp(prefix='codejail-')
+    os.chmod(tmpdir, 0755)
+    os.mkdir(os.path.join(tmpdir, 'tmp'))
+    os.chmod(os.path.join(tmpdir, 'tmp'), 0777)
+
+    extra_names = set(name for name, _ in extra_files)
+    for path in python_path:
+        if path in extra_names:
+            continue
+        destination = os.path.join(tmpdir, os.path.basename(path))
+        if os.path.isdir(path):
+            shutil.copytree(path, destination)
+        else:
+            shutil.copy(path, destination)
+    for name, contents in extra_files:
+        with open(os.path.join(tmpdir, name), 'wb') as extra_file:
+            extra_file.write(contents)
+    return tmpdir
+
+
+_POOL = None
+
+
+def configure_pool(size=0, **kwargs):
+    """
+    Configure the pool used by `pooled_safe_exec`.  A size of 0 disables it.
+
+    The other keyword arguments are those of SandboxPool.
+    """
+    global _POOL  # pylint: disable=global-statement
+    if _POOL is not None:
+        _POOL.close()
+    _POOL = SandboxPool(size, **kwargs) if size > 0 else None
+
+
+def is_enabled():
+    """
+    Return whether executions can use the pool.
+    """
+    return _POOL is not None and jail_code.is_configured('python')
+
+
+def pooled_safe_exec(code, globals_dict, python_path=None, extra_files=None, slug=None):
+    """
+    Execute `code` like codejail's `safe_exec`, in a pooled process when
+    possible, and in a new sandboxed process otherwise.
+    """
+    try:
+        _POOL.execute(code, globals_dict, python_path=python_path, extra_files=extra_files, slug=slug)
+        return
+    except (SandboxPoolUnavailable, SandboxWorkerError) as err:
+        log.warning("Couldn't use the sandbox pool for %s, falling back to a new sandbox: %s", slug, err)
+    except SafeExecException:
+        raise
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Couldn't use the sandbox pool for %s, falling back to a new sandbox", slug)
+
+    dog_stats_api.increment('capa.safe_exec.pool.fallback')
+    codejail_safe_exec(code, globals_dict, python_path=python_path, extra_files=extra_files, slug=slug)
@@ -4,9 +4,13 @@ from codejail.safe_exec import safe_exec as codejail_safe_exec
 from codejail.safe_exec import not_safe_exec as codejail_not_safe_exec
 from codejail.safe_exec import json_safe, SafeExecException
 from . import lazymod
+from . import pool
 from dogapi import dog_stats_api
 
 import hashlib
+import logging
+
+log = logging.getLogger(__name__)
 
 # Establish the Python environment for Capa.
 # Capa assumes float-friendly division always.
@@ -70,6 +74,29 @@ def update_hash(hasher, obj):
         hasher.update(repr(obj))
 
 
+def _cache_key(code, globals_dict, random_seed):
+    """
+    Return the key under which the results of executing `code` with
+    `globals_dict` and `random_seed` are cached.
+    """
+    md5er = hashlib.md5()
+    md5er.update(repr(code))
+    update_hash(md5er, json_safe(globals_dict))
+    return "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
+
+
+def _get_exec_fn(unsafely):
+    """
+    Return the function that executes code, sandboxed unless `unsafely`.
+    """
+    if unsafely:
+        return codejail_not_safe_exec
+    elif pool.is_enabled():
+        return pool.pooled_safe_exec
+    else:
+        return codejail_safe_exec
+
+
 @dog_stats_api.timed('capa.safe_exec.time')
 def safe_exec(
     code,
@@ -109,11 +136,7 @@ def safe_exec(
     """
     # Check the cache for a previous result.
     if cache:
-        safe_globals = json_safe(globals_dict)
-        md5er = hashlib.md5()
-        md5er.update(repr(code))
-        update_hash(md5er, safe_globals)
-        key = "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
+        key = _cache_key(code, globals_dict, random_seed)
         cached = cache.get(key)
         if cached is not None:
             # We have a cached result.  The result is a pair: the exception
@@ -128,10 +151,7 @@ def safe_exec(
     code_prolog = CODE_PROLOG % random_seed
 
     # Decide which code executor to use.
-    if unsafely:
-        exec_fn = codejail_not_safe_exec
-    else:
-        exec_fn = codejail_safe_exec
+    exec_fn = _get_exec_fn(unsafely)
 
     # Run the code!  Results are side effects in globals_dict.
     try:
@@ -153,3 +173,159 @@ def safe_exec(
     # If an exception happened, raise it now.
     if emsg:
         raise e
+
+
+# The code that executes a batch of inputs in a single sandbox.  Each input is
+# executed in its own globals, with the random module reseeded, and its results
+# are collected in `batch_results` in the same form as cached safe_exec results.
+# The changes an input makes to sys.modules and sys.path are undone before the
+# next one.  The modules it imported from the sandbox's directory or the python
+# path are dropped, so that the next input imports them afresh, but the others,
+# such as numpy, would be too slow to import again for every input and are kept.
+BATCH_DRIVER = """\
+def _run_batch(inputs, prolog, code, python_path):
+    import json, os, sys, traceback, types
+
+    local_dirs = [os.path.join(os.path.abspath(path), "") for path in [os.getcwd()] + python_path]
+
+    def is_local(module):
+        path = getattr(module, "__file__", None)
+        if not path:
+            return False
+        path = os.path.abspath(path)
+        return any(path.startswith(local_dir) for local_dir in local_dirs)
+
+    def json_safe(globals_dict):
+        ok_types = (type(None), int, long, float, str, unicode, list, tuple, dict)
+        results = {}
+        for key, value in globals_dict.iteritems():
+            if key == "__builtins__" or not isinstance(value, ok_types):
+                continue
+            try:
+                results[key] = json.loads(json.dumps(value))
+            except Exception:
+                continue
+        return results
+
+    def restore_modules(saved_modules):
+        for name, module in sys.modules.items():
+            if name in saved_modules:
+                continue
+            if not isinstance(module, types.ModuleType) or is_local(module):
+                del sys.modules[name]
+        sys.modules.update(saved_modules)
+
+    results = []
+    for globals_dict, random_seed in inputs:
+        saved_modules = dict(sys.modules)
+        saved_path = list(sys.path)
+        try:
+            exec prolog % random_seed + code in globals_dict
+        except Exception:
+            emsg = "Couldn't execute jailed code: " + traceback.format_exc()
+        else:
+            emsg = None
+        finally:
+            restore_modules(saved_modules)
+            sys.path[:] = saved_path
+        results.append([emsg, json_safe(globals_dict)])
+    return results
+
+batch_results = _run_batch(batch_inputs, batch_prolog, batch_code, batch_python_path)
+del batch_inputs, batch_prolog, batch_code, batch_python_path
+"""
+
+# How many inputs safe_exec_many executes in each sandbox.
+BATCH_SIZE = 50
+
+
+@dog_stats_api.timed('capa.safe_exec.many.time')
+def safe_exec_many(
+    code,
+    inputs,
+    python_path=None,
+    extra_files=None,
+    cache=None,
+    slug=None,
+    unsafely=False,
+    batch_size=BATCH_SIZE,
+):
+    """
+    Execute the same python code against many inputs, running up to
+    `batch_size` of them in each sandbox.
+
+    `inputs` is a list of (globals_dict, random_seed) pairs.  Returns a list with
+    a (emsg, results) pair per input: the message of the exception raised by the
+    code, if any, else None; and the JSON-safe globals after the execution.  The
+    `globals_dict` of the inputs are not changed.
+
+    The other arguments are those of `safe_exec`.  The results are cached like
+    those of `safe_exec`, so that a later `safe_exec` of one of the inputs uses
+    them.
+
+    The inputs of a batch share a process.  The changes the code makes to
+    `sys.modules` and `sys.path` are undone after each input, and the modules
+    it imports from `python_path` and `extra_files` are imported afresh for
+    each input, as with `safe_exec`.  Other modules it imports, such as numpy,
+    stay imported.  If a batch can't be executed as a whole, for instance
+    because it exceeds the sandbox limits, its inputs are executed one by one
+    with `safe_exec`.
+
+    """
+    results = [None] * len(inputs)
+    pending = []
+    for index, (globals_dict, random_seed) in enumerate(inputs):
+        cached = None
+        if cache:
+            key = _cache_key(code, globals_dict, random_seed)
+            cached = cache.get(key)
+        if cached is not None:
+            results[index] = tuple(cached)
+        else:
+            pending.append(index)
+
+    exec_fn = _get_exec_fn(unsafely)
+    for start in xrange(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        batch_globals = {
+            'batch_inputs': [[json_safe(inputs[index][0]), inputs[index][1]] for index in batch],
+            'batch_prolog': CODE_PROLOG,
+            'batch_code': LAZY_IMPORTS + code,
+            'batch_python_path': list(python_path or []),
+        }
+        try:
+            exec_fn(
+                BATCH_DRIVER, batch_globals,
+                python_path=python_path, extra_files=extra_files, slug=slug,
+            )
+            batch_results = batch_globals['batch_results']
+            if len(batch_results) != len(batch):
+                raise SafeExecException("Incomplete batch results")
+        except Exception:  # pylint: disable=broad-except
+            log.warning("Couldn't execute a batch of %d inputs of %s, executing them one by one", len(batch), slug)
+            dog_stats_api.increment('capa.safe_exec.many.fallback')
+            for index in batch:
+                globals_dict, random_seed = inputs[index]
+                globals_dict = json_safe(globals_dict)
+                try:
+                    safe_exec(
+                        code, globals_dict, random_seed=random_seed, python_path=python_path,
+                        extra_files=extra_files, cache=cache, slug=slug, unsafely=unsafely,
+                    )
+                except SafeExecException as err:
+                    emsg = err.message
+                else:
+                    emsg = None
+                results[index] = (emsg, json_safe(globals_dict))
+            continue
+
+        for index, (emsg, cleaned_results) in zip(batch, batch_results):
+            globals_dict, random_seed = inputs[index]
+            if emsg:
+                # Like safe_exec, keep none of the changes of failed code.
+                cleaned_results = json_safe(globals_dict)
+            results[index] = (emsg, cleaned_results)
+            if cache:
+                cache.set(_cache_key(code, globals_dict, random_seed), (emsg, cleaned_results))
+
+    return results
@@ -0,0 +1,85 @@
+"""Test pool.py"""
+
+import textwrap
+import unittest
+
+from mock import patch
+from nose.plugins.skip import SkipTest
+
+from capa.safe_exec import pool, safe_exec
+from codejail.safe_exec import SafeExecException
+from codejail.jail_code import is_configured
+
+
+class TestSandboxPool(unittest.TestCase):
+    """
+    Tests of executions in pooled sandboxed processes.
+    """
+    def setUp(self):
+        super(TestSandboxPool, self).setUp()
+        if not is_configured("python"):
+            raise SkipTest
+        pool.configure_pool(size=1, max_runs=3)
+        self.addCleanup(pool.configure_pool, size=0)
+
+    def test_set_values(self):
+        g = {'b': 3}
+        safe_exec("a = b * 17", g)
+        self.assertEqual(g['a'], 51)
+
+    def test_reuses_worker(self):
+        safe_exec("a = 1", {})
+        worker = pool._POOL._idle.queue[0]  # pylint: disable=protected-access
+        safe_exec("a = 2", {})
+        self.assertIs(pool._POOL._idle.queue[0], worker)  # pylint: disable=protected-access
+        self.assertEqual(worker.runs, 2)
+
+    def test_recycles_worker(self):
+        for _ in range(3):
+            safe_exec("a = 1", {})
+        self.assertEqual(pool._POOL._idle.qsize(), 0)  # pylint: disable=protected-access
+
+    def test_executions_are_isolated(self):
+        safe_exec("import math; math.leaked = 1", {})
+        g = {}
+        safe_exec("a = hasattr(math, 'leaked')", g)
+        self.assertFalse(g['a'])
+
+    def test_raising_exceptions(self):
+        with self.assertRaises(SafeExecException) as cm:
+            safe_exec("1/0", {})
+        self.assertIn("ZeroDivisionError", cm.exception.message)
+
+    def test_code_only_has_its_results_pipe(self):
+        g = {}
+        safe_exec(textwrap.dedent("""\
+            import os
+            fds = [int(fd) for fd in os.listdir('/proc/self/fd')]
+            open_fds = sorted(fd for fd in fds if os.path.exists('/proc/self/fd/%d' % fd))
+            """), g)
+        # Besides stdin, stdout and stderr, which are /dev/null.
+        self.assertEqual(g['open_fds'][:3], [0, 1, 2])
+        self.assertEqual(len(g['open_fds']), 4)
+
+    def test_code_cant_write_to_the_pool(self):
+        g = {}
+        safe_exec("import os\nfor fd in (0, 1, 2):\n    os.write(fd, 'garbage')\na = 17", g)
+        self.assertEqual(g['a'], 17)
+        self.assertEqual(pool._POOL._idle.queue[0].runs, 1)  # pylint: disable=protected-access
+
+    def test_retires_worker_on_malformed_report(self):
+        safe_exec("a = 1", {})
+        worker = pool._POOL._idle.queue[0]  # pylint: disable=protected-access
+        with patch.object(worker, '_read_frame', return_value='garbage'):
+            g = {}
+            safe_exec("a = 17", g)
+        self.assertEqual(g['a'], 17)
+        self.assertIsNotNone(worker.process.poll())
+        self.assertIsNot(pool._POOL._idle.queue[0], worker)  # pylint: disable=protected-access
+
+    def test_falls_back_without_worker(self):
+        sandbox_pool = pool._POOL  # pylint: disable=protected-access
+        with patch.object(sandbox_pool, 'execute', side_effect=pool.SandboxPoolUnavailable):
+            g = {}
+            safe_exec("a = 17", g)
+        self.assertEqual(g['a'], 17)
@@ -4,12 +4,14 @@ import hashlib
 import os
 import os.path
 import random
+import sys
 import textwrap
 import unittest
 
+from mock import patch
 from nose.plugins.skip import SkipTest
 
-from capa.safe_exec import safe_exec, update_hash
+from capa.safe_exec import safe_exec, safe_exec_many, update_hash
 from codejail.safe_exec import SafeExecException
 from codejail.jail_code import is_configured
 
@@ -177,6 +179,104 @@ class TestSafeExecCaching(unittest.TestCase):
                 self.fail("Tried executing code with non-ASCII unicode: {0}".format(code))
 
 
+class TestSafeExecMany(unittest.TestCase):
+    """Test safe_exec_many."""
+
+    def test_results(self):
+        results = safe_exec_many(
+            "b = a * 2\nr = random.randint(0, 999)",
+            [({'a': 1}, 17), ({'a': 2}, 17), ({'a': 3}, 4)],
+            batch_size=2,
+        )
+        self.assertEqual([emsg for emsg, _ in results], [None, None, None])
+        self.assertEqual([globals_dict['b'] for _, globals_dict in results], [2, 4, 6])
+        self.assertEqual(results[0][1]['r'], random.Random(17).randint(0, 999))
+        self.assertEqual(results[1][1]['r'], results[0][1]['r'])
+        self.assertEqual(results[2][1]['r'], random.Random(4).randint(0, 999))
+
+    def test_same_as_safe_exec(self):
+        code = "import random\nb = a / 2\nrnums = [random.randint(0, 999) for _ in xrange(10)]"
+        results = safe_exec_many(code, [({'a': 1}, 3), ({'a': 5}, 8)])
+        for (emsg, globals_dict), (a, seed) in zip(results, [(1, 3), (5, 8)]):
+            g = {'a': a}
+            safe_exec(code, g, random_seed=seed)
+            self.assertIsNone(emsg)
+            self.assertEqual(globals_dict, g)
+
+    def test_exceptions(self):
+        results = safe_exec_many("b = 1 / a", [({'a': 0}, 1), ({'a': 2}, 1)])
+        emsg, globals_dict = results[0]
+        self.assertIn("ZeroDivisionError", emsg)
+        self.assertEqual(globals_dict, {'a': 0})
+        self.assertEqual(results[1], (None, {'a': 2, 'b': 0.5}))
+
+    def test_inputs_are_not_changed(self):
+        inputs = [({'a': 1}, 1)]
+        safe_exec_many("a = 2", inputs)
+        self.assertEqual(inputs, [({'a': 1}, 1)])
+
+    def test_caching(self):
+        cache = {}
+        results = safe_exec_many("b = a + 1", [({'a': 1}, 1), ({'a': 2}, 2)], cache=DictCache(cache))
+        self.assertEqual(len(cache), 2)
+
+        # safe_exec uses the cached results.
+        for key in cache:
+            cache[key] = (None, {'b': 17})
+        g = {'a': 2}
+        safe_exec("b = a + 1", g, random_seed=2, cache=DictCache(cache))
+        self.assertEqual(g['b'], 17)
+
+        # And so does safe_exec_many.
+        results = safe_exec_many("b = a + 1", [({'a': 1}, 1)], cache=DictCache(cache))
+        self.assertEqual(results, [(None, {'b': 17})])
+
+    def test_batched_inputs_are_isolated(self):
+        # Each input of a batch gets the same results as when it is run alone,
+        # even if an earlier input of the batch changed sys.modules or sys.path.
+        code = textwrap.dedent("""\
+            import random, sys
+            seen = sorted(name for name in sys.modules if name.startswith('safe_exec_many_test'))
+            sys.modules['safe_exec_many_test_%d' % a] = a
+            sys.modules['random'] = None
+            sys.path.insert(0, '/safe_exec_many_test')
+            path_is_clean = sys.path.count('/safe_exec_many_test') == 1
+            rnums = [random.randint(0, 999) for _ in xrange(5)]
+            """)
+        inputs = [({'a': 1}, 3), ({'a': 2}, 3), ({'a': 3}, 8)]
+        with patch.dict(sys.modules):
+            results = safe_exec_many(code, inputs, batch_size=len(inputs))
+        for (emsg, globals_dict), (g, seed) in zip(results, inputs):
+            g = dict(g)
+            with patch.dict(sys.modules), patch.object(sys, 'path', list(sys.path)):
+                safe_exec(code, g, random_seed=seed)
+            self.assertIsNone(emsg)
+            self.assertEqual(globals_dict, g)
+            self.assertEqual(globals_dict['seen'], [])
+
+    def test_python_path_modules_are_fresh(self):
+        # The modules of the python path are imported afresh for each input of
+        # a batch, so they can't carry state from one input to the next.
+        pylib = os.path.dirname(__file__) + "/test_files/pylib"
+        code = textwrap.dedent("""\
+            import constant
+            count = getattr(constant, 'count', 0) + 1
+            constant.count = count
+            """)
+        with patch.dict(sys.modules):
+            results = safe_exec_many(code, [({}, 1), ({}, 2), ({}, 3)], python_path=[pylib], batch_size=3)
+        self.assertEqual([(emsg, globals_dict['count']) for emsg, globals_dict in results], [(None, 1)] * 3)
+
+    def test_batch_failure_falls_back(self):
+        # When a batch fails as a whole, each input is executed on its own.
+        # The module, which the package's safe_exec function hides.
+        safe_exec_module = sys.modules['capa.safe_exec.safe_exec']
+        with patch.object(safe_exec_module, 'BATCH_DRIVER', "1/0"):
+            results = safe_exec_many("b = 1 / a", [({'a': 0}, 1), ({'a': 2}, 1)])
+        self.assertIn("ZeroDivisionError", results[0][0])
+        self.assertEqual(results[1], (None, {'a': 2, 'b': 0.5}))
+
+
 class TestUpdateHash(unittest.TestCase):
     """Test the safe_exec.update_hash function to be sure it canonicalizes properly."""
 
@@ -0,0 +1,75 @@
+"""Tests the parsed problem cache of LoncapaProblem."""
+
+import textwrap
+import unittest
+
+from mock import patch
+
+from . import new_loncapa_problem
+from capa.capa_problem import LoncapaProblem, PARSED_PROBLEM_CACHE
+
+
+class ParsedProblemCacheTest(unittest.TestCase):
+    """Tests reusing the seed-independent results of parsing a problem."""
+
+    xml_str = textwrap.dedent("""
+        <problem>
+        <multiplechoiceresponse>
+          <choicegroup type="MultipleChoice" shuffle="true">
+            <choice correct="false">Apple</choice>
+            <choice correct="false">Banana</choice>
+            <choice correct="false">Chocolate</choice>
+            <choice correct ="true">Donut</choice>
+          </choicegroup>
+        </multiplechoiceresponse>
+        <stringresponse answer="Michigan">
+          <textline size="20"/>
+        </stringresponse>
+        </problem>
+    """)
+
+    def setUp(self):
+        super(ParsedProblemCacheTest, self).setUp()
+        PARSED_PROBLEM_CACHE.clear()
+        self.addCleanup(PARSED_PROBLEM_CACHE.clear)
+
+    def test_parsed_once(self):
+        first = new_loncapa_problem(self.xml_str, seed=0)
+        with patch.object(LoncapaProblem, 'make_xml_compatible') as mock_make_xml_compatible:
+            second = new_loncapa_problem(self.xml_str, seed=0)
+        self.assertFalse(mock_make_xml_compatible.called)
+
+        self.assertEqual(first.get_html(), second.get_html())
+        self.assertEqual(sorted(first.get_question_answers()), sorted(second.get_question_answers()))
+        self.assertIsNot(first.tree, second.tree)
+
+    def test_seed_dependent_results(self):
+        # shuffling 4 things with seed of 0 yields: B A C D
+        first = new_loncapa_problem(self.xml_str, seed=0)
+        self.assertRegexpMatches(first.get_html(), r"<div>.*\[.*'Banana'.*'Apple'.*'Chocolate'.*'Donut'.*\].*</div>")
+
+        # A problem copied from the cache is the same as one parsed from scratch
+        second = new_loncapa_problem(self.xml_str, seed=1)
+        PARSED_PROBLEM_CACHE.clear()
+        self.assertEqual(second.get_html(), new_loncapa_problem(self.xml_str, seed=1).get_html())
+
+        # Each problem's responders refer to the elements of its own tree
+        for problem in (first, second):
+            for response in problem.responders:
+                self.assertIs(response.getroottree().getroot(), problem.tree)
+
+    def test_grading(self):
+        new_loncapa_problem(self.xml_str)
+        problem = new_loncapa_problem(self.xml_str)
+        correct_map = problem.grade_answers({'1_3_1': 'Michigan'})
+        self.assertTrue(correct_map.is_correct('1_3_1'))
+
+    def test_includes_not_cached(self):
+        xml_str = textwrap.dedent("""
+            <problem>
+            <include file="nonexistent.xml"/>
+            <stringresponse answer="Michigan"><textline size="20"/></stringresponse>
+            </problem>
+        """)
+        new_loncapa_problem(xml_str)
+        self.assertIsNone(PARSED_PROBLEM_CACHE.get(PARSED_PROBLEM_CACHE.key('1', xml_str)))
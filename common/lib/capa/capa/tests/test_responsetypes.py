@@ -591,6 +591,40 @@ class FormulaResponseTest(ResponseTest):
         self.assertTrue(problem.responders.values()[0].validate_answer('14*x'))
         self.assertFalse(problem.responders.values()[0].validate_answer('3*y+2*x'))
 
+    def test_get_scores(self):
+        """
+        Test grading many answers at once.
+        """
+        sample_dict = {'x': (-10, 10), 'y': (-10, 10)}
+        problem = self.build_problem(sample_dict=sample_dict,
+                                     num_samples=10,
+                                     tolerance=0.01,
+                                     answer="x+2*y")
+        responder = problem.responders.values()[0]
+        answers = ["2*x - x + y + y", "x + y", "x+2*y", "x + y", "x + z", "2*x - x + y + y"]
+        scores = responder.get_scores(answers)
+
+        self.assertEqual(
+            [score and score.get_correctness('1_2_1') for score in scores],
+            ["correct", "incorrect", "correct", "incorrect", None, "correct"]
+        )
+        for answer, score in zip(answers, scores):
+            if score is not None:
+                self.assertEqual(score.get_dict(), responder.get_score({'1_2_1': answer}).get_dict())
+
+    def test_get_scores_evaluates_answers_once(self):
+        """
+        Test that each distinct answer is evaluated once for all the samples.
+        """
+        problem = self.build_problem(sample_dict={'x': (1, 2)},
+                                     num_samples=10,
+                                     tolerance="1%",
+                                     answer="x")
+        responder = problem.responders.values()[0]
+        with mock.patch.object(responder, 'tupleize_answers', wraps=responder.tupleize_answers) as mock_tupleize:
+            responder.get_scores(["x", "2*x", "x", "x", "2*x"])
+        self.assertEqual(mock_tupleize.call_count, 3)
+
 
 class StringResponseTest(ResponseTest):  # pylint: disable=missing-docstring
     xml_factory_class = StringResponseXMLFactory
@@ -1639,6 +1673,40 @@ class NumericalResponseTest(ResponseTest):  # pylint: disable=missing-docstring
         self.assertTrue(responder.validate_answer('23.5'))
         self.assertFalse(responder.validate_answer('fish'))
 
+    def test_get_scores(self):
+        """Tests grading many answers at once."""
+        problem = self.build_problem(answer="42", tolerance=1, credit_type='close')
+        responder = problem.responders.values()[0]
+        scores = responder.get_scores(['42', '6*7', '44', '50', 'fish', '42'])
+        self.assertEqual(
+            [score and score.get_correctness('1_2_1') for score in scores],
+            ['correct', 'correct', 'partially-correct', 'incorrect', None, 'correct']
+        )
+        self.assertEqual(scores[2].get_npoints('1_2_1'), 0.5)
+
+    def test_prepared_scores(self):
+        """Tests that rescoring uses the scores prepared for many answers at once."""
+        scores_cache = {}
+        capa_system = test_capa_system()
+        capa_system.cache = mock.Mock(get=scores_cache.get, set=scores_cache.__setitem__)
+        problem = self.build_problem(capa_system=capa_system, answer="42", tolerance=1)
+        responder = problem.responders.values()[0]
+        responder.prepare_scores(['42', '44', 'fish', '44'])
+        self.assertEqual(len(scores_cache), 2)
+
+        problem.student_answers = {'1_2_1': '44'}
+        with mock.patch.object(responder, 'get_score', wraps=responder.get_score) as mock_get_score:
+            self.assertEqual(problem.rescore_existing_answers().get_correctness('1_2_1'), 'incorrect')
+            self.assertFalse(mock_get_score.called)
+            # Checking an answer still grades it.
+            self.assertEqual(problem.grade_answers({'1_2_1': '44'}).get_correctness('1_2_1'), 'incorrect')
+            self.assertTrue(mock_get_score.called)
+
+        # The scores aren't used for a different definition of the response.
+        problem = self.build_problem(capa_system=capa_system, answer="44", tolerance=1)
+        problem.student_answers = {'1_2_1': '44'}
+        self.assertEqual(problem.rescore_existing_answers().get_correctness('1_2_1'), 'correct')
+
 
 class CustomResponseTest(ResponseTest):  # pylint: disable=missing-docstring
     xml_factory_class = CustomResponseXMLFactory
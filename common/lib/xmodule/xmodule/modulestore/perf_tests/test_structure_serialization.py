@@ -0,0 +1,119 @@
+"""
+Performance test comparing the course structure cache serialization formats.
+"""
+import datetime
+import itertools
+import unittest
+
+import ddt
+from bson.objectid import ObjectId
+from nose.plugins.skip import SkipTest
+
+from xmodule.modulestore import BlockData
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.structure_serializers import (
+    STRUCTURE_SERIALIZERS, dumps_structure, loads_structure
+)
+
+# The dependency below needs to be installed manually from the development.txt file, which doesn't
+# get installed during unit tests!
+try:
+    from code_block_timer import CodeBlockTimer
+except ImportError:
+    CodeBlockTimer = None
+
+# Number of blocks in the generated structures.
+BLOCK_AMOUNT_PER_TEST = (100, 1000, 10000, 50000)
+
+# Number of leaf blocks under each vertical in the generated structures.
+VERTICAL_SIZE = 5
+
+
+def make_structure(num_blocks):
+    """
+    Generate a structure shaped like a course: a root with verticals, each
+    with VERTICAL_SIZE problems, all published in the same version.
+    """
+    version = ObjectId()
+    edit_info = {
+        'edited_on': datetime.datetime(2015, 1, 1),
+        'edited_by': 1,
+        'update_version': version,
+        'previous_version': None,
+        'source_version': version,
+    }
+    root = BlockKey('course', 'course')
+    blocks = {}
+    verticals = []
+    for vertical_num in xrange(num_blocks // (VERTICAL_SIZE + 1)):
+        vertical = BlockKey('vertical', 'vertical_{}'.format(vertical_num))
+        children = [
+            BlockKey('problem', 'problem_{}_{}'.format(vertical_num, problem_num))
+            for problem_num in xrange(VERTICAL_SIZE)
+        ]
+        for child in children:
+            blocks[child] = BlockData(
+                block_type=child.type,
+                definition=ObjectId(),
+                fields={'display_name': child.id, 'weight': 1.0},
+                edit_info=edit_info,
+            )
+        blocks[vertical] = BlockData(
+            block_type=vertical.type,
+            definition=ObjectId(),
+            fields={'display_name': vertical.id, 'children': children},
+            edit_info=edit_info,
+        )
+        verticals.append(vertical)
+    blocks[root] = BlockData(
+        block_type=root.type, definition=ObjectId(), fields={'children': verticals}, edit_info=edit_info
+    )
+    return {
+        '_id': version,
+        'root': root,
+        'previous_version': None,
+        'original_version': version,
+        'edited_by': 1,
+        'edited_on': datetime.datetime(2015, 1, 1),
+        'blocks': blocks,
+        'schema_version': 1,
+    }
+
+
+@ddt.ddt
+# Eventually, exclude this attribute from regular unittests while running *only* tests
+# with this attribute during regular performance tests.
+# @attr("perf_test")
+@unittest.skip
+class StructureSerializationTest(unittest.TestCase):
+    """
+    This class exists to compare the size and the encode/decode time of the
+    structure cache serialization formats.
+    """
+
+    # Use this attr to skip this test on regular unittest CI runs.
+    perf_test = True
+
+    @ddt.data(*itertools.product(
+        sorted(STRUCTURE_SERIALIZERS),
+        BLOCK_AMOUNT_PER_TEST,
+    ))
+    @ddt.unpack
+    def test_generate_serialization_timings(self, tag, num_blocks):
+        """
+        Generate timings and sizes for different formats and structure sizes.
+        """
+        if CodeBlockTimer is None:
+            raise SkipTest("CodeBlockTimer undefined.")
+
+        structure = make_structure(num_blocks)
+        desc = "StructureSerialization:{}:{}".format(tag, num_blocks)
+
+        with CodeBlockTimer(desc):
+            with CodeBlockTimer("encode"):
+                data = dumps_structure(structure, tag)
+
+            with CodeBlockTimer("decode:{}_bytes".format(len(data))):
+                decoded = loads_structure(data)
+
+        self.assertEqual(decoded, structure)
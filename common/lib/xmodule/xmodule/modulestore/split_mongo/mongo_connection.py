@@ -2,12 +2,12 @@
 Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
 """
 import datetime
-import cPickle as pickle
 import math
-import zlib
 import pymongo
 import pytz
 import re
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
 from time import time
 
@@ -15,6 +15,7 @@ from time import time
 from pymongo.errors import DuplicateKeyError  # pylint: disable=unused-import
 
 try:
+    from django.conf import settings
     from django.core.cache import caches, InvalidCacheBackendError
     DJANGO_AVAILABLE = True
 except ImportError:
@@ -27,6 +28,9 @@ from mongodb_proxy import autoretry_read
 from xmodule.exceptions import HeartbeatFailure
 from xmodule.modulestore import BlockData
 from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.structure_serializers import (
+    DEFAULT_STRUCTURE_SERIALIZER, STRUCTURE_SERIALIZERS, dumps_structure, loads_structure
+)
 from xmodule.mongo_connection import connect_to_mongodb
 
 
@@ -223,58 +227,155 @@ def structure_to_mongo(structure, course_context=None):
         return new_structure
 
 
+class LocalStructureCache(object):
+    """
+    A process-local, size-bounded LRU cache of serialized structures, used by
+    :class:`CourseStructureCache` in front of the remote cache.
+
+    Structures are immutable per structure id, so entries never need to be
+    invalidated. The serialized values are kept (rather than the structure
+    objects) because callers mutate the structures they are handed, and
+    because their size is known exactly.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the serialized structure stored for `key`, or None.
+        """
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                # re-insert to mark the entry as the most recently used
+                self._entries[key] = value
+            return value
+
+    def set(self, key, value):
+        """
+        Store the serialized structure `value` for `key`, evicting the least
+        recently used entries to stay within `max_bytes`. Returns the number of
+        evicted entries.
+        """
+        if len(value) > self.max_bytes:
+            return 0
+
+        evictions = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            while self._entries and self.current_bytes + len(value) > self.max_bytes:
+                __, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                evictions += 1
+            self._entries[key] = value
+            self.current_bytes += len(value)
+        return evictions
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+# The process-wide local cache tier, created on first use with the byte
+# budget from the COURSE_STRUCTURE_LOCAL_CACHE_BYTES setting.
+_LOCAL_STRUCTURE_CACHE = None
+
+
+def get_local_structure_cache():
+    """
+    Return the process-wide :class:`LocalStructureCache`, or None if it is
+    disabled (the default, and whenever Django isn't available).
+    """
+    global _LOCAL_STRUCTURE_CACHE  # pylint: disable=global-statement
+    if _LOCAL_STRUCTURE_CACHE is None and DJANGO_AVAILABLE:
+        max_bytes = getattr(settings, 'COURSE_STRUCTURE_LOCAL_CACHE_BYTES', 0)
+        if max_bytes:
+            _LOCAL_STRUCTURE_CACHE = LocalStructureCache(max_bytes)
+    return _LOCAL_STRUCTURE_CACHE
+
+
 class CourseStructureCache(object):
     """
     Wrapper around django cache object to cache course structure objects.
-    The course structures are pickled and compressed when cached.
+    The course structures are serialized with one of the formats in
+    `structure_serializers` (selected by the COURSE_STRUCTURE_CACHE_SERIALIZER
+    setting) and tagged with it, so entries in any known format can be read.
 
     If the 'course_structure_cache' doesn't exist, then don't do anything for
     for set and get.
     """
     def __init__(self):
         self.cache = None
+        self.local_cache = None
+        self.serializer_tag = DEFAULT_STRUCTURE_SERIALIZER
         if DJANGO_AVAILABLE:
             try:
                 self.cache = get_cache('course_structure_cache')
             except InvalidCacheBackendError:
                 pass
+            else:
+                self.local_cache = get_local_structure_cache()
+            self.serializer_tag = getattr(settings, 'COURSE_STRUCTURE_CACHE_SERIALIZER', self.serializer_tag)
 
     def get(self, key, course_context=None):
-        """Pull the compressed, pickled struct data from cache and deserialize."""
+        """Pull the serialized struct data from cache and deserialize."""
         if self.cache is None:
             return None
 
         with TIMER.timer("CourseStructureCache.get", course_context) as tagger:
-            compressed_pickled_data = self.cache.get(key)
-            tagger.tag(from_cache=str(compressed_pickled_data is not None).lower())
+            serialized_data = None
+            if self.local_cache is not None:
+                serialized_data = self.local_cache.get(key)
+                tagger.tag(from_local_cache=str(serialized_data is not None).lower())
+
+            if serialized_data is None:
+                serialized_data = self.cache.get(key)
+                if serialized_data is not None:
+                    self._set_local(key, serialized_data, tagger)
 
-            if compressed_pickled_data is None:
+            tagger.tag(from_cache=str(serialized_data is not None).lower())
+
+            if serialized_data is None:
                 # Always log cache misses, because they are unexpected
                 tagger.sample_rate = 1
                 return None
 
-            tagger.measure('compressed_size', len(compressed_pickled_data))
-
-            pickled_data = zlib.decompress(compressed_pickled_data)
-            tagger.measure('uncompressed_size', len(pickled_data))
+            tagger.measure('compressed_size', len(serialized_data))
+            tag = serialized_data[:4]
+            tagger.tag(format=tag if tag in STRUCTURE_SERIALIZERS else 'legacy')
 
-            return pickle.loads(pickled_data)
+            return loads_structure(serialized_data)
 
     def set(self, key, structure, course_context=None):
-        """Given a structure, will pickle, compress, and write to cache."""
+        """Given a structure, will serialize and write it to cache."""
         if self.cache is None:
             return None
 
         with TIMER.timer("CourseStructureCache.set", course_context) as tagger:
-            pickled_data = pickle.dumps(structure, pickle.HIGHEST_PROTOCOL)
-            tagger.measure('uncompressed_size', len(pickled_data))
-
-            # 1 = Fastest (slightly larger results)
-            compressed_pickled_data = zlib.compress(pickled_data, 1)
-            tagger.measure('compressed_size', len(compressed_pickled_data))
+            serialized_data = dumps_structure(structure, self.serializer_tag)
+            tagger.measure('compressed_size', len(serialized_data))
+            tagger.tag(format=self.serializer_tag)
 
             # Stuctures are immutable, so we set a timeout of "never"
-            self.cache.set(key, compressed_pickled_data, None)
+            self.cache.set(key, serialized_data, None)
+            self._set_local(key, serialized_data, tagger)
+
+    def _set_local(self, key, serialized_data, tagger):
+        """Store serialized data in the local cache tier, if it is enabled."""
+        if self.local_cache is None:
+            return
+
+        tagger.measure('local_cache_evictions', self.local_cache.set(key, serialized_data))
+        tagger.measure('local_cache_bytes', self.local_cache.current_bytes)
 
 
 class MongoConnection(object):
@@ -82,6 +82,7 @@ from ..exceptions import ItemNotFoundError
 from .caching_descriptor_system import CachingDescriptorSystem
 from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection, DuplicateKeyError
 from xmodule.modulestore.split_mongo import BlockKey, CourseEnvelope
+from xmodule.modulestore.split_mongo.structure_index import StructureIndex
 from xmodule.error_module import ErrorDescriptor
 from collections import defaultdict
 from types import NoneType
@@ -796,8 +797,24 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                 del self.request_cache.data.setdefault('course_cache', {})[course_version_guid]
             except KeyError:
                 pass
+            self.request_cache.data.setdefault('structure_index_cache', {}).pop(course_version_guid, None)
         else:
             self.request_cache.data['course_cache'] = {}
+            self.request_cache.data['structure_index_cache'] = {}
+
+    def _get_structure_index(self, structure):
+        """
+        Return the StructureIndex for this structure, reusing the one built earlier
+        in this request for the same structure version if there is one.
+        """
+        if self.request_cache is None:
+            return StructureIndex(structure)
+
+        index_cache = self.request_cache.data.setdefault('structure_index_cache', {})
+        index = index_cache.get(structure['_id'])
+        if index is None:
+            index = index_cache[structure['_id']] = StructureIndex(structure)
+        return index
 
     def _lookup_course(self, course_key, head_validation=True):
         """
@@ -1105,13 +1122,16 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         if settings is None:
             settings = {}
+        blocks = course.structure['blocks']
+        structure_index = self._get_structure_index(course.structure)
         if 'name' in qualifiers:
             # odd case where we don't search just confirm
             block_name = qualifiers.pop('name')
-            block_ids = []
-            for block_id, block in course.structure['blocks'].iteritems():
-                if block_name == block_id.id and _block_matches_all(block):
-                    block_ids.append(block_id)
+            block_ids = [
+                block_id
+                for block_id in structure_index.blocks_by_name.get(block_name, [])
+                if _block_matches_all(blocks[block_id])
+            ]
 
             return self._load_items(course, block_ids, **kwargs)
 
@@ -1121,8 +1141,12 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         # don't expect caller to know that children are in fields
         if 'children' in qualifiers:
             settings['children'] = qualifiers.pop('children')
-        for block_id, value in course.structure['blocks'].iteritems():
-            if _block_matches_all(value):
+
+        # narrow the search down using the structure's indexes where the criteria allow it
+        candidates = structure_index.find_candidates(qualifiers, settings)
+        block_ids = blocks.iterkeys() if candidates is None else candidates
+        for block_id in block_ids:
+            if _block_matches_all(blocks[block_id]):
                 items.append(block_id)
 
         if len(items) > 0:
@@ -1139,13 +1163,7 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         :return Bool: whether or not component has path to the root
         """
-
-        xblock_parents = self._get_parents_from_structure(block_key, course.structure)
-        if len(xblock_parents) == 0 and block_key.type in ["course", "library"]:
-            # Found, xblock has the path to the root
-            return True
-
-        return any(self.has_path_to_root(xblock_parent, course) for xblock_parent in xblock_parents)
+        return self._get_structure_index(course.structure).has_path_to_root(block_key)
 
     def get_parent_location(self, locator, **kwargs):
         """
@@ -1160,14 +1178,15 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             raise ItemNotFoundError(locator)
 
         course = self._lookup_course(locator.course_key)
-        all_parent_ids = self._get_parents_from_structure(BlockKey.from_usage_key(locator), course.structure)
+        structure_index = self._get_structure_index(course.structure)
+        all_parent_ids = structure_index.get_parents(BlockKey.from_usage_key(locator))
 
         # Check and verify the found parent_ids are not orphans; Remove parent which has no valid path
         # to the course root
         parent_ids = [
             valid_parent
             for valid_parent in all_parent_ids
-            if self.has_path_to_root(valid_parent, course)
+            if structure_index.has_path_to_root(valid_parent)
         ]
 
         if len(parent_ids) == 0:
@@ -1191,16 +1210,12 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         detached_categories = [name for name, __ in XBlock.load_tagged_classes("detached")]
         course = self._lookup_course(course_key)
-        items = set(course.structure['blocks'].keys())
-        items.remove(course.structure['root'])
-        blocks = course.structure['blocks']
-        for block_id, block_data in blocks.iteritems():
-            items.difference_update(BlockKey(*child) for child in block_data.fields.get('children', []))
-            if block_data.block_type in detached_categories:
-                items.discard(block_id)
+        parents = self._get_structure_index(course.structure).parents
+        root = course.structure['root']
         return [
             course_key.make_usage_key(block_type=block_id.type, block_id=block_id.id)
-            for block_id in items
+            for block_id, block_data in course.structure['blocks'].iteritems()
+            if block_id != root and block_id not in parents and block_data.block_type not in detached_categories
         ]
 
     def get_course_index_info(self, course_key):
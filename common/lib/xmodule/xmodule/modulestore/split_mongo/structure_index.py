@@ -0,0 +1,198 @@
+"""
+In-memory indexes over the blocks of a single split modulestore structure version.
+
+Structure versions are immutable once they have been persisted, so an index
+built for a structure id stays valid until the structure is rewritten through
+`SplitMongoModuleStore.update_structure`, which discards it.
+"""
+import re
+from collections import defaultdict
+
+from xmodule.modulestore.split_mongo import BlockKey
+
+
+def _is_indexable(value):
+    """
+    Can `value` be looked up in an index, i.e. does `_value_matches` compare
+    it with plain equality?
+    """
+    if isinstance(value, (list, dict, re._pattern_type)) or callable(value):  # pylint: disable=protected-access
+        return False
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class StructureIndex(object):
+    """
+    Lazily built lookup tables for one structure.
+
+    Only the read paths of the modulestore should use an index: code which
+    mutates a structure in place must keep scanning `structure['blocks']`.
+    """
+    # Block types which may be the root of a structure
+    ROOT_TYPES = ('course', 'library')
+
+    def __init__(self, structure):
+        self.structure = structure
+        self._parents = None
+        self._rooted = None
+        self._by_type = None
+        self._by_name = None
+        self._by_field = {}
+
+    @property
+    def parents(self):
+        """
+        A dict mapping each BlockKey to the list of BlockKeys of its parents.
+        Blocks without parents are not present.
+        """
+        if self._parents is None:
+            parents = defaultdict(list)
+            for parent_key, block_data in self.structure['blocks'].iteritems():
+                for child in block_data.fields.get('children', []):
+                    child_parents = parents[BlockKey(*child)]
+                    if parent_key not in child_parents:
+                        child_parents.append(parent_key)
+            self._parents = dict(parents)
+        return self._parents
+
+    def get_parents(self, block_key):
+        """
+        Return the BlockKeys of the parents of `block_key` in the structure.
+        """
+        return self.parents.get(block_key, [])
+
+    def has_path_to_root(self, block_key):
+        """
+        Return whether `block_key` is reachable from a parentless course or
+        library block by following children links.
+        """
+        if block_key.type in self.ROOT_TYPES and block_key not in self.parents:
+            return True
+
+        if self._rooted is None:
+            parents = self.parents
+            blocks = self.structure['blocks']
+            rooted = set(
+                key for key in blocks
+                if key.type in self.ROOT_TYPES and key not in parents
+            )
+            stack = list(rooted)
+            while stack:
+                block_data = blocks.get(stack.pop())
+                if block_data is None:
+                    continue
+                for child in block_data.fields.get('children', []):
+                    child = BlockKey(*child)
+                    if child not in rooted:
+                        rooted.add(child)
+                        stack.append(child)
+            self._rooted = rooted
+        return block_key in self._rooted
+
+    @property
+    def blocks_by_type(self):
+        """
+        A dict mapping each block type to the list of BlockKeys of that type.
+        """
+        if self._by_type is None:
+            by_type = defaultdict(list)
+            for block_key, block_data in self.structure['blocks'].iteritems():
+                by_type[block_data.block_type].append(block_key)
+            self._by_type = dict(by_type)
+        return self._by_type
+
+    @property
+    def blocks_by_name(self):
+        """
+        A dict mapping each block id to the list of BlockKeys with that id.
+        """
+        if self._by_name is None:
+            by_name = defaultdict(list)
+            for block_key in self.structure['blocks']:
+                by_name[block_key.id].append(block_key)
+            self._by_name = dict(by_name)
+        return self._by_name
+
+    def _field_index(self, field_name):
+        """
+        Return a tuple (by_value, has_field, unindexed) for a settings field:
+        a dict mapping each value of the field (or each element of list values)
+        to the BlockKeys having it, the BlockKeys which set the field at all,
+        and the BlockKeys whose value could not be indexed.
+        """
+        if field_name not in self._by_field:
+            by_value = defaultdict(list)
+            has_field = []
+            unindexed = []
+            for block_key, block_data in self.structure['blocks'].iteritems():
+                if field_name not in block_data.fields:
+                    continue
+                has_field.append(block_key)
+                value = block_data.fields[field_name]
+                values = value if isinstance(value, list) else [value]
+                if not all(_is_indexable(element) for element in values):
+                    unindexed.append(block_key)
+                    continue
+                for element in set(values):
+                    by_value[element].append(block_key)
+            self._by_field[field_name] = (dict(by_value), has_field, unindexed)
+        return self._by_field[field_name]
+
+    @staticmethod
+    def _lookup(by_value, unindexed, criteria):
+        """
+        Return the BlockKeys which may match `criteria` according to `by_value`,
+        or None if the criteria cannot be answered from an index.
+        """
+        if isinstance(criteria, dict):
+            if criteria.keys() == ['$in'] and all(_is_indexable(value) for value in criteria['$in']):
+                matches = []
+                for value in criteria['$in']:
+                    matches.extend(by_value.get(value, []))
+                return matches + unindexed
+            return None
+        if _is_indexable(criteria):
+            return by_value.get(criteria, []) + unindexed
+        return None
+
+    def find_candidates(self, qualifiers, settings):
+        """
+        Use the indexes to narrow down which blocks may match the get_items
+        `qualifiers` (with 'category' already renamed to 'block_type') and
+        `settings` criteria. Every returned block must still be checked against
+        the full criteria.
+
+        Returns a list of distinct BlockKeys, in no particular order, or None
+        if none of the criteria can be answered from an index.
+        """
+        candidate_lists = []
+        if 'block_type' in qualifiers:
+            type_matches = self._lookup(self.blocks_by_type, [], qualifiers['block_type'])
+            if type_matches is not None:
+                candidate_lists.append(type_matches)
+
+        for field_name, criteria in settings.iteritems():
+            by_value, has_field, unindexed = self._field_index(field_name)
+            if criteria == {'$exists': True}:
+                candidate_lists.append(has_field)
+            else:
+                field_matches = self._lookup(by_value, unindexed, criteria)
+                if field_matches is not None:
+                    candidate_lists.append(field_matches)
+
+        if not candidate_lists:
+            return None
+
+        candidate_lists.sort(key=len)
+        other_sets = [set(candidate_list) for candidate_list in candidate_lists[1:]]
+        result = []
+        seen = set()
+        for block_key in candidate_lists[0]:
+            if block_key not in seen and all(block_key in other_set for other_set in other_sets):
+                seen.add(block_key)
+                result.append(block_key)
+        return result
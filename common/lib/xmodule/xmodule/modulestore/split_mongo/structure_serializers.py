@@ -0,0 +1,217 @@
+"""
+Serialization formats for course structures stored in the `course_structure_cache`.
+
+Every format prefixes its output with a 4 byte version tag so that entries
+written in different formats (e.g. during a rollout) can coexist in the cache.
+Entries written before formats were tagged are zlib compressed pickles, which
+are recognised by the absence of a known tag.
+"""
+import cPickle as pickle
+import gc
+import zlib
+from contextlib import contextmanager
+
+from xmodule.modulestore import BlockData, EditInfo
+from xmodule.modulestore.split_mongo import BlockKey
+
+
+# The EditInfo attributes stored by the columnar format, in order
+EDIT_INFO_ATTRS = (
+    'previous_version',
+    'update_version',
+    'source_version',
+    'edited_on',
+    'edited_by',
+    'original_usage',
+    'original_usage_version',
+    '_subtree_edited_on',
+    '_subtree_edited_by',
+)
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Pause the cyclic garbage collector. Decoding a structure allocates tens of
+    thousands of objects which can't form cycles, and would otherwise trigger
+    many pointless collections.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+class PickleStructureSerializer(object):
+    """
+    Pickles the whole structure, including its BlockKey and BlockData objects,
+    and zlib compresses the result.
+    """
+    TAG = 'SPK1'
+
+    def dumps(self, structure):
+        """Serialize `structure` to a string (without the version tag)."""
+        return zlib.compress(pickle.dumps(structure, pickle.HIGHEST_PROTOCOL), 1)
+
+    def loads(self, data):
+        """Deserialize a structure serialized by :meth:`dumps`."""
+        with _gc_paused():
+            return pickle.loads(zlib.decompress(data))
+
+
+class ColumnarStructureSerializer(object):
+    """
+    Stores the blocks of a structure as parallel columns of builtin values:
+    block types and edit infos are interned into tables, children are stored
+    as positions in the block columns rather than as BlockKeys, and the
+    BlockData and EditInfo objects are rebuilt directly from their attribute
+    values on load.
+
+    Pickling builtins is smaller and much faster than pickling one object
+    graph per block, and rebuilding the objects skips the per-key validation
+    done by `structure_from_mongo`.
+    """
+    TAG = 'SCL1'
+
+    def dumps(self, structure):
+        """Serialize `structure` to a string (without the version tag)."""
+        blocks = structure['blocks']
+        block_keys = blocks.keys()
+        positions = {block_key: position for position, block_key in enumerate(block_keys)}
+
+        type_names = sorted(set(block_key.type for block_key in block_keys))
+        type_positions = {type_name: position for position, type_name in enumerate(type_names)}
+
+        def encode_key(block_key):
+            """Encode a reference to a block as its position, if it is in the structure."""
+            position = positions.get(block_key)
+            return position if position is not None else tuple(block_key)
+
+        # Most blocks share their edit info with many others (e.g. everything
+        # published together), so each distinct one is only stored once.
+        edit_infos = []
+        edit_info_positions = {}
+
+        block_types = []
+        block_ids = []
+        children = []
+        fields = []
+        definitions = []
+        defaults = []
+        block_edit_infos = []
+        for block_key in block_keys:
+            block_data = blocks[block_key]
+            block_types.append(type_positions[block_key.type])
+            block_ids.append(block_key.id)
+
+            block_fields = dict(block_data.fields)
+            block_children = block_fields.pop('children', None)
+            children.append(
+                None if block_children is None else [encode_key(BlockKey(*child)) for child in block_children]
+            )
+            fields.append(block_fields)
+            definitions.append(block_data.definition)
+            defaults.append(block_data.defaults)
+            edit_info = tuple(getattr(block_data.edit_info, attr) for attr in EDIT_INFO_ATTRS)
+            if edit_info not in edit_info_positions:
+                edit_info_positions[edit_info] = len(edit_infos)
+                edit_infos.append(edit_info)
+            block_edit_infos.append(edit_info_positions[edit_info])
+
+        header = {key: value for key, value in structure.iteritems() if key not in ('blocks', 'root')}
+        columns = (
+            header,
+            encode_key(structure['root']),
+            type_names,
+            block_types,
+            block_ids,
+            children,
+            fields,
+            definitions,
+            defaults,
+            edit_infos,
+            block_edit_infos,
+        )
+        return zlib.compress(pickle.dumps(columns, pickle.HIGHEST_PROTOCOL), 1)
+
+    def loads(self, data):
+        """Deserialize a structure serialized by :meth:`dumps`."""
+        with _gc_paused():
+            return self._decode(pickle.loads(zlib.decompress(data)))
+
+    def _decode(self, columns):
+        """Rebuild a structure from the columns built by :meth:`dumps`."""
+        (
+            header, root, type_names, block_types, block_ids, children,
+            fields, definitions, defaults, edit_infos, block_edit_infos,
+        ) = columns
+
+        # BlockKey._make skips the contract checks done by BlockKey.__new__
+        make_key = BlockKey._make  # pylint: disable=protected-access
+        block_keys = [
+            make_key((type_names[type_position], block_id))
+            for type_position, block_id in zip(block_types, block_ids)
+        ]
+
+        def decode_key(encoded):
+            """Decode a reference encoded by `dumps.encode_key`."""
+            return block_keys[encoded] if isinstance(encoded, int) else make_key(encoded)
+
+        edit_info_attrs = [dict(zip(EDIT_INFO_ATTRS, edit_info)) for edit_info in edit_infos]
+
+        blocks = {}
+        for position, block_key in enumerate(block_keys):
+            block_fields = fields[position]
+            block_children = children[position]
+            if block_children is not None:
+                block_fields['children'] = [decode_key(child) for child in block_children]
+
+            # EditInfo objects are mutable, so they can't be shared between blocks
+            edit_info = EditInfo.__new__(EditInfo)
+            edit_info.__dict__.update(edit_info_attrs[block_edit_infos[position]])
+
+            block_data = BlockData.__new__(BlockData)
+            block_data.__dict__.update({
+                'definition_loaded': False,
+                'fields': block_fields,
+                'block_type': block_key.type,
+                'definition': definitions[position],
+                'defaults': defaults[position],
+                'edit_info': edit_info,
+            })
+            blocks[block_key] = block_data
+
+        structure = header
+        structure['root'] = decode_key(root)
+        structure['blocks'] = blocks
+        return structure
+
+
+STRUCTURE_SERIALIZERS = {
+    serializer.TAG: serializer
+    for serializer in (PickleStructureSerializer(), ColumnarStructureSerializer())
+}
+
+DEFAULT_STRUCTURE_SERIALIZER = ColumnarStructureSerializer.TAG
+
+
+def dumps_structure(structure, tag=DEFAULT_STRUCTURE_SERIALIZER):
+    """
+    Serialize `structure` with the serializer registered for `tag`, and
+    prefix the result with the tag.
+    """
+    return tag + STRUCTURE_SERIALIZERS[tag].dumps(structure)
+
+
+def loads_structure(data):
+    """
+    Deserialize a structure serialized by :func:`dumps_structure`, or an
+    untagged zlib compressed pickle written before formats were tagged.
+    """
+    serializer = STRUCTURE_SERIALIZERS.get(data[:4])
+    if serializer is None:
+        return STRUCTURE_SERIALIZERS[PickleStructureSerializer.TAG].loads(data)
+    return serializer.loads(data[4:])
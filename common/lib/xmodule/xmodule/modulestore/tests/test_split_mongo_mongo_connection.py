@@ -1,7 +1,7 @@
 """ Test the behavior of split_mongo/MongoConnection """
 import unittest
 from mock import patch
-from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection
+from xmodule.modulestore.split_mongo.mongo_connection import LocalStructureCache, MongoConnection
 from xmodule.exceptions import HeartbeatFailure
 
 
@@ -17,3 +17,38 @@ class TestHeartbeatFailureException(unittest.TestCase):
 
             with self.assertRaises(HeartbeatFailure):
                 useless_conn.heartbeat()
+
+
+class TestLocalStructureCache(unittest.TestCase):
+    """ Test the size-bounded LRU behavior of the local structure cache """
+    def setUp(self):
+        super(TestLocalStructureCache, self).setUp()
+        self.cache = LocalStructureCache(10)
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', 'aaaa')
+        self.assertEqual(self.cache.get('a'), 'aaaa')
+        self.assertEqual(self.cache.current_bytes, 4)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set('a', 'aaaa')
+        self.cache.set('b', 'bbbb')
+        # reading 'a' makes 'b' the least recently used entry
+        self.cache.get('a')
+        self.assertEqual(self.cache.set('c', 'cccc'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 'aaaa')
+        self.assertEqual(self.cache.get('c'), 'cccc')
+        self.assertEqual(self.cache.current_bytes, 8)
+
+    def test_oversized_values_are_not_cached(self):
+        self.cache.set('a', 'aaaa')
+        self.assertEqual(self.cache.set('big', 'x' * 11), 0)
+        self.assertIsNone(self.cache.get('big'))
+        self.assertEqual(self.cache.get('a'), 'aaaa')
+
+    def test_replace_entry(self):
+        self.cache.set('a', 'aaaa')
+        self.cache.set('a', 'aa')
+        self.assertEqual(self.cache.current_bytes, 2)
@@ -0,0 +1,104 @@
+""" Test the in-memory indexes over split_mongo structures """
+import unittest
+
+from xmodule.modulestore import BlockData
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.structure_index import StructureIndex
+
+
+def _structure(tree, settings=None):
+    """
+    Build a structure from a dict mapping BlockKeys to lists of child BlockKeys,
+    and an optional dict mapping BlockKeys to additional settings fields.
+    """
+    settings = settings or {}
+    blocks = {}
+    for block_key, children in tree.iteritems():
+        fields = dict(settings.get(block_key, {}), children=children)
+        blocks[block_key] = BlockData(block_type=block_key.type, fields=fields)
+    return {
+        '_id': 'structure_id',
+        'root': BlockKey('course', 'course'),
+        'blocks': blocks,
+    }
+
+
+class TestStructureIndex(unittest.TestCase):
+    """ Test the parent index and root reachability of a StructureIndex """
+    def setUp(self):
+        super(TestStructureIndex, self).setUp()
+        self.course = BlockKey('course', 'course')
+        self.chapter = BlockKey('chapter', 'chapter')
+        self.sequential = BlockKey('sequential', 'sequential')
+        self.orphan = BlockKey('vertical', 'orphan')
+        self.orphan_child = BlockKey('html', 'orphan_child')
+        self.index = StructureIndex(_structure({
+            self.course: [self.chapter],
+            self.chapter: [self.sequential],
+            self.sequential: [],
+            self.orphan: [self.orphan_child],
+            self.orphan_child: [],
+        }))
+
+    def test_get_parents(self):
+        self.assertEqual(self.index.get_parents(self.sequential), [self.chapter])
+        self.assertEqual(self.index.get_parents(self.chapter), [self.course])
+        self.assertEqual(self.index.get_parents(self.course), [])
+        self.assertEqual(self.index.get_parents(self.orphan), [])
+
+    def test_has_path_to_root(self):
+        self.assertTrue(self.index.has_path_to_root(self.course))
+        self.assertTrue(self.index.has_path_to_root(self.sequential))
+        self.assertFalse(self.index.has_path_to_root(self.orphan))
+        self.assertFalse(self.index.has_path_to_root(self.orphan_child))
+
+    def test_duplicate_children(self):
+        parent = BlockKey('vertical', 'parent')
+        child = BlockKey('problem', 'child')
+        index = StructureIndex(_structure({parent: [child, child], child: []}))
+        self.assertEqual(index.get_parents(child), [parent])
+
+
+class TestStructureIndexCandidates(unittest.TestCase):
+    """ Test narrowing down get_items criteria with a StructureIndex """
+    def setUp(self):
+        super(TestStructureIndexCandidates, self).setUp()
+        self.course = BlockKey('course', 'course')
+        self.problem = BlockKey('problem', 'problem')
+        self.other_problem = BlockKey('problem', 'other_problem')
+        self.html = BlockKey('html', 'problem')
+        self.index = StructureIndex(_structure(
+            {
+                self.course: [self.problem, self.other_problem, self.html],
+                self.problem: [],
+                self.other_problem: [],
+                self.html: [],
+            },
+            {
+                self.problem: {'group_access': {1: [2]}, 'tags': ['a', 'b']},
+                self.other_problem: {'tags': ['b']},
+            }
+        ))
+
+    def test_by_type(self):
+        self.assertItemsEqual(
+            self.index.find_candidates({'block_type': 'problem'}, {}),
+            [self.problem, self.other_problem]
+        )
+        self.assertEqual(self.index.find_candidates({'block_type': 'video'}, {}), [])
+        self.assertItemsEqual(
+            self.index.find_candidates({'block_type': {'$in': ['html', 'course']}}, {}),
+            [self.html, self.course]
+        )
+
+    def test_by_name(self):
+        self.assertItemsEqual(self.index.blocks_by_name['problem'], [self.problem, self.html])
+
+    def test_by_settings(self):
+        self.assertEqual(self.index.find_candidates({}, {'group_access': {'$exists': True}}), [self.problem])
+        self.assertItemsEqual(self.index.find_candidates({}, {'tags': 'b'}), [self.problem, self.other_problem])
+        self.assertEqual(self.index.find_candidates({'block_type': 'problem'}, {'tags': 'a'}), [self.problem])
+
+    def test_unindexable_criteria(self):
+        self.assertIsNone(self.index.find_candidates({}, {'tags': lambda value: True}))
+        self.assertIsNone(self.index.find_candidates({'edited_by': 'someone'}, {}))
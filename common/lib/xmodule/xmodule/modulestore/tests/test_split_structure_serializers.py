@@ -0,0 +1,43 @@
+""" Test the serialization formats of the split_mongo course structure cache """
+import cPickle as pickle
+import unittest
+import zlib
+
+import ddt
+
+from xmodule.modulestore.perf_tests.test_structure_serialization import make_structure
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.structure_serializers import (
+    STRUCTURE_SERIALIZERS, dumps_structure, loads_structure
+)
+
+
+@ddt.ddt
+class TestStructureSerializers(unittest.TestCase):
+    """ Test that every format round trips structures """
+    def setUp(self):
+        super(TestStructureSerializers, self).setUp()
+        self.structure = make_structure(50)
+
+    @ddt.data(*STRUCTURE_SERIALIZERS.keys())
+    def test_round_trip(self, tag):
+        data = dumps_structure(self.structure, tag)
+        self.assertEqual(data[:4], tag)
+        decoded = loads_structure(data)
+        self.assertEqual(decoded, self.structure)
+        self.assertIsInstance(decoded['root'], BlockKey)
+        for block_key, block_data in decoded['blocks'].iteritems():
+            self.assertIsInstance(block_key, BlockKey)
+            for child in block_data.fields.get('children', []):
+                self.assertIsInstance(child, BlockKey)
+
+    @ddt.data(*STRUCTURE_SERIALIZERS.keys())
+    def test_dangling_children(self, tag):
+        missing = BlockKey('html', 'missing')
+        self.structure['blocks'][self.structure['root']].fields['children'].append(missing)
+        decoded = loads_structure(dumps_structure(self.structure, tag))
+        self.assertIn(missing, decoded['blocks'][decoded['root']].fields['children'])
+
+    def test_untagged_legacy_format(self):
+        data = zlib.compress(pickle.dumps(self.structure, pickle.HIGHEST_PROTOCOL), 1)
+        self.assertEqual(loads_structure(data), self.structure)
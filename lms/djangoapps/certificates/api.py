@@ -82,7 +82,7 @@ def get_certificates_for_user(username):
 
 
 def generate_user_certificates(student, course_key, course=None, insecure=False, generation_mode='batch',
-                               forced_grade=None):
+                               forced_grade=None, scores_client=None):
     """
     It will add the add-cert request into the xqueue.
 
@@ -103,6 +103,8 @@ def generate_user_certificates(student, course_key, course=None, insecure=False,
         in case of django command and `self` if student initiated the request.
         forced_grade - a string indicating to replace grade parameter. if present grading
                        will be skipped.
+        scores_client - an optional fetched ScoresClient of the student, used
+                        for grading, e.g. when generating certificates in bulk.
     """
     xqueue = XQueueCertInterface()
     if insecure:
@@ -113,7 +115,8 @@ def generate_user_certificates(student, course_key, course=None, insecure=False,
         course_key,
         course=course,
         generate_pdf=generate_pdf,
-        forced_grade=forced_grade
+        forced_grade=forced_grade,
+        scores_client=scores_client,
     )
     if cert.status in [CertificateStatuses.generating, CertificateStatuses.downloadable]:
         emit_certificate_event('created', student, course_key, course, {
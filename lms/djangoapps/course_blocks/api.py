@@ -2,11 +2,19 @@
 API entry point to the course_blocks app with top-level
 get_course_blocks and clear_course_from_cache functions.
 """
+from itertools import takewhile
+
 from django.core.cache import cache
 
-from openedx.core.lib.block_cache.block_cache import get_blocks, clear_block_cache
+from openedx.core.lib.block_cache.block_cache import (
+    clear_block_cache,
+    get_blocks,
+    get_collected_blocks,
+    transform_blocks,
+)
 from xmodule.modulestore.django import modulestore
 
+from . import transform_cache
 from .transformers import (
     library_content,
     start_date,
@@ -25,6 +33,10 @@ COURSE_BLOCK_ACCESS_TRANSFORMERS = [
     visibility.VisibilityTransformer(),
 ]
 
+# Names of the transformers whose results may be cached per user by
+# the transform_cache.
+CACHEABLE_TRANSFORMER_NAMES = frozenset(transformer.name() for transformer in COURSE_BLOCK_ACCESS_TRANSFORMERS)
+
 
 def get_course_blocks(
         user,
@@ -52,7 +64,10 @@ def get_course_blocks(
 
         transformers ([BlockStructureTransformer]) - The list of
             transformers whose transform methods are to be called.
-            If None, COURSE_BLOCK_ACCESS_TRANSFORMERS is used.
+            If None, COURSE_BLOCK_ACCESS_TRANSFORMERS is used.  When
+            the transform cache is enabled, the result of the leading
+            transformers in CACHEABLE_TRANSFORMER_NAMES is cached per
+            user.
 
     Returns:
         BlockStructureBlockData - A transformed block structure,
@@ -72,13 +87,24 @@ def get_course_blocks(
         # structures starting at the root block of the course.
         raise NotImplementedError
 
-    return get_blocks(
-        cache,
-        store,
-        CourseUsageInfo(root_block_usage_key.course_key, user),
-        root_block_usage_key,
-        COURSE_BLOCK_ACCESS_TRANSFORMERS if transformers is None else transformers,
-    )
+    usage_info = CourseUsageInfo(root_block_usage_key.course_key, user)
+    if transformers is None:
+        transformers = COURSE_BLOCK_ACCESS_TRANSFORMERS
+
+    if not transform_cache.is_enabled():
+        return get_blocks(cache, store, usage_info, root_block_usage_key, transformers)
+
+    block_structure = get_collected_blocks(cache, store, root_block_usage_key, transformers)
+    cacheable_transformers = list(takewhile(
+        lambda transformer: transformer.name() in CACHEABLE_TRANSFORMER_NAMES,
+        transformers,
+    ))
+    remaining_transformers = transformers[len(cacheable_transformers):]
+    if cacheable_transformers:
+        transform_cache.transform_blocks_with_cache(usage_info, block_structure, cacheable_transformers)
+    if remaining_transformers or not cacheable_transformers:
+        transform_blocks(usage_info, block_structure, remaining_transformers)
+    return block_structure
 
 
 def clear_course_from_cache(course_key):
@@ -94,4 +120,5 @@ def clear_course_from_cache(course_key):
     arbitrary access to an intermediate block will be supported.
     """
     course_usage_key = modulestore().make_course_usage_key(course_key)
+    transform_cache.clear_course(course_key)
     return clear_block_cache(cache, course_usage_key)
@@ -1,10 +1,17 @@
 """
 Signal handlers for invalidating cached data.
 """
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch.dispatcher import receiver
+from opaque_keys.edx.keys import CourseKey
 
+from courseware.models import StudentModule
+from openedx.core.djangoapps.course_groups.models import CourseUserGroup, CourseUserGroupPartitionGroup
+from openedx.core.djangoapps.user_api.models import UserCourseTag
+from student.models import CourseAccessRole, CourseEnrollment
 from xmodule.modulestore.django import SignalHandler
 
+from . import transform_cache
 from .api import clear_course_from_cache
 
 
@@ -25,3 +32,83 @@ def _listen_for_course_delete(sender, course_key, **kwargs):  # pylint: disable=
     exists.
     """
     clear_course_from_cache(course_key)
+
+
+@receiver(post_save, sender=CourseEnrollment)
+@receiver(post_delete, sender=CourseEnrollment)
+def _listen_for_enrollment_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates the user's cached transform results for the course
+    whenever their enrollment in it changes.
+    """
+    transform_cache.clear_user_course(instance.user_id, instance.course_id)
+
+
+@receiver(post_save, sender=CourseAccessRole)
+@receiver(post_delete, sender=CourseAccessRole)
+def _listen_for_course_role_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates the user's cached transform results for the course
+    whenever one of their roles in it changes, since beta testers see
+    blocks before they start.  Org wide roles have no course_id, and
+    only change the user's staff access, which is part of the cache key.
+    """
+    if isinstance(instance.course_id, CourseKey):
+        transform_cache.clear_user_course(instance.user_id, instance.course_id)
+
+
+@receiver(post_save, sender=UserCourseTag)
+@receiver(post_delete, sender=UserCourseTag)
+def _listen_for_course_tag_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates the user's cached transform results for the course
+    whenever one of their course tags changes, since these record the
+    user's groups in random user partitions.
+    """
+    transform_cache.clear_user_course(instance.user_id, instance.course_id)
+
+
+@receiver(post_save, sender=StudentModule)
+def _listen_for_library_content_state_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates the user's cached transform results for the course
+    whenever the state of one of their library content blocks changes,
+    since it records which of the library's children were selected.
+    """
+    if instance.module_type == 'library_content':
+        transform_cache.clear_user_course(instance.student_id, instance.course_id)
+
+
+@receiver(post_save, sender=CourseUserGroupPartitionGroup)
+@receiver(post_delete, sender=CourseUserGroupPartitionGroup)
+def _listen_for_cohort_partition_group_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates all cached transform results for the course whenever a
+    cohort is linked to a different content group.
+    """
+    transform_cache.clear_course(instance.course_user_group.course_id)
+
+
+@receiver(m2m_changed, sender=CourseUserGroup.users.through)
+def _listen_for_cohort_change(sender, instance, action, reverse, pk_set, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidates the users' cached transform results for the course
+    whenever they are added to or removed from one of its cohorts.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        # The instance is a user and pk_set contains the ids of groups.
+        if action == 'pre_clear':
+            groups = instance.course_groups.all()
+        else:
+            groups = CourseUserGroup.objects.filter(pk__in=pk_set)
+        user_course_pairs = set((instance.id, group.course_id) for group in groups)
+    else:
+        # The instance is a group and pk_set contains the ids of users.
+        user_ids = instance.users.values_list('id', flat=True) if action == 'pre_clear' else pk_set
+        user_course_pairs = set((user_id, instance.course_id) for user_id in user_ids)
+
+    for user_id, course_key in user_course_pairs:
+        transform_cache.clear_user_course(user_id, course_key)
@@ -0,0 +1,100 @@
+"""
+Tests for the course blocks transform cache.
+"""
+from mock import patch
+
+from student.models import CourseEnrollment
+from student.roles import CourseBetaTesterRole
+from student.tests.factories import CourseEnrollmentFactory, UserFactory
+
+from ..api import clear_course_from_cache, get_course_blocks
+from ..transformers.library_content import ContentLibraryTransformer
+from ..transformers.tests.test_helpers import BlockParentsMapTestCase, update_block
+from ..transformers.visibility import VisibilityTransformer
+
+
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_COURSE_BLOCKS_TRANSFORM_CACHE': True})
+class TransformCacheTestCase(BlockParentsMapTestCase):
+    """
+    Test caching the results of the course block access transformers.
+    """
+    def get_block_keys(self, user):
+        """
+        Returns the set of block keys that are accessible to the given
+        user, and the number of times the VisibilityTransformer was
+        executed to compute them.
+        """
+        with patch.object(
+            VisibilityTransformer, 'transform', autospec=True, side_effect=VisibilityTransformer.transform
+        ) as mock_transform:
+            block_keys = set(get_course_blocks(user, self.course.location).get_block_keys())
+        return block_keys, mock_transform.call_count
+
+    def hide_block(self, block_index):
+        """
+        Makes the requested block (index) visible to staff only.
+        """
+        block = self.get_block(block_index)
+        block.visible_to_staff_only = True
+        update_block(block)
+
+    def test_cached_result(self):
+        block_keys, call_count = self.get_block_keys(self.student)
+        self.assertEqual(block_keys, set(self.xblock_keys))
+        self.assertEqual(call_count, 1)
+
+        cached_block_keys, call_count = self.get_block_keys(self.student)
+        self.assertEqual(cached_block_keys, block_keys)
+        self.assertEqual(call_count, 0)
+
+    def test_cached_per_user(self):
+        self.get_block_keys(self.student)
+
+        other_student = UserFactory.create()
+        CourseEnrollmentFactory.create(user=other_student, course_id=self.course.id)
+        _, call_count = self.get_block_keys(other_student)
+        self.assertEqual(call_count, 1)
+
+    def test_course_publish(self):
+        self.get_block_keys(self.student)
+
+        self.hide_block(2)
+        clear_course_from_cache(self.course.id)
+        block_keys, call_count = self.get_block_keys(self.student)
+        self.assertEqual(call_count, 1)
+        self.assertEqual(block_keys, {self.xblock_keys[index] for index in (0, 1, 3, 4, 6)})
+
+    def test_enrollment_change(self):
+        self.get_block_keys(self.student)
+
+        CourseEnrollment.unenroll(self.student, self.course.id)
+        _, call_count = self.get_block_keys(self.student)
+        self.assertEqual(call_count, 1)
+
+    def test_beta_tester_role_change(self):
+        self.get_block_keys(self.student)
+
+        CourseBetaTesterRole(self.course.id).add_users(self.student)
+        _, call_count = self.get_block_keys(self.student)
+        self.assertEqual(call_count, 1)
+
+        CourseBetaTesterRole(self.course.id).remove_users(self.student)
+        _, call_count = self.get_block_keys(self.student)
+        self.assertEqual(call_count, 1)
+
+    def test_library_content_selected_on_cached_result(self):
+        self.get_block_keys(self.student)
+
+        with patch.object(
+            ContentLibraryTransformer, 'select_children', autospec=True,
+            side_effect=ContentLibraryTransformer.select_children,
+        ) as mock_select_children:
+            _, call_count = self.get_block_keys(self.student)
+        self.assertEqual(call_count, 0)
+        self.assertEqual(mock_select_children.call_count, 1)
+
+    @patch.dict('django.conf.settings.FEATURES', {'ENABLE_COURSE_BLOCKS_TRANSFORM_CACHE': False})
+    def test_disabled(self):
+        self.get_block_keys(self.student)
+        _, call_count = self.get_block_keys(self.student)
+        self.assertEqual(call_count, 1)
@@ -0,0 +1,212 @@
+"""
+An optional cache of the results of transforming a course's block
+structure for a user with the course block access transformers.
+
+The access transformers only remove blocks from the block structure, so
+their result is fully described by the relations between the blocks
+that remain.  Those relations are cached per user, course version and
+set of transformers, so that repeated requests by the same user can skip
+re-transforming all the blocks of the course.
+
+Rather than deleting cached results, they are invalidated by replacing
+generation tokens that are part of their cache keys: one token per
+course, replaced whenever the course is published, and one per user and
+course, replaced whenever the user's enrollment, cohort membership, course
+roles (e.g. beta tester) or library content selections in the course
+change (see signals.py).
+
+When a cached result is used, the ContentLibraryTransformer still selects
+the children of library_content blocks, so that the analytics events of
+the selections are published as on every uncached transform.
+
+The cache is enabled by the ENABLE_COURSE_BLOCKS_TRANSFORM_CACHE feature
+flag.
+"""
+from datetime import datetime, timedelta
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.timezone import UTC
+
+from lms.djangoapps.courseware.masquerade import get_course_masquerade
+from openedx.core.lib.block_cache.block_cache import transform_blocks
+from openedx.core.lib.cache_utils import zpickle, zunpickle
+
+from .transformers.library_content import ContentLibraryTransformer
+from .transformers.start_date import StartDateTransformer
+
+
+# Maximum number of seconds for which a transformed block structure is
+# cached.
+TRANSFORM_CACHE_TIMEOUT = 60 * 60
+
+
+def is_enabled():
+    """
+    Returns whether the results of transforming block structures are
+    to be cached.
+    """
+    return settings.FEATURES.get('ENABLE_COURSE_BLOCKS_TRANSFORM_CACHE', False)
+
+
+def transform_blocks_with_cache(usage_info, block_structure, transformers):
+    """
+    Mutates the given collected block structure as
+    block_cache.transform_blocks does, reusing the cached result of a
+    previous transform for the same user, course version and
+    transformers if there is one.
+
+    Only transformers whose transform methods do nothing but remove
+    blocks, depending solely on the state invalidated by the signals in
+    signals.py, may be given.
+
+    Arguments:
+        usage_info (CourseUsageInfo) - The course and user for which
+            the block structure is transformed.
+
+        block_structure (BlockStructureBlockData) - A collected block
+            structure, as returned by block_cache.get_collected_blocks.
+
+        transformers ([BlockStructureTransformer]) - The list of
+            transformers whose transform methods are to be called.
+    """
+    user = usage_info.user
+    if user.is_anonymous() or get_course_masquerade(user, usage_info.course_key):
+        transform_blocks(usage_info, block_structure, transformers)
+        return
+
+    cache_key = _get_result_cache_key(usage_info, transformers)
+    cached_block_children = cache.get(cache_key)
+    if cached_block_children is not None:
+        _publish_library_content_events(usage_info, block_structure, transformers)
+        block_structure._set_block_children(zunpickle(cached_block_children))  # pylint: disable=protected-access
+        return
+
+    # The timeout must be computed before transforming, since it
+    # depends on the blocks that the transformers remove.
+    timeout = _get_timeout(usage_info, block_structure, transformers)
+    transform_blocks(usage_info, block_structure, transformers)
+    if timeout > 0:
+        block_children = block_structure._get_block_children()  # pylint: disable=protected-access
+        cache.set(cache_key, zpickle(block_children), timeout)
+
+
+def clear_course(course_key):
+    """
+    Invalidates the cached transform results of all users for the
+    course with the given course_key.
+    """
+    _reset_token(_course_token_cache_key(course_key))
+
+
+def clear_user_course(user_id, course_key):
+    """
+    Invalidates the cached transform results of the user with the given
+    user_id for the course with the given course_key.
+    """
+    _reset_token(_user_token_cache_key(user_id, course_key))
+
+
+def _get_result_cache_key(usage_info, transformers):
+    """
+    Returns the cache key for the result of transforming the block
+    structure of usage_info's course for usage_info's user with the
+    given transformers.
+    """
+    course_key = usage_info.course_key
+    user_id = usage_info.user.id
+    course_token, user_token = _get_tokens([
+        _course_token_cache_key(course_key),
+        _user_token_cache_key(user_id, course_key),
+    ])
+    key_parts = [unicode(course_key), course_token, user_token, unicode(usage_info.has_staff_access)]
+    key_parts.extend(u'{}:{}'.format(transformer.name(), transformer.VERSION) for transformer in transformers)
+    return u'course_blocks.transforms.{}.{}'.format(
+        user_id,
+        md5(u'|'.join(key_parts).encode('utf-8')).hexdigest(),
+    )
+
+
+def _publish_library_content_events(usage_info, block_structure, transformers):
+    """
+    Publishes the analytics events of the library content selections
+    that the ContentLibraryTransformer among the given transformers, if
+    any, would have published while transforming the given collected
+    block structure.
+    """
+    for transformer in transformers:
+        if transformer.name() == ContentLibraryTransformer.name():
+            transformer.select_children(usage_info, block_structure)
+
+
+def _get_timeout(usage_info, block_structure, transformers):
+    """
+    Returns the number of seconds for which the result of transforming
+    the given block structure can be cached: at most
+    TRANSFORM_CACHE_TIMEOUT, and no later than the next time one of its
+    blocks starts, since the StartDateTransformer would then remove
+    fewer blocks.
+    """
+    timeout = TRANSFORM_CACHE_TIMEOUT
+    if StartDateTransformer.name() not in [transformer.name() for transformer in transformers]:
+        return timeout
+    if usage_info.has_staff_access:
+        return timeout
+
+    now = datetime.now(UTC())
+    for block_key in block_structure.get_block_keys():
+        start = StartDateTransformer.get_merged_start_date(block_structure, block_key)
+        if not start:
+            continue
+        starts = [start]
+
+        # Whether the user is a beta tester is not checked here, so
+        # both possible start dates are taken into account.
+        days_early_for_beta = block_structure.get_xblock_field(block_key, 'days_early_for_beta')
+        if days_early_for_beta is not None:
+            starts.append(start - timedelta(days_early_for_beta))
+
+        for start in starts:
+            if start > now:
+                timeout = min(timeout, int((start - now).total_seconds()) + 1)
+    return timeout
+
+
+def _get_tokens(token_cache_keys):
+    """
+    Returns the list of generation tokens stored at the given cache keys,
+    creating the ones that do not exist yet.
+    """
+    tokens = cache.get_many(token_cache_keys)
+    for token_cache_key in token_cache_keys:
+        if token_cache_key not in tokens:
+            token = uuid4().hex
+            # Another process may have created the token in the meantime.
+            if not cache.add(token_cache_key, token, None):
+                token = cache.get(token_cache_key, token)
+            tokens[token_cache_key] = token
+    return [tokens[token_cache_key] for token_cache_key in token_cache_keys]
+
+
+def _reset_token(token_cache_key):
+    """
+    Replaces the generation token stored at the given cache key.
+    """
+    cache.set(token_cache_key, uuid4().hex, None)
+
+
+def _course_token_cache_key(course_key):
+    """
+    Returns the cache key of the generation token of the given course.
+    """
+    return u'course_blocks.transforms.course.{}'.format(course_key)
+
+
+def _user_token_cache_key(user_id, course_key):
+    """
+    Returns the cache key of the generation token of the given user in
+    the given course.
+    """
+    return u'course_blocks.transforms.user.{}.{}'.format(user_id, course_key)
@@ -63,7 +63,37 @@ class ContentLibraryTransformer(BlockStructureTransformer):
         """
         Mutates block_structure based on the given usage_info.
         """
+        all_library_children, all_selected_children = self.select_children(usage_info, block_structure)
 
+        def check_child_removal(block_key):
+            """
+            Return True if selected block should be removed.
+
+            Block is removed if it is part of library_content, but has
+            not been selected for current user.
+            """
+            if block_key not in all_library_children:
+                return False
+            if block_key in all_selected_children:
+                return False
+            return True
+
+        # Check and remove all non-selected children from course
+        # structure.
+        block_structure.remove_block_if(
+            check_child_removal
+        )
+
+    def select_children(self, usage_info, block_structure):
+        """
+        Selects the children of each library_content block in
+        block_structure for the given usage_info's user, and publishes
+        the analytics events of the selections, without removing any
+        blocks.
+
+        Returns a tuple of the set of all the children of library_content
+        blocks and the set of those that were selected.
+        """
         all_library_children = set()
         all_selected_children = set()
         for block_key in block_structure.topological_traversal(
@@ -97,24 +127,7 @@ class ContentLibraryTransformer(BlockStructureTransformer):
                 self._publish_events(block_structure, block_key, previous_count, max_count, block_keys)
                 all_selected_children.update(usage_info.course_key.make_usage_key(s[0], s[1]) for s in selected)
 
-        def check_child_removal(block_key):
-            """
-            Return True if selected block should be removed.
-
-            Block is removed if it is part of library_content, but has
-            not been selected for current user.
-            """
-            if block_key not in all_library_children:
-                return False
-            if block_key in all_selected_children:
-                return False
-            return True
-
-        # Check and remove all non-selected children from course
-        # structure.
-        block_structure.remove_block_if(
-            check_child_removal
-        )
+        return all_library_children, all_selected_children
 
     @classmethod
     def _get_student_module(cls, user, course_key, block_key):
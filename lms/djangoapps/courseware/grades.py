@@ -1,7 +1,8 @@
 # Compute grades using real division, with no integer truncation
 from __future__ import division
-from collections import defaultdict
+from collections import Counter, defaultdict
 from functools import partial
+from itertools import islice
 import json
 import random
 import logging
@@ -10,6 +11,7 @@ from contextlib import contextmanager
 from django.conf import settings
 from django.test.client import RequestFactory
 from django.core.cache import cache
+from django.db import IntegrityError
 
 import dogstats_wrapper as dog_stats_api
 
@@ -23,15 +25,18 @@ from xmodule import graders
 from xmodule.graders import Score
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import ItemNotFoundError
-from .models import StudentModule
+from .models import PersistentSubsectionGrade, StudentModule, iterate_in_batches
 from .module_render import get_module_for_descriptor
 from opaque_keys import InvalidKeyError
-from opaque_keys.edx.keys import CourseKey
+from opaque_keys.edx.keys import CourseKey, UsageKey
 from openedx.core.djangoapps.signals.signals import GRADES_UPDATED
 
 
 log = logging.getLogger("edx.courseware")
 
+# The number of students whose scores are loaded at once by iterate_grades_for_batched
+GRADING_BATCH_SIZE = 100
+
 
 class MaxScoresCache(object):
     """
@@ -60,11 +65,11 @@ class MaxScoresCache(object):
         max scores -- any time a content change occurs, we change our cache
         keys.
         """
-        if course.subtree_edited_on is None:
-            # check for subtree_edited_on because old XML courses doesn't have this attribute
+        version = course_version_key(course)
+        if not version:
             cache_key = u"{}".format(course.id)
         else:
-            cache_key = u"{}.{}".format(course.id, course.subtree_edited_on.isoformat())
+            cache_key = u"{}.{}".format(course.id, version)
         return cls(cache_key)
 
     def fetch_from_remote(self, locations):
@@ -80,7 +85,7 @@ class MaxScoresCache(object):
 
     def push_to_remote(self):
         """
-        Update the remote cache
+        Update the remote cache with the updates made since the last push
         """
         if self._max_scores_updates:
             cache.set_many(
@@ -90,6 +95,9 @@ class MaxScoresCache(object):
                 },
                 60 * 60 * 24  # 1 day
             )
+            # The pushed values are now in the remote cache, so only push them again if they change
+            self._max_scores_cache.update(self._max_scores_updates)
+            self._max_scores_updates = {}
 
     def _remote_cache_key(self, location):
         """Convert a location to a remote cache key (add our prefixing)."""
@@ -127,6 +135,176 @@ class MaxScoresCache(object):
         return max_score
 
 
+class _ScoringInputs(object):
+    """
+    The per-student data needed to score problems: the FieldDataCache, the
+    ScoresClient, the submissions API scores and the MaxScoresCache.
+
+    Loading these is the most expensive part of grading, so it is deferred
+    until a subsection actually needs to be (re)computed. Batched grading
+    passes in everything but the FieldDataCache, which is then only built if
+    a module has to be instantiated for the student.
+    """
+    def __init__(
+            self, student, course, field_data_cache=None, scores_client=None,
+            submissions_scores=None, max_scores_cache=None
+    ):
+        self.student = student
+        self.course = course
+        self._field_data_cache = field_data_cache
+        self.scores_client = scores_client
+        self.submissions_scores = submissions_scores
+        self.max_scores_cache = max_scores_cache
+        # Whether the MaxScoresCache was loaded for this student only, and so
+        # should be pushed back to the cache once the student is graded
+        self.owns_max_scores_cache = False
+        self._loaded = False
+
+    @property
+    def field_data_cache(self):
+        """
+        The FieldDataCache used to instantiate modules, built on first use.
+        """
+        if self._field_data_cache is None:
+            self._field_data_cache = field_data_cache_for_grading(self.course, self.student)
+        return self._field_data_cache
+
+    def load(self):
+        """
+        Load everything that has not been loaded yet.
+        """
+        if self._loaded:
+            return
+
+        if self.scores_client is None:
+            with outer_atomic():
+                self.scores_client = ScoresClient.from_field_data_cache(self.field_data_cache)
+
+        if self.submissions_scores is None:
+            self.submissions_scores = _submissions_scores_for(self.student, self.course)
+
+        if self.max_scores_cache is None:
+            with outer_atomic():
+                max_scores_cache = MaxScoresCache.create_for_course(self.course)
+
+                # For the moment, we have to get scorable_locations from field_data_cache
+                # and not from scores_client, because scores_client is ignorant of things
+                # in the submissions API. As a further refactoring step, submissions should
+                # be hidden behind the ScoresClient.
+                max_scores_cache.fetch_from_remote(self.field_data_cache.scorable_locations)
+                self.max_scores_cache = max_scores_cache
+                self.owns_max_scores_cache = True
+
+        self._loaded = True
+
+
+def _submissions_scores_for(student, course):
+    """
+    Return a dict of item_ids -> (earned, possible) point tuples. This *only*
+    grabs scores that were registered with the submissions API, which for the
+    moment means only openassessment (edx-ora2).
+    """
+    # We need to import this here to avoid a circular dependency of the form:
+    # XBlock --> submissions --> Django Rest Framework error strings -->
+    # Django translation --> ... --> courseware --> submissions
+    from submissions import api as sub_api  # installed from the edx-submissions repository
+
+    with outer_atomic():
+        return sub_api.get_scores(
+            course.id.to_deprecated_string(),
+            anonymous_id_for_user(student, course.id)
+        )
+
+
+class PersistentGradesStore(object):
+    """
+    Reads and writes the PersistentSubsectionGrade rows of one student in one
+    course. All rows are fetched with a single query when the store is created.
+
+    Does nothing unless the ENABLE_PERSISTENT_GRADES feature is enabled, nor
+    for courses without a published version (e.g. XML courses), whose grades
+    could never be told apart from the grades of an older version.
+    """
+    def __init__(self, student, course):
+        self.student = student
+        self.course_id = course.id
+        self.course_version = course_version_key(course)
+        self.enabled = (
+            settings.FEATURES.get('ENABLE_PERSISTENT_GRADES', False) and
+            bool(self.course_version) and
+            student.is_authenticated()
+        )
+        self._grades = {}
+        if self.enabled:
+            with outer_atomic():
+                self._grades = {
+                    row.usage_key.map_into_course(self.course_id): row
+                    for row in PersistentSubsectionGrade.objects.filter(user=student, course_id=course.id)
+                }
+
+    def get(self, location, section_name):
+        """
+        Return a tuple (graded_total, raw_scores) for the subsection at
+        `location`, or None if there is no up to date persisted grade.
+        """
+        row = self._grades.get(location)
+        if row is None or row.course_version != self.course_version:
+            return None
+
+        graded_total = Score(row.earned_graded, row.possible_graded, True, section_name, None)
+        scores = [
+            Score(
+                earned,
+                possible,
+                graded,
+                display_name,
+                UsageKey.from_string(module_id).map_into_course(self.course_id)
+            )
+            for earned, possible, graded, display_name, module_id in json.loads(row.raw_scores)
+        ]
+        return graded_total, scores
+
+    def set(self, location, graded_total, scores):
+        """
+        Persist the graded total and per-problem scores of a subsection.
+        """
+        if not self.enabled:
+            return
+
+        raw_scores = json.dumps([
+            [score.earned, score.possible, score.graded, score.section, unicode(score.module_id)]
+            for score in scores
+        ])
+        lookup = {'user': self.student, 'course_id': self.course_id, 'usage_key': location}
+        values = {
+            'course_version': self.course_version,
+            'earned_graded': graded_total.earned,
+            'possible_graded': graded_total.possible,
+            'raw_scores': raw_scores,
+        }
+        try:
+            with outer_atomic():
+                row, __ = PersistentSubsectionGrade.objects.update_or_create(defaults=values, **lookup)
+        except IntegrityError:
+            # Another request graded the student at the same time and created
+            # the row first, so overwrite it with this grade instead.
+            with outer_atomic():
+                PersistentSubsectionGrade.objects.filter(**lookup).update(**values)
+                row = PersistentSubsectionGrade.objects.get(**lookup)
+        self._grades[location] = row
+
+
+def course_version_key(course):
+    """
+    Return a string identifying the published version of `course`, based on
+    the last time something was published to it.
+    """
+    if course.subtree_edited_on is None:
+        # check for subtree_edited_on because old XML courses doesn't have this attribute
+        return u""
+    return course.subtree_edited_on.isoformat()
+
+
 class ProgressSummary(object):
     """
     Wrapper class for the computation of a user's scores across a course.
@@ -202,6 +380,113 @@ def field_data_cache_for_grading(course, user):
     )
 
 
+class AnswerDistribution(object):
+    """
+    Counts the answers submitted to the problems of a course, streaming over
+    their StudentModules a batch at a time.
+
+    The answers are counted per problem and problem part, with a Counter per
+    part, and only the state of the StudentModule being counted is parsed at
+    any time.  Problems are only looked up in the modulestore once, when the
+    counts are read.
+
+    Distributions of disjoint sets of StudentModules, for instance of
+    different problems, can be counted separately and merged.
+    """
+    def __init__(self, course_key):
+        self.course_key = course_key
+        # { unicode(module_state_key): { problem_part_id: Counter(answer -> count) } }
+        self.counts = defaultdict(lambda: defaultdict(Counter))
+        self.modules_counted = 0
+        self.modules_skipped = 0
+
+    def add_modules(self, modules):
+        """
+        Count the answers of the StudentModules `modules`, which can be
+        any iterable of them, e.g. one that fetches them in batches.
+        """
+        for module in modules:
+            self.add_module(module)
+
+    def add_module(self, module):
+        """
+        Count the answers of the StudentModule `module`.  Modules with
+        broken state are skipped.
+        """
+        try:
+            state_dict = json.loads(module.state) if module.state else {}
+            raw_answers = state_dict.get("student_answers", {})
+        except ValueError:
+            log.error(
+                u"Answer Distribution: Could not parse module state for StudentModule id=%s, course=%s",
+                module.id,
+                self.course_key,
+            )
+            self.modules_skipped += 1
+            return
+
+        self.modules_counted += 1
+        if not raw_answers:
+            return
+        problem_counts = self.counts[unicode(module.module_state_key)]
+        # Each problem part has an ID that is derived from the
+        # module.module_state_key (with some suffix appended)
+        for problem_part_id, raw_answer in raw_answers.items():
+            # Convert whatever raw answers we have (numbers, unicode, None, etc.)
+            # to be unicode values. Note that if we get a string, it's always
+            # unicode and not str -- state comes from the json decoder, and that
+            # always returns unicode for strings.
+            problem_counts[problem_part_id][unicode(raw_answer)] += 1
+
+    def merge(self, other):
+        """
+        Add the counts of the AnswerDistribution `other` to these.
+        """
+        for usage_id, problem_counts in other.counts.iteritems():
+            for problem_part_id, answer_counts in problem_counts.iteritems():
+                self.counts[usage_id][problem_part_id].update(answer_counts)
+        self.modules_counted += other.modules_counted
+        self.modules_skipped += other.modules_skipped
+
+    def items(self):
+        """
+        Yield ((url_name, display_name, problem_part_id), {answer: count})
+        for each problem part with answers.
+
+        Problems which can't be found are skipped, since there is no
+        meaningful url or name to report them with.  This happens when a
+        student answered a problem that was later deleted from the course.
+        """
+        problem_store = modulestore()
+        for usage_id, problem_counts in self.counts.iteritems():
+            try:
+                usage_key = UsageKey.from_string(usage_id).map_into_course(self.course_key)
+                problem = problem_store.get_item(usage_key)
+            except (ItemNotFoundError, InvalidKeyError):
+                log.warning(
+                    u"Answer Distribution: Item %s referenced in StudentModules in course %s not found; "
+                    u"its answers will be omitted from the answer distribution CSV.",
+                    usage_id,
+                    self.course_key,
+                )
+                continue
+
+            for problem_part_id, answer_counts in problem_counts.iteritems():
+                yield (problem.url_name, problem.display_name_with_default, problem_part_id), dict(answer_counts)
+
+
+def submitted_problem_modules(course_key, usage_keys=None):
+    """
+    Return the StudentModules of the problems submitted in the course
+    `course_key`, or only those of the problems `usage_keys`, with only the
+    fields needed to count their answers.  Uses a read replica if one exists.
+    """
+    modules = StudentModule.all_submitted_problems_read_only(course_key)
+    if usage_keys is not None:
+        modules = modules.filter(module_state_key__in=usage_keys)
+    return modules.only('id', 'module_state_key', 'state')
+
+
 def answer_distributions(course_key):
     """
     Given a course_key, return answer distributions in the form of a dictionary
@@ -230,69 +515,14 @@ def answer_distributions(course_key):
     generate the report.
 
     This method will try to use a read-replica database if one is available.
+    For large courses, see the answer distribution instructor task, which
+    splits the work between subtasks.
     """
-    # dict: { module.module_state_key : (url_name, display_name) }
-    state_keys_to_problem_info = {}  # For caching, used by url_and_display_name
-
-    def url_and_display_name(usage_key):
-        """
-        For a given usage_key, return the problem's url and display_name.
-        Handle modulestore access and caching. This method ignores permissions.
-
-        Raises:
-            InvalidKeyError: if the usage_key does not parse
-            ItemNotFoundError: if there is no content that corresponds
-                to this usage_key.
-        """
-        problem_store = modulestore()
-        if usage_key not in state_keys_to_problem_info:
-            problem = problem_store.get_item(usage_key)
-            problem_info = (problem.url_name, problem.display_name_with_default)
-            state_keys_to_problem_info[usage_key] = problem_info
-
-        return state_keys_to_problem_info[usage_key]
-
-    # Iterate through all problems submitted for this course in no particular
-    # order, and build up our answer_counts dict that we will eventually return
-    answer_counts = defaultdict(lambda: defaultdict(int))
-    for module in StudentModule.all_submitted_problems_read_only(course_key):
-        try:
-            state_dict = json.loads(module.state) if module.state else {}
-            raw_answers = state_dict.get("student_answers", {})
-        except ValueError:
-            log.error(
-                u"Answer Distribution: Could not parse module state for StudentModule id=%s, course=%s",
-                module.id,
-                course_key,
-            )
-            continue
-
-        try:
-            url, display_name = url_and_display_name(module.module_state_key.map_into_course(course_key))
-            # Each problem part has an ID that is derived from the
-            # module.module_state_key (with some suffix appended)
-            for problem_part_id, raw_answer in raw_answers.items():
-                # Convert whatever raw answers we have (numbers, unicode, None, etc.)
-                # to be unicode values. Note that if we get a string, it's always
-                # unicode and not str -- state comes from the json decoder, and that
-                # always returns unicode for strings.
-                answer = unicode(raw_answer)
-                answer_counts[(url, display_name, problem_part_id)][answer] += 1
-
-        except (ItemNotFoundError, InvalidKeyError):
-            msg = (
-                "Answer Distribution: Item {} referenced in StudentModule {} " +
-                "for user {} in course {} not found; " +
-                "This can happen if a student answered a question that " +
-                "was later deleted from the course. This answer will be " +
-                "omitted from the answer distribution CSV."
-            ).format(
-                module.module_state_key, module.id, module.student_id, course_key
-            )
-            log.warning(msg)
-            continue
-
-    return answer_counts
+    distribution = AnswerDistribution(course_key)
+    distribution.add_modules(
+        iterate_in_batches(submitted_problem_modules(course_key), settings.USER_STATE_BATCH_SIZE)
+    )
+    return dict(distribution.items())
 
 
 def grade(student, request, course, keep_raw_scores=False, field_data_cache=None, scores_client=None):
@@ -302,6 +532,14 @@ def grade(student, request, course, keep_raw_scores=False, field_data_cache=None
     Also sends a signal to update the minimum grade requirement status.
     """
     grade_summary = _grade(student, request, course, keep_raw_scores, field_data_cache, scores_client)
+    _send_grades_updated(student, course, grade_summary)
+    return grade_summary
+
+
+def _send_grades_updated(student, course, grade_summary):
+    """
+    Send the GRADES_UPDATED signal to update the minimum grade requirement status.
+    """
     responses = GRADES_UPDATED.send_robust(
         sender=None,
         username=student.username,
@@ -313,10 +551,9 @@ def grade(student, request, course, keep_raw_scores=False, field_data_cache=None
     for receiver, response in responses:
         log.info('Signal fired when student grade is calculated. Receiver: %s. Response: %s', receiver, response)
 
-    return grade_summary
-
 
-def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_client):
+def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_client, scoring=None,
+           grading_context=None):
     """
     Unwrapped version of "grade"
 
@@ -334,37 +571,18 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
       make up the final grade. (For display)
     - keep_raw_scores : if True, then value for key 'raw_scores' contains scores
       for every graded module
+    - scoring : the _ScoringInputs to use, if they were already (partially)
+      loaded, e.g. for a whole batch of students
+    - grading_context : the course's grading_context, if it was already
+      computed
 
     More information on the format is in the docstring for CourseGrader.
     """
-    with outer_atomic():
-        if field_data_cache is None:
-            field_data_cache = field_data_cache_for_grading(course, student)
-        if scores_client is None:
-            scores_client = ScoresClient.from_field_data_cache(field_data_cache)
-
-    # Dict of item_ids -> (earned, possible) point tuples. This *only* grabs
-    # scores that were registered with the submissions API, which for the moment
-    # means only openassessment (edx-ora2)
-    # We need to import this here to avoid a circular dependency of the form:
-    # XBlock --> submissions --> Django Rest Framework error strings -->
-    # Django translation --> ... --> courseware --> submissions
-    from submissions import api as sub_api  # installed from the edx-submissions repository
-
-    with outer_atomic():
-        submissions_scores = sub_api.get_scores(
-            course.id.to_deprecated_string(),
-            anonymous_id_for_user(student, course.id)
-        )
-        max_scores_cache = MaxScoresCache.create_for_course(course)
-
-        # For the moment, we have to get scorable_locations from field_data_cache
-        # and not from scores_client, because scores_client is ignorant of things
-        # in the submissions API. As a further refactoring step, submissions should
-        # be hidden behind the ScoresClient.
-        max_scores_cache.fetch_from_remote(field_data_cache.scorable_locations)
-
-    grading_context = course.grading_context
+    subsection_grades = PersistentGradesStore(student, course)
+    if scoring is None:
+        scoring = _ScoringInputs(student, course, field_data_cache, scores_client)
+    if grading_context is None:
+        grading_context = course.grading_context
     raw_scores = []
 
     totaled_scores = {}
@@ -376,98 +594,123 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
             section_descriptor = section['section_descriptor']
             section_name = section_descriptor.display_name_with_default
 
-            with outer_atomic():
-                # some problems have state that is updated independently of interaction
-                # with the LMS, so they need to always be scored. (E.g. combinedopenended ORA1)
-                # TODO This block is causing extra savepoints to be fired that are empty because no queries are executed
-                # during the loop. When refactoring this code please keep this outer_atomic call in mind and ensure we
-                # are not making unnecessary database queries.
-                should_grade_section = any(
-                    descriptor.always_recalculate_grades for descriptor in section['xmoduledescriptors']
-                )
-
-                # If there are no problems that always have to be regraded, check to
-                # see if any of our locations are in the scores from the submissions
-                # API. If scores exist, we have to calculate grades for this section.
-                if not should_grade_section:
-                    should_grade_section = any(
-                        descriptor.location.to_deprecated_string() in submissions_scores
-                        for descriptor in section['xmoduledescriptors']
-                    )
-
-                if not should_grade_section:
-                    should_grade_section = any(
-                        descriptor.location in scores_client
-                        for descriptor in section['xmoduledescriptors']
-                    )
+            # some problems have state that is updated independently of interaction
+            # with the LMS, so they need to always be scored. (E.g. combinedopenended ORA1)
+            always_recalculate = any(
+                descriptor.always_recalculate_grades for descriptor in section['xmoduledescriptors']
+            )
 
-                # If we haven't seen a single problem in the section, we don't have
-                # to grade it at all! We can assume 0%
-                if should_grade_section:
-                    scores = []
-
-                    def create_module(descriptor):
-                        '''creates an XModule instance given a descriptor'''
-                        # TODO: We need the request to pass into here. If we could forego that, our arguments
-                        # would be simpler
-                        return get_module_for_descriptor(
-                            student, request, descriptor, field_data_cache, course.id, course=course
+            persisted = None
+            if not always_recalculate:
+                persisted = subsection_grades.get(section_descriptor.location, section_name)
+
+            if persisted is not None:
+                graded_total, scores = persisted
+                if keep_raw_scores:
+                    raw_scores += scores
+            else:
+                scoring.load()
+                with outer_atomic():
+                    # TODO This block is causing extra savepoints to be fired that are empty because no queries are
+                    # executed during the loop. When refactoring this code please keep this outer_atomic call in mind
+                    # and ensure we are not making unnecessary database queries.
+                    should_grade_section = always_recalculate
+
+                    # If there are no problems that always have to be regraded, check to
+                    # see if any of our locations are in the scores from the submissions
+                    # API. If scores exist, we have to calculate grades for this section.
+                    if not should_grade_section:
+                        should_grade_section = any(
+                            descriptor.location.to_deprecated_string() in scoring.submissions_scores
+                            for descriptor in section['xmoduledescriptors']
                         )
 
-                    descendants = yield_dynamic_descriptor_descendants(section_descriptor, student.id, create_module)
-                    for module_descriptor in descendants:
-                        user_access = has_access(
-                            student, 'load', module_descriptor, module_descriptor.location.course_key
-                        )
-                        if not user_access:
-                            continue
-
-                        (correct, total) = get_score(
-                            student,
-                            module_descriptor,
-                            create_module,
-                            scores_client,
-                            submissions_scores,
-                            max_scores_cache,
+                    if not should_grade_section:
+                        should_grade_section = any(
+                            descriptor.location in scoring.scores_client
+                            for descriptor in section['xmoduledescriptors']
                         )
-                        if correct is None and total is None:
-                            continue
-
-                        if settings.GENERATE_PROFILE_SCORES:    # for debugging!
-                            if total > 1:
-                                correct = random.randrange(max(total - 2, 1), total + 1)
-                            else:
-                                correct = total
-
-                        graded = module_descriptor.graded
-                        if not total > 0:
-                            # We simply cannot grade a problem that is 12/0, because we might need it as a percentage
-                            graded = False
-
-                        scores.append(
-                            Score(
-                                correct,
-                                total,
-                                graded,
-                                module_descriptor.display_name_with_default,
-                                module_descriptor.location
+
+                    # Sections whose content is partially hidden from the student
+                    # (e.g. not yet released) may change grade without any score
+                    # changing, so their grades are never persisted.
+                    can_persist = not always_recalculate and not settings.GENERATE_PROFILE_SCORES
+
+                    # If we haven't seen a single problem in the section, we don't have
+                    # to grade it at all! We can assume 0%
+                    if should_grade_section:
+                        scores = []
+
+                        def create_module(descriptor):
+                            '''creates an XModule instance given a descriptor'''
+                            # TODO: We need the request to pass into here. If we could forego that, our arguments
+                            # would be simpler
+                            return get_module_for_descriptor(
+                                student, request, descriptor, scoring.field_data_cache, course.id, course=course
                             )
+
+                        descendants = yield_dynamic_descriptor_descendants(
+                            section_descriptor, student.id, create_module
                         )
+                        for module_descriptor in descendants:
+                            user_access = has_access(
+                                student, 'load', module_descriptor, module_descriptor.location.course_key
+                            )
+                            if not user_access:
+                                can_persist = False
+                                continue
+
+                            (correct, total) = get_score(
+                                student,
+                                module_descriptor,
+                                create_module,
+                                scoring.scores_client,
+                                scoring.submissions_scores,
+                                scoring.max_scores_cache,
+                            )
+                            if correct is None and total is None:
+                                continue
+
+                            if settings.GENERATE_PROFILE_SCORES:    # for debugging!
+                                if total > 1:
+                                    correct = random.randrange(max(total - 2, 1), total + 1)
+                                else:
+                                    correct = total
+
+                            graded = module_descriptor.graded
+                            if not total > 0:
+                                # We simply cannot grade a problem that is 12/0, because we might need it as a
+                                # percentage
+                                graded = False
+
+                            scores.append(
+                                Score(
+                                    correct,
+                                    total,
+                                    graded,
+                                    module_descriptor.display_name_with_default,
+                                    module_descriptor.location
+                                )
+                            )
 
-                    __, graded_total = graders.aggregate_scores(scores, section_name)
-                    if keep_raw_scores:
-                        raw_scores += scores
-                else:
-                    graded_total = Score(0.0, 1.0, True, section_name, None)
-
-                #Add the graded total to totaled_scores
-                if graded_total.possible > 0:
-                    format_scores.append(graded_total)
-                else:
-                    log.info(
-                        "Unable to grade a section with a total possible score of zero. " +
-                        str(section_descriptor.location)
-                    )
+                        __, graded_total = graders.aggregate_scores(scores, section_name)
+                        if keep_raw_scores:
+                            raw_scores += scores
+                    else:
+                        scores = []
+                        graded_total = Score(0.0, 1.0, True, section_name, None)
+
+                if can_persist:
+                    subsection_grades.set(section_descriptor.location, graded_total, scores)
+
+            #Add the graded total to totaled_scores
+            if graded_total.possible > 0:
+                format_scores.append(graded_total)
+            else:
+                log.info(
+                    "Unable to grade a section with a total possible score of zero. " +
+                    str(section_descriptor.location)
+                )
 
         totaled_scores[section_format] = format_scores
 
@@ -488,7 +731,8 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
             # so grader can be double-checked
             grade_summary['raw_scores'] = raw_scores
 
-        max_scores_cache.push_to_remote()
+        if scoring.owns_max_scores_cache:
+            scoring.max_scores_cache.push_to_remote()
 
     return grade_summary
 
@@ -770,11 +1014,79 @@ def iterate_grades_for(course_or_id, students, keep_raw_scores=False):
         make up the final grade. (For display)
     - raw_scores: contains scores for every graded module
     """
+    course = _get_course(course_or_id)
+
+    def grade_student(student, request):
+        """Grade a single student from scratch."""
+        return grade(student, request, course, keep_raw_scores)
+
+    return _iterate_gradesets(course, students, grade_student)
+
+
+def iterate_grades_for_batched(course_or_id, students, keep_raw_scores=False, batch_size=GRADING_BATCH_SIZE):
+    """
+    Like `iterate_grades_for`, but grades `students` in batches of
+    `batch_size`, which is much faster for large numbers of students.
+
+    The stored scores of a whole batch are loaded with a single query, and
+    the course's grading context and MaxScoresCache are shared by every
+    student. A student's FieldDataCache is only built if a module has to be
+    instantiated for them, i.e. for problems which always recalculate their
+    grades, blocks with dynamic children, or problems whose max score isn't
+    known yet.
+    """
+    course = _get_course(course_or_id)
+    grading_context = course.grading_context
+    max_scores_cache = MaxScoresCache.create_for_course(course)
+    with outer_atomic():
+        max_scores_cache.fetch_from_remote([
+            descriptor.location for descriptor in grading_context['all_descriptors'] if descriptor.has_score
+        ])
+
+    def grade_student(scores_clients, student, request):
+        """Grade a single student, given the ScoresClients of their batch."""
+        scoring = _ScoringInputs(
+            student,
+            course,
+            scores_client=scores_clients[student.id],
+            submissions_scores=_submissions_scores_for(student, course),
+            max_scores_cache=max_scores_cache,
+        )
+        gradeset = _grade(student, request, course, keep_raw_scores, None, None, scoring, grading_context)
+        _send_grades_updated(student, course, gradeset)
+        return gradeset
+
+    students = iter(students)
+    while True:
+        batch = list(islice(students, batch_size))
+        if not batch:
+            break
+
+        with outer_atomic():
+            scores_clients = ScoresClient.for_users(
+                course.id, [student.id for student in batch], course.block_types_affecting_grading
+            )
+
+        for result in _iterate_gradesets(course, batch, partial(grade_student, scores_clients)):
+            yield result
+
+        max_scores_cache.push_to_remote()
+
+
+def _get_course(course_or_id):
+    """
+    Return the course for `course_or_id`, which is either a course or its id.
+    """
     if isinstance(course_or_id, (basestring, CourseKey)):
-        course = courses.get_course_by_id(course_or_id)
-    else:
-        course = course_or_id
+        return courses.get_course_by_id(course_or_id)
+    return course_or_id
+
 
+def _iterate_gradesets(course, students, grade_student):
+    """
+    Yield (student, gradeset, err_msg) for each of `students`, calling
+    `grade_student(student, request)` to compute their gradeset.
+    """
     for student in students:
         with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=[u'action:{}'.format(course.id)]):
             try:
@@ -784,7 +1096,7 @@ def iterate_grades_for(course_or_id, students, keep_raw_scores=False):
                 # It's not pretty, but untangling that is currently beyond the
                 # scope of this feature.
                 request.session = {}
-                gradeset = grade(student, request, course, keep_raw_scores)
+                gradeset = grade_student(student, request)
                 yield student, gradeset, ""
             except Exception as exc:  # pylint: disable=broad-except
                 # Keep marching on even if this student couldn't be graded for
@@ -0,0 +1,203 @@
+"""
+Writers of StudentModuleHistory entries, which record every saved state
+of the StudentModules whose module_type has its history saved.
+
+How the entries are written is configured by
+settings.STUDENT_MODULE_HISTORY_WRITER:
+
+    'immediate' - Each entry is inserted as soon as its StudentModule is
+        saved.  This is the default.
+
+    'request' - The entries created while handling a request are
+        buffered, and inserted with a single bulk_create when the
+        request ends (see HistoryWriterMiddleware).  Buffered entries are
+        lost if the process dies before the end of the request, and
+        discarded if the request raises an exception, since its database
+        writes are rolled back.
+
+    'celery' - The entries created while handling a request are handed
+        to a celery task at the end of the request, which inserts them
+        with a single bulk_create.  If the task cannot be queued, the
+        entries are inserted by the request instead.
+
+In the buffering modes, at most settings.STUDENT_MODULE_HISTORY_MAX_BUFFERED
+entries are buffered before they are flushed early, and entries created
+outside of a request (or of a buffered_history block) are still inserted
+immediately.
+"""
+from contextlib import contextmanager
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+import dogstats_wrapper as dog_stats_api
+
+
+log = logging.getLogger(__name__)
+
+IMMEDIATE = 'immediate'
+REQUEST = 'request'
+CELERY = 'celery'
+WRITER_MODES = (IMMEDIATE, REQUEST, CELERY)
+
+
+class _HistoryBuffer(threading.local):
+    """
+    The entries buffered by the current thread, or None if the current
+    thread is not buffering entries.
+    """
+    entries = None
+
+
+_BUFFER = _HistoryBuffer()
+
+
+def get_writer_mode():
+    """
+    Returns the configured writer mode, falling back to IMMEDIATE when
+    the configured mode is unknown.
+    """
+    mode = getattr(settings, 'STUDENT_MODULE_HISTORY_WRITER', IMMEDIATE)
+    if mode not in WRITER_MODES:
+        log.error(u"Unknown STUDENT_MODULE_HISTORY_WRITER %r, writing history immediately.", mode)
+        return IMMEDIATE
+    return mode
+
+
+def write_history_entry(history_entry):
+    """
+    Writes the given unsaved StudentModuleHistory entry, either now or
+    when the current buffer is flushed.
+    """
+    if _BUFFER.entries is None or get_writer_mode() == IMMEDIATE:
+        history_entry.save()
+        dog_stats_api.increment('lms.courseware.history.written', tags=[u'mode:{}'.format(IMMEDIATE)])
+        return
+
+    _BUFFER.entries.append(history_entry)
+    dog_stats_api.increment('lms.courseware.history.buffered')
+    if len(_BUFFER.entries) >= settings.STUDENT_MODULE_HISTORY_MAX_BUFFERED:
+        flush()
+
+
+def start_buffering():
+    """
+    Starts buffering the entries written by the current thread, if the
+    configured writer mode buffers entries.  Entries buffered before are
+    flushed first.
+    """
+    flush()
+    if get_writer_mode() != IMMEDIATE:
+        _BUFFER.entries = []
+
+
+def stop_buffering():
+    """
+    Flushes the entries buffered by the current thread, and stops
+    buffering them.
+    """
+    flush()
+    _BUFFER.entries = None
+
+
+def discard_buffer():
+    """
+    Drops the entries buffered by the current thread without writing
+    them, and stops buffering them.  Used when the StudentModule saves
+    they record have been rolled back.
+    """
+    if _BUFFER.entries:
+        log.info(u"Discarding %d buffered StudentModuleHistory entries.", len(_BUFFER.entries))
+        dog_stats_api.increment('lms.courseware.history.discarded', len(_BUFFER.entries))
+    _BUFFER.entries = None
+
+
+@contextmanager
+def buffered_history():
+    """
+    A context manager within which the written history entries are
+    buffered according to the configured writer mode.  Useful to batch
+    the history writes of code that runs outside of a request, such as
+    celery tasks that save many StudentModules.
+    """
+    start_buffering()
+    try:
+        yield
+    finally:
+        stop_buffering()
+
+
+def flush():
+    """
+    Writes the entries buffered by the current thread.  Failures are
+    logged rather than raised, so that they don't fail the request that
+    saved the StudentModules.  The entries are written in a savepoint, so
+    that a failure doesn't break the transaction the flush may run in.
+    """
+    entries = _BUFFER.entries
+    if not entries:
+        return
+    _BUFFER.entries = []
+
+    mode = get_writer_mode()
+    dog_stats_api.histogram('lms.courseware.history.flush_size', len(entries), tags=[u'mode:{}'.format(mode)])
+    if mode == CELERY and _queue_entries(entries):
+        return
+
+    try:
+        with transaction.atomic():
+            bulk_create_entries(entries)
+    except Exception:  # pylint: disable=broad-except
+        log.exception(u"Failed to write %d StudentModuleHistory entries.", len(entries))
+        dog_stats_api.increment('lms.courseware.history.failed', len(entries), tags=[u'mode:{}'.format(mode)])
+    else:
+        dog_stats_api.increment('lms.courseware.history.written', len(entries), tags=[u'mode:{}'.format(mode)])
+
+
+def bulk_create_entries(entries):
+    """
+    Inserts the given unsaved StudentModuleHistory entries with a single
+    query.  Entries of the same StudentModule are inserted in the order
+    in which they were written.
+    """
+    if entries:
+        type(entries[0]).objects.bulk_create(entries)
+
+
+def serialize_entry(history_entry):
+    """
+    Returns a JSON serializable dict of the fields of the given
+    StudentModuleHistory entry, for the celery task.
+    """
+    return {
+        'student_module_id': history_entry.student_module_id,
+        'version': history_entry.version,
+        'created': history_entry.created.isoformat() if history_entry.created else None,
+        'state': history_entry.state,
+        'grade': history_entry.grade,
+        'max_grade': history_entry.max_grade,
+    }
+
+
+def _queue_entries(entries):
+    """
+    Hands the given entries to the celery task that writes them, and
+    returns whether that succeeded.
+    """
+    # Imported here since the tasks module imports courseware.models,
+    # which imports this module.
+    from courseware.tasks import write_student_module_history
+
+    try:
+        write_student_module_history.apply_async(
+            args=([serialize_entry(entry) for entry in entries],),
+            routing_key=settings.STUDENT_MODULE_HISTORY_ROUTING_KEY,
+        )
+    except Exception:  # pylint: disable=broad-except
+        log.exception(u"Failed to queue %d StudentModuleHistory entries, writing them now.", len(entries))
+        dog_stats_api.increment('lms.courseware.history.queue_failed', len(entries))
+        return False
+    dog_stats_api.increment('lms.courseware.history.queued', len(entries))
+    return True
@@ -5,6 +5,7 @@ Middleware for the courseware app
 from django.shortcuts import redirect
 from django.core.urlresolvers import reverse
 
+from courseware import history_writer
 from courseware.courses import UserNotEnrolled
 
 
@@ -22,3 +23,21 @@ class RedirectUnenrolledMiddleware(object):
                     args=[course_key.to_deprecated_string()]
                 )
             )
+
+
+class HistoryWriterMiddleware(object):
+    """
+    Buffers the StudentModuleHistory entries written while handling each
+    request, and flushes them when the request succeeds (see
+    history_writer).  When the view raises an exception, its database
+    writes are rolled back, so the buffered entries are discarded.
+    """
+    def process_request(self, _request):
+        history_writer.start_buffering()
+
+    def process_response(self, _request, response):
+        history_writer.stop_buffering()
+        return response
+
+    def process_exception(self, _request, _exception):
+        history_writer.discard_buffer()
@@ -19,13 +19,21 @@ UserStateSummaryCache: A cache for Scope.user_state_summary
 PreferencesCache: A cache for Scope.preferences
 UserInfoCache: A cache for Scope.user_info
 DjangoOrmFieldCache: A base-class for single-row-per-field caches.
+
+Writes to a FieldDataCache normally go straight to the database.  Within a
+:func:`field_data_unit_of_work`, they are instead accumulated by each
+FieldDataCache created in that unit of work, and written together in a single
+transaction when it ends.
 """
 
 import json
+import threading
 from abc import abstractmethod, ABCMeta
 from collections import defaultdict, namedtuple
+from contextlib import contextmanager
 from .models import (
     StudentModule,
+    chunks,
     XModuleUserStateSummaryField,
     XModuleStudentPrefsField,
     XModuleStudentInfoField
@@ -36,7 +44,7 @@ from opaque_keys.edx.block_types import BlockTypeKeyV1
 from opaque_keys.edx.asides import AsideUsageKeyV1
 from contracts import contract, new_contract
 
-from django.db import DatabaseError
+from django.db import DatabaseError, transaction
 
 from xblock.runtime import KeyValueStore
 from xblock.exceptions import KeyValueMultiSaveError, InvalidScopeError
@@ -56,6 +64,50 @@ class InvalidWriteError(Exception):
     """
 
 
+class _UnitOfWork(threading.local):
+    """
+    The FieldDataCaches created in the current thread's unit of work, or
+    None if the current thread is not in a unit of work.
+    """
+    field_data_caches = None
+
+
+_UNIT_OF_WORK = _UnitOfWork()
+
+
+@contextmanager
+def field_data_unit_of_work():
+    """
+    A context manager within which the fields set on the FieldDataCaches
+    created in it are not written immediately, but accumulated and written
+    in one transaction when it exits.  Setting the same field, or fields of
+    the same block, repeatedly then only writes them once.
+
+    If the unit of work raises, the fields set in it are discarded rather
+    than written, and the exception is propagated.
+
+    Nested units of work join the outermost one.
+    """
+    if _UNIT_OF_WORK.field_data_caches is not None:
+        yield
+        return
+
+    field_data_caches = _UNIT_OF_WORK.field_data_caches = []
+    completed = False
+    try:
+        yield
+        completed = True
+    finally:
+        _UNIT_OF_WORK.field_data_caches = None
+        if not completed:
+            for field_data_cache in field_data_caches:
+                field_data_cache.discard_writes()
+
+    with transaction.atomic():
+        for field_data_cache in field_data_caches:
+            field_data_cache.flush_writes(end_unit_of_work=True)
+
+
 def _all_usage_keys(descriptors, aside_types):
     """
     Return a set of all usage_ids for the `descriptors` and for
@@ -725,6 +777,14 @@ class FieldDataCache(object):
             ),
         }
         self.scorable_locations = set()
+
+        # The fields set but not written yet, if this cache was created in
+        # a unit of work (see field_data_unit_of_work).
+        self._pending_writes = None
+        if _UNIT_OF_WORK.field_data_caches is not None:
+            self._pending_writes = {}
+            _UNIT_OF_WORK.field_data_caches.append(self)
+
         self.add_descriptors_to_cache(descriptors)
 
     def add_descriptors_to_cache(self, descriptors):
@@ -732,6 +792,12 @@ class FieldDataCache(object):
         Add all `descriptors` to this FieldDataCache.
         """
         if self.user.is_authenticated():
+            # The other caches of the unit of work may have pending writes
+            # to the fields about to be read.
+            for field_data_cache in _UNIT_OF_WORK.field_data_caches or []:
+                if field_data_cache is not self:
+                    field_data_cache.flush_writes()
+
             self.scorable_locations.update(desc.location for desc in descriptors if desc.has_score)
             for scope, fields in self._fields_to_cache(descriptors).items():
                 if scope not in self.cache:
@@ -827,6 +893,9 @@ class FieldDataCache(object):
         if key.scope not in self.cache:
             raise KeyError(key.field_name)
 
+        if self._pending_writes and key in self._pending_writes:
+            return self._pending_writes[key]
+
         return self.cache[key.scope].get(key)
 
     @contract(kv_dict="dict(DjangoKeyValueStore_Key: *)")
@@ -839,9 +908,7 @@ class FieldDataCache(object):
             kv_dict (dict): dict mapping from `DjangoKeyValueStore.Key`s to field values
         Raises: DatabaseError if any fields fail to save
         """
-
-        saved_fields = []
-        by_scope = defaultdict(dict)
+        cached_kv_dict = {}
         for key, value in kv_dict.iteritems():
 
             if key.scope.user == UserScope.ONE and not self.user.is_anonymous():
@@ -852,6 +919,45 @@ class FieldDataCache(object):
             if key.scope not in self.cache:
                 continue
 
+            cached_kv_dict[key] = value
+
+        if self._pending_writes is not None:
+            self._pending_writes.update(cached_kv_dict)
+        else:
+            self._write_many(cached_kv_dict)
+
+    def flush_writes(self, end_unit_of_work=False):
+        """
+        Write the fields set in this cache's unit of work that haven't been
+        written yet.
+
+        Arguments:
+            end_unit_of_work (bool): Whether fields set afterwards should be
+                written immediately again.
+        Raises: DatabaseError if any fields fail to save
+        """
+        pending_writes = self._pending_writes
+        if pending_writes is None:
+            return
+
+        self._pending_writes = None if end_unit_of_work else {}
+        if pending_writes:
+            self._write_many(pending_writes)
+
+    def discard_writes(self):
+        """
+        Drop the fields set in this cache's unit of work that haven't been
+        written yet, and write the fields set afterwards immediately again.
+        """
+        self._pending_writes = None
+
+    def _write_many(self, kv_dict):
+        """
+        Write the fields specified by the keys of `kv_dict`, grouped by scope.
+        """
+        saved_fields = []
+        by_scope = defaultdict(dict)
+        for key, value in kv_dict.iteritems():
             by_scope[key.scope][key] = value
 
         for scope, set_many_data in by_scope.iteritems():
@@ -883,6 +989,11 @@ class FieldDataCache(object):
         if key.scope not in self.cache:
             raise KeyError(key.field_name)
 
+        if self._pending_writes and key in self._pending_writes:
+            del self._pending_writes[key]
+            if not self.cache[key.scope].has(key):
+                return
+
         self.cache[key.scope].delete(key)
 
     @contract(key=DjangoKeyValueStore.Key, returns=bool)
@@ -904,6 +1015,9 @@ class FieldDataCache(object):
         if key.scope not in self.cache:
             return False
 
+        if self._pending_writes and key in self._pending_writes:
+            return True
+
         return self.cache[key.scope].has(key)
 
     @contract(key=DjangoKeyValueStore.Key, returns="datetime|None")
@@ -924,6 +1038,9 @@ class FieldDataCache(object):
         if key.scope not in self.cache:
             return None
 
+        if self._pending_writes and key in self._pending_writes:
+            self.flush_writes()
+
         return self.cache[key.scope].last_modified(key)
 
     def __len__(self):
@@ -989,6 +1106,84 @@ class ScoresClient(object):
         client.fetch_scores(fd_cache.scorable_locations)
         return client
 
+    @classmethod
+    def for_users(cls, course_key, user_ids, block_types):
+        """
+        Create a fetched ScoresClient for each of `user_ids`, with the scores
+        of all blocks of `block_types` in the course fetched in bulk.
+
+        Returns a dict mapping user ids to ScoresClients.
+        """
+        bulk_client = BulkScoresClient(course_key, user_ids)
+        bulk_client.fetch_scores(block_types=block_types)
+        return {user_id: bulk_client.client_for(user_id) for user_id in bulk_client.user_ids}
+
+
+class BulkScoresClient(object):
+    """
+    Client interface for retrieving the Score information of many users of a
+    course at once, e.g. to generate grade reports or certificates.
+
+    Scores are fetched with one query per `chunk_size` users, rather than one
+    query per user, and each distinct location is only parsed once however
+    many users have a score for it.  `client_for` gives a ScoresClient view
+    of the scores of a single user.
+    """
+    def __init__(self, course_key, user_ids, chunk_size=500):
+        self.course_key = course_key
+        self.user_ids = list(user_ids)
+        self.chunk_size = chunk_size
+        # { user_id: { usage_key: Score } }
+        self._users_to_scores = defaultdict(dict)
+        # { module_state_key as stored: usage_key mapped into the course }
+        self._usage_keys = {}
+        self._has_fetched = False
+
+    def fetch_scores(self, locations=None, block_types=None):
+        """
+        Grab the score information of all the users, for the blocks at
+        `locations` and/or of `block_types`, or for every block of the course
+        if neither is given.
+        """
+        filters = {'course_id': self.course_key}
+        if locations is not None:
+            filters['module_state_key__in'] = set(locations)
+        if block_types is not None:
+            filters['module_type__in'] = set(block_types)
+
+        for user_ids in chunks(self.user_ids, self.chunk_size):
+            scores_qset = StudentModule.objects.filter(student_id__in=user_ids, **filters)
+            for user_id, location, correct, total in scores_qset.values_list(
+                    'student_id', 'module_state_key', 'grade', 'max_grade'
+            ):
+                self._users_to_scores[user_id][self._usage_key(location)] = ScoresClient.Score(correct, total)
+        self._has_fetched = True
+
+    def _usage_key(self, location):
+        """
+        Return the usage key of the StudentModule `location`, with the course
+        run info added back in (see ScoresClient.fetch_scores).
+        """
+        usage_key = self._usage_keys.get(location)
+        if usage_key is None:
+            usage_key = UsageKey.from_string(location).map_into_course(self.course_key)
+            self._usage_keys[location] = usage_key
+        return usage_key
+
+    def client_for(self, user_id):
+        """
+        Return a fetched ScoresClient with the scores of the user `user_id`.
+        """
+        if not self._has_fetched:
+            raise ValueError(
+                "Tried to get the scores of user {} from BulkScoresClient before fetch_scores() has run."
+                .format(user_id)
+            )
+        client = ScoresClient(self.course_key, user_id)
+        client._locations_to_scores = self._users_to_scores.get(user_id, {})  # pylint: disable=protected-access
+        client._has_fetched = True  # pylint: disable=protected-access
+        return client
+
 
 # @contract(user_id=int, usage_key=UsageKey, score="number|None", max_score="number|None")
 def set_score(user_id, usage_key, score, max_score):
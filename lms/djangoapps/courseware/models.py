@@ -18,14 +18,23 @@ import itertools
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver, Signal
 
 from model_utils.models import TimeStampedModel
-from student.models import user_by_anonymous_id
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey, UsageKey
+from openedx.core.djangoapps.course_groups.models import CohortMembership, CourseUserGroupPartitionGroup
+from openedx.core.djangoapps.user_api.models import UserCourseTag
+from student.models import CourseEnrollment, user_by_anonymous_id
 from submissions.models import score_set, score_reset
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.exceptions import ItemNotFoundError
 
 from xmodule_django.models import CourseKeyField, LocationKeyField, BlockTypeKeyField
+
+from courseware import history_writer
+
 log = logging.getLogger(__name__)
 
 log = logging.getLogger("edx.courseware")
@@ -39,6 +48,27 @@ def chunks(items, chunk_size):
     return (items[i:i + chunk_size] for i in xrange(0, len(items), chunk_size))
 
 
+def iterate_in_batches(queryset, batch_size):
+    """
+    Yields the objects of queryset in primary key order, fetching at most
+    batch_size of them per query.
+
+    Each query starts after the last primary key of the previous one rather
+    than at an offset, so every query is a bounded index range scan and only
+    one batch of objects is in memory at a time.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        batch_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        batch = list(batch_queryset[:batch_size])
+        for obj in batch:
+            yield obj
+        if len(batch) < batch_size:
+            return
+        last_pk = batch[-1].pk
+
+
 class ChunkingManager(models.Manager):
     """
     :class:`~Manager` that adds an additional method :meth:`chunked_filter` to provide
@@ -172,9 +202,9 @@ class StudentModuleHistory(models.Model):
     @receiver(post_save, sender=StudentModule)
     def save_history(sender, instance, **kwargs):  # pylint: disable=no-self-argument, unused-argument
         """
-        Checks the instance's module_type, and creates & saves a
+        Checks the instance's module_type, and creates & writes a
         StudentModuleHistory entry if the module_type is one that
-        we save.
+        we save.  See history_writer for when the entry is saved.
         """
         if instance.module_type in StudentModuleHistory.HISTORY_SAVING_TYPES:
             history_entry = StudentModuleHistory(student_module=instance,
@@ -183,7 +213,7 @@ class StudentModuleHistory(models.Model):
                                                  state=instance.state,
                                                  grade=instance.grade,
                                                  max_grade=instance.max_grade)
-            history_entry.save()
+            history_writer.write_history_entry(history_entry)
 
     def __unicode__(self):
         return unicode(repr(self))
@@ -313,6 +343,53 @@ class StudentFieldOverride(TimeStampedModel):
     value = models.TextField(default='null')
 
 
+class PersistentSubsectionGrade(TimeStampedModel):
+    """
+    Stores the aggregated score a student has earned in a single graded
+    subsection, so that `courseware.grades.grade` only has to recompute the
+    subsections whose scores actually changed.
+
+    Rows are invalidated (deleted) whenever a score inside the subsection
+    changes, and are ignored when `course_version` no longer matches the
+    published version of the course.
+    """
+    class Meta(object):
+        app_label = "courseware"
+        unique_together = (('user', 'course_id', 'usage_key'),)
+
+    user = models.ForeignKey(User, db_index=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+
+    # The location of the subsection (sequential) that was graded
+    usage_key = LocationKeyField(max_length=255)
+
+    # Identifies the published version of the course the grade was computed
+    # against; see `MaxScoresCache.create_for_course`.
+    course_version = models.CharField(max_length=255, blank=True)
+
+    earned_graded = models.FloatField()
+    possible_graded = models.FloatField()
+
+    # JSON list of the per-problem scores that make up the aggregate
+    raw_scores = models.TextField(default='[]')
+
+    @classmethod
+    def invalidate(cls, user_id, course_id, usage_key=None):
+        """
+        Discard the persisted grades of a user in a course. If `usage_key` is
+        given, only the grade of that subsection is discarded.
+        """
+        queryset = cls.objects.filter(user_id=user_id, course_id=course_id)
+        if usage_key is not None:
+            queryset = queryset.filter(usage_key=usage_key)
+        queryset.delete()
+
+    def __unicode__(self):
+        return u"[PersistentSubsectionGrade] {}: {} = {}/{}".format(
+            self.user_id, self.usage_key, self.earned_graded, self.possible_graded
+        )
+
+
 # Signal that indicates that a user's score for a problem has been updated.
 # This signal is generated when a scoring event occurs either within the core
 # platform or in the Submissions module. Note that this signal will be triggered
@@ -409,3 +486,94 @@ def submissions_score_reset_handler(sender, **kwargs):  # pylint: disable=unused
             u"Failed to process score_reset signal from Submissions API. "
             "user: %s, course_id: %s, usage_id: %s", user, course_id, usage_id
         )
+
+
+def _enclosing_subsection(usage_key):
+    """
+    Walk up the course tree from `usage_key` and return the location of the
+    subsection (sequential) that contains it, or None if there is none.
+    """
+    store = modulestore()
+    location = usage_key
+    while location is not None:
+        if location.block_type == 'sequential':
+            return location
+        location = store.get_parent_location(location)
+    return None
+
+
+@receiver(SCORE_CHANGED)
+def invalidate_subsection_grade_handler(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Consume the SCORE_CHANGED signal and discard the persisted grade of the
+    subsection containing the scored block, so that it is recomputed the next
+    time the student is graded. If the subsection cannot be determined, all
+    of the student's persisted grades in the course are discarded.
+    """
+    if not settings.FEATURES.get('ENABLE_PERSISTENT_GRADES'):
+        return
+
+    user_id = kwargs.get('user_id')
+    try:
+        course_key = CourseKey.from_string(kwargs['course_id'])
+        usage_key = UsageKey.from_string(kwargs['usage_id']).map_into_course(course_key)
+    except (KeyError, InvalidKeyError):
+        log.warning(u"Unable to parse keys of SCORE_CHANGED signal: %s", kwargs)
+        return
+
+    try:
+        subsection_key = _enclosing_subsection(usage_key)
+    except ItemNotFoundError:
+        subsection_key = None
+
+    if subsection_key is None:
+        PersistentSubsectionGrade.invalidate(user_id, course_key)
+    else:
+        PersistentSubsectionGrade.invalidate(user_id, course_key, subsection_key)
+
+
+@receiver(post_delete, sender=StudentModule)
+def invalidate_course_grades_on_delete(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Discard all persisted grades of the student in the course when one of
+    their StudentModule rows is deleted (e.g. a staff "delete student state").
+    """
+    if settings.FEATURES.get('ENABLE_PERSISTENT_GRADES'):
+        PersistentSubsectionGrade.invalidate(instance.student_id, instance.course_id)
+
+
+@receiver(post_save, sender=CohortMembership)
+@receiver(post_delete, sender=CohortMembership)
+@receiver(post_save, sender=CourseEnrollment)
+@receiver(post_save, sender=UserCourseTag)
+@receiver(post_delete, sender=UserCourseTag)
+def invalidate_course_grades_on_group_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Discard all persisted grades of the student in the course when their
+    cohort, enrollment track or random content group (stored as a
+    UserCourseTag) changes, since they may no longer see the same problems.
+    """
+    if settings.FEATURES.get('ENABLE_PERSISTENT_GRADES'):
+        PersistentSubsectionGrade.invalidate(instance.user_id, instance.course_id)
+
+
+@receiver(post_save, sender=CourseUserGroupPartitionGroup)
+@receiver(post_delete, sender=CourseUserGroupPartitionGroup)
+def invalidate_cohort_grades_on_content_group_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Discard the persisted grades of all the members of a cohort when the
+    content group it is linked to changes.
+    """
+    if not settings.FEATURES.get('ENABLE_PERSISTENT_GRADES'):
+        return
+
+    memberships = list(
+        CohortMembership.objects.filter(
+            course_user_group_id=instance.course_user_group_id
+        ).values_list('user_id', 'course_id')
+    )
+    if memberships:
+        PersistentSubsectionGrade.objects.filter(
+            course_id=memberships[0][1],
+            user_id__in=[user_id for user_id, __ in memberships],
+        ).delete()
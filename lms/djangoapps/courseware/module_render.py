@@ -33,7 +33,7 @@ from courseware.masquerade import (
     is_masquerading_as_specific_student,
     setup_masquerade,
 )
-from courseware.model_data import DjangoKeyValueStore, FieldDataCache, set_score
+from courseware.model_data import DjangoKeyValueStore, FieldDataCache, field_data_unit_of_work, set_score
 from courseware.models import SCORE_CHANGED
 from courseware.entrance_exams import (
     get_entrance_exam_score,
@@ -1001,7 +1001,8 @@ def _invoke_xblock_handler(request, course_id, usage_id, handler, suffix, course
     newrelic.agent.add_custom_parameter('course_id', unicode(course_key))
     newrelic.agent.add_custom_parameter('org', unicode(course_key.org))
 
-    with modulestore().bulk_operations(course_key):
+    # The fields saved by the handler are written together when it returns.
+    with modulestore().bulk_operations(course_key), field_data_unit_of_work():
         instance, tracking_context = get_module_by_usage_id(request, course_id, usage_id, course=course)
 
         # Name the transaction so that we can view XBlock handlers separately in
@@ -0,0 +1,23 @@
+"""
+Asynchronous tasks of the courseware app
+"""
+from celery.task import task
+from dateutil.parser import parse as parse_datetime
+
+from courseware.history_writer import bulk_create_entries
+from courseware.models import StudentModuleHistory
+
+
+@task()
+def write_student_module_history(serialized_entries):
+    """
+    Inserts the StudentModuleHistory entries serialized by
+    history_writer.serialize_entry with a single query.
+    """
+    entries = []
+    for fields in serialized_entries:
+        fields = dict(fields)
+        if fields['created'] is not None:
+            fields['created'] = parse_datetime(fields['created'])
+        entries.append(StudentModuleHistory(**fields))
+    bulk_create_entries(entries)
@@ -1,6 +1,7 @@
 """
 Test grade calculation.
 """
+from django.db import IntegrityError
 from django.http import Http404
 from django.test import TestCase
 from django.test.client import RequestFactory
@@ -10,7 +11,13 @@ from nose.plugins.attrib import attr
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
 from opaque_keys.edx.locator import CourseLocator, BlockUsageLocator
 
-from courseware.grades import field_data_cache_for_grading, grade, iterate_grades_for, MaxScoresCache, ProgressSummary
+from courseware.grades import (
+    field_data_cache_for_grading, grade, iterate_grades_for, iterate_grades_for_batched, MaxScoresCache, ProgressSummary
+)
+from courseware.model_data import set_score
+from courseware.models import PersistentSubsectionGrade, SCORE_CHANGED
+from openedx.core.djangoapps.course_groups.models import CohortMembership, CourseUserGroupPartitionGroup
+from openedx.core.djangoapps.course_groups.tests.helpers import CohortFactory
 from student.tests.factories import UserFactory
 from student.models import CourseEnrollment
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
@@ -161,6 +168,13 @@ class TestMaxScoresCache(ModuleStoreTestCase):
         # push to remote cache
         max_scores_cache.push_to_remote()
 
+        # pushed updates are not pushed again, but are still available locally
+        self.assertEqual(max_scores_cache.num_cached_updates(), 0)
+        self.assertEqual(max_scores_cache.get(self.locations[0]), 1)
+        with patch('courseware.grades.cache.set_many') as mock_set_many:
+            max_scores_cache.push_to_remote()
+        self.assertFalse(mock_set_many.called)
+
         # create a new cache with the same params, fetch from remote cache
         max_scores_cache = MaxScoresCache("test_max_scores_cache")
         max_scores_cache.fetch_from_remote(self.locations)
@@ -169,6 +183,152 @@ class TestMaxScoresCache(ModuleStoreTestCase):
         self.assertEqual(max_scores_cache.num_cached_from_remote(), 1)
 
 
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_PERSISTENT_GRADES': True})
+class TestPersistentSubsectionGrades(ModuleStoreTestCase):
+    """
+    Tests that subsection grades are persisted and invalidated on score changes.
+    """
+    def setUp(self):
+        super(TestPersistentSubsectionGrades, self).setUp()
+        self.student = UserFactory.create()
+        self.course = CourseFactory.create()
+        chapter = ItemFactory.create(category='chapter', parent=self.course)
+        self.sequential = ItemFactory.create(
+            category='sequential', parent=chapter, graded=True, format='Homework'
+        )
+        vertical = ItemFactory.create(category='vertical', parent=self.sequential)
+        self.problem = ItemFactory.create(category='problem', parent=vertical)
+        self.course = self.store.get_course(self.course.id)
+
+        CourseEnrollment.enroll(self.student, self.course.id)
+        self.request = RequestFactory().get('/')
+        self.request.user = self.student
+        self.request.session = {}
+
+    def _persisted_grades(self):
+        """Return the persisted grades of the student in the course."""
+        return PersistentSubsectionGrade.objects.filter(user=self.student, course_id=self.course.id)
+
+    def _send_score_changed(self):
+        """Simulate a score change on the problem."""
+        SCORE_CHANGED.send(
+            sender=None,
+            points_possible=1,
+            points_earned=1,
+            user_id=self.student.id,
+            course_id=unicode(self.course.id),
+            usage_id=unicode(self.problem.location)
+        )
+
+    def test_grade_is_persisted(self):
+        set_score(self.student.id, self.problem.location, 1, 1)
+        grade(self.student, self.request, self.course)
+        persisted = self._persisted_grades().get()
+        self.assertEqual(persisted.usage_key.map_into_course(self.course.id), self.sequential.location)
+        self.assertEqual((persisted.earned_graded, persisted.possible_graded), (1.0, 1.0))
+
+    def test_persisted_grade_skips_field_data_cache(self):
+        set_score(self.student.id, self.problem.location, 1, 1)
+        first_grade = grade(self.student, self.request, self.course, keep_raw_scores=True)
+        with patch('courseware.grades.field_data_cache_for_grading') as mock_fdc:
+            second_grade = grade(self.student, self.request, self.course, keep_raw_scores=True)
+            self.assertFalse(mock_fdc.called)
+        self.assertEqual(first_grade['percent'], second_grade['percent'])
+        self.assertEqual(first_grade['raw_scores'], second_grade['raw_scores'])
+
+    def test_score_changed_invalidates_subsection(self):
+        grade(self.student, self.request, self.course)
+        self.assertTrue(self._persisted_grades().exists())
+        set_score(self.student.id, self.problem.location, 1, 1)
+        self._send_score_changed()
+        self.assertFalse(self._persisted_grades().exists())
+        grade_summary = grade(self.student, self.request, self.course)
+        self.assertEqual(grade_summary['percent'], 1.0)
+
+    def test_stale_course_version_is_ignored(self):
+        grade(self.student, self.request, self.course)
+        self._persisted_grades().update(course_version='outdated')
+        set_score(self.student.id, self.problem.location, 1, 1)
+        grade_summary = grade(self.student, self.request, self.course)
+        self.assertEqual(grade_summary['percent'], 1.0)
+
+    @patch('courseware.grades.course_version_key', return_value=u'')
+    def test_unversioned_course_is_not_persisted(self, _mock_version):
+        grade(self.student, self.request, self.course)
+        self.assertFalse(self._persisted_grades().exists())
+
+    def test_concurrently_created_grade_is_overwritten(self):
+        update_or_create = PersistentSubsectionGrade.objects.update_or_create
+
+        def create_concurrently(defaults, **lookup):
+            """Have another request create the row first, then fail like the losing insert."""
+            update_or_create(defaults=dict(defaults, earned_graded=0.0), **lookup)
+            raise IntegrityError('Duplicate entry')
+
+        set_score(self.student.id, self.problem.location, 1, 1)
+        with patch.object(PersistentSubsectionGrade.objects, 'update_or_create', side_effect=create_concurrently):
+            grade(self.student, self.request, self.course)
+        self.assertEqual(self._persisted_grades().get().earned_graded, 1.0)
+
+    def test_cohort_change_invalidates_course(self):
+        grade(self.student, self.request, self.course)
+        self.assertTrue(self._persisted_grades().exists())
+        cohort = CohortFactory.create(course_id=self.course.id)
+        CohortMembership(course_user_group=cohort, user=self.student).save()
+        self.assertFalse(self._persisted_grades().exists())
+
+    def test_content_group_change_invalidates_cohort(self):
+        cohort = CohortFactory.create(course_id=self.course.id, users=[self.student])
+        grade(self.student, self.request, self.course)
+        self.assertTrue(self._persisted_grades().exists())
+        CourseUserGroupPartitionGroup.objects.create(course_user_group=cohort, partition_id=0, group_id=1)
+        self.assertFalse(self._persisted_grades().exists())
+
+    def test_enrollment_mode_change_invalidates_course(self):
+        grade(self.student, self.request, self.course)
+        self.assertTrue(self._persisted_grades().exists())
+        CourseEnrollment.objects.get(user=self.student, course_id=self.course.id).update_enrollment(mode='verified')
+        self.assertFalse(self._persisted_grades().exists())
+
+
+class TestBatchedGradeIteration(ModuleStoreTestCase):
+    """
+    Test that batched grading gives the same gradesets as grading each student separately.
+    """
+    def setUp(self):
+        super(TestBatchedGradeIteration, self).setUp()
+        self.course = CourseFactory.create()
+        chapter = ItemFactory.create(category='chapter', parent=self.course)
+        sequential = ItemFactory.create(category='sequential', parent=chapter, graded=True, format='Homework')
+        vertical = ItemFactory.create(category='vertical', parent=sequential)
+        self.problems = [ItemFactory.create(category='problem', parent=vertical) for _ in xrange(2)]
+        self.course = self.store.get_course(self.course.id)
+
+        self.students = [UserFactory.create() for _ in xrange(5)]
+        for index, student in enumerate(self.students):
+            CourseEnrollment.enroll(student, self.course.id)
+            for problem_index, problem in enumerate(self.problems):
+                set_score(student.id, problem.location, (index + problem_index) % 2, 1)
+
+    def test_batched_gradesets(self):
+        unbatched = {
+            student: gradeset
+            for student, gradeset, __ in iterate_grades_for(self.course.id, self.students, keep_raw_scores=True)
+        }
+        batched = list(iterate_grades_for_batched(self.course.id, self.students, keep_raw_scores=True, batch_size=2))
+        self.assertEqual([student for student, __, __ in batched], self.students)
+        for student, gradeset, err_msg in batched:
+            self.assertEqual(err_msg, "")
+            self.assertEqual(gradeset['percent'], unbatched[student]['percent'])
+            self.assertEqual(gradeset['raw_scores'], unbatched[student]['raw_scores'])
+
+    def test_batched_grading_skips_field_data_cache(self):
+        with patch('courseware.grades.field_data_cache_for_grading') as mock_fdc:
+            results = list(iterate_grades_for_batched(self.course.id, self.students, batch_size=2))
+            self.assertFalse(mock_fdc.called)
+        self.assertEqual(len(results), len(self.students))
+
+
 class TestFieldDataCacheScorableLocations(ModuleStoreTestCase):
     """
     Make sure we can filter the locations we pull back student state for via
@@ -0,0 +1,132 @@
+"""
+Tests for the writers of StudentModuleHistory entries
+"""
+from django.db import DatabaseError, transaction
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.http import HttpResponse
+from mock import patch
+from nose.plugins.attrib import attr
+
+from courseware import history_writer
+from courseware.middleware import HistoryWriterMiddleware
+from courseware.models import StudentModule, StudentModuleHistory
+from courseware.tasks import write_student_module_history
+from courseware.tests.factories import StudentModuleFactory, course_id, location
+
+
+@attr('shard_1')
+class HistoryWriterTestCase(TestCase):
+    """
+    Tests for when and how StudentModuleHistory entries are written
+    """
+    def setUp(self):
+        super(HistoryWriterTestCase, self).setUp()
+        self.addCleanup(history_writer.stop_buffering)
+
+    def _save_modules(self, count):
+        """
+        Saves count problem StudentModules, returning them.
+        """
+        return [
+            StudentModuleFactory.create(
+                course_id=course_id,
+                module_state_key=location(u'problem{}'.format(index)),
+                state='{"attempts": 1}',
+            )
+            for index in range(count)
+        ]
+
+    def test_immediate(self):
+        history_writer.start_buffering()
+        self._save_modules(2)
+        self.assertEqual(StudentModuleHistory.objects.count(), 2)
+
+    @override_settings(STUDENT_MODULE_HISTORY_WRITER='request')
+    def test_request_buffers(self):
+        history_writer.start_buffering()
+        modules = self._save_modules(3)
+        self.assertEqual(StudentModuleHistory.objects.count(), 0)
+
+        # The bulk insert, and its savepoint
+        with self.assertNumQueries(3):
+            history_writer.stop_buffering()
+        self.assertItemsEqual(
+            StudentModuleHistory.objects.values_list('student_module_id', 'state'),
+            [(module.id, module.state) for module in modules],
+        )
+
+    @override_settings(STUDENT_MODULE_HISTORY_WRITER='request')
+    def test_not_buffering(self):
+        self._save_modules(2)
+        self.assertEqual(StudentModuleHistory.objects.count(), 2)
+
+    @override_settings(STUDENT_MODULE_HISTORY_WRITER='request', STUDENT_MODULE_HISTORY_MAX_BUFFERED=2)
+    def test_max_buffered(self):
+        with history_writer.buffered_history():
+            self._save_modules(3)
+            self.assertEqual(StudentModuleHistory.objects.count(), 2)
+        self.assertEqual(StudentModuleHistory.objects.count(), 3)
+
+    @override_settings(STUDENT_MODULE_HISTORY_WRITER='request')
+    def test_flush_failure(self):
+        with patch('courseware.history_writer.bulk_create_entries', side_effect=DatabaseError):
+            with history_writer.buffered_history():
+                self._save_modules(2)
+        self.assertEqual(StudentModuleHistory.objects.count(), 0)
+
+    @override_settings(STUDENT_MODULE_HISTORY_WRITER='request')
+    def test_flush_failure_rolls_back_to_savepoint(self):
+        def failing_bulk_create(entries):
+            """Write one of the entries, then fail."""
+            entries[0].save()
+            raise DatabaseError
+
+        with patch('courseware.history_writer.bulk_create_entries', side_effect=failing_bulk_create):
+            with transaction.atomic():
+                with history_writer.buffered_history():
+                    self._save_modules(2)
+                self.assertEqual(StudentModuleHistory.objects.count(), 0)
+        self.assertEqual(StudentModule.objects.count(), 2)
+
+    @override_settings(STUDENT_MODULE_HISTORY_WRITER='celery')
+    def test_celery(self):
+        with patch('courseware.tasks.write_student_module_history.apply_async') as mock_apply_async:
+            with history_writer.buffered_history():
+                modules = self._save_modules(2)
+        self.assertEqual(StudentModuleHistory.objects.count(), 0)
+        self.assertEqual(mock_apply_async.call_count, 1)
+
+        # Run the task as the worker would
+        (serialized_entries,) = mock_apply_async.call_args[1]['args']
+        self.assertEqual([entry['student_module_id'] for entry in serialized_entries], [m.id for m in modules])
+        write_student_module_history(serialized_entries)
+        history = StudentModuleHistory.objects.order_by('id')
+        self.assertEqual([entry.student_module_id for entry in history], [module.id for module in modules])
+        self.assertEqual([entry.created for entry in history], [module.modified for module in modules])
+
+    @override_settings(STUDENT_MODULE_HISTORY_WRITER='celery')
+    def test_celery_queue_failure(self):
+        with patch('courseware.tasks.write_student_module_history.apply_async', side_effect=IOError):
+            with history_writer.buffered_history():
+                self._save_modules(2)
+        self.assertEqual(StudentModuleHistory.objects.count(), 2)
+
+    @override_settings(STUDENT_MODULE_HISTORY_WRITER='request')
+    def test_middleware(self):
+        middleware = HistoryWriterMiddleware()
+        request = RequestFactory().get('dummy_url')
+
+        middleware.process_request(request)
+        self._save_modules(2)
+        self.assertEqual(StudentModuleHistory.objects.count(), 0)
+        middleware.process_response(request, HttpResponse())
+        self.assertEqual(StudentModuleHistory.objects.count(), 2)
+
+        # Entries buffered by a request that raised are discarded, even once the error response is processed
+        middleware.process_request(request)
+        self._save_modules(1)
+        middleware.process_exception(request, ValueError())
+        middleware.process_response(request, HttpResponse(status=500))
+        self.assertEqual(StudentModuleHistory.objects.count(), 2)
@@ -6,7 +6,14 @@ from mock import Mock, patch
 from nose.plugins.attrib import attr
 from functools import partial
 
-from courseware.model_data import DjangoKeyValueStore, FieldDataCache, InvalidScopeError
+from courseware.model_data import (
+    BulkScoresClient,
+    DjangoKeyValueStore,
+    FieldDataCache,
+    InvalidScopeError,
+    ScoresClient,
+    field_data_unit_of_work,
+)
 from courseware.models import StudentModule, XModuleUserStateSummaryField
 from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
 
@@ -415,3 +422,116 @@ class TestStudentInfoStorage(OtherUserFailureTestMixin, StorageTestBase, TestCas
     storage_class = XModuleStudentInfoField
     other_key_factory = partial(DjangoKeyValueStore.Key, Scope.user_info, 2, 'mock_problem')  # user_id=2, not 1
     existing_field_name = "existing_field"
+
+
+@attr('shard_1')
+class TestFieldDataUnitOfWork(TestCase):
+    """Tests for deferring the writes of a FieldDataCache to the end of a unit of work"""
+
+    def setUp(self):
+        super(TestFieldDataUnitOfWork, self).setUp()
+        student_module = StudentModuleFactory(state=json.dumps({'a_field': 'a_value', 'b_field': 'b_value'}))
+        self.user = student_module.student
+        self.assertEqual(self.user.id, 1)   # check our assumption hard-coded in the key functions above.
+        self.descriptor = mock_descriptor([
+            mock_field(Scope.user_state, 'a_field'),
+            mock_field(Scope.preferences, 'a_pref'),
+        ])
+
+    def _stored_state(self):
+        """Return the state stored in the StudentModule"""
+        return json.loads(StudentModule.objects.get().state)
+
+    def test_writes_coalesced(self):
+        with field_data_unit_of_work():
+            field_data_cache = FieldDataCache([self.descriptor], course_id, self.user)
+            kvs = DjangoKeyValueStore(field_data_cache)
+            with self.assertNumQueries(0):
+                kvs.set(user_state_key('a_field'), 'new_value')
+                kvs.set_many({user_state_key('a_field'): 'newer_value', user_state_key('c_field'): 'c_value'})
+                kvs.set(prefs_key('a_pref'), 'pref_value')
+
+                # Reads see the pending writes
+                self.assertEqual(kvs.get(user_state_key('a_field')), 'newer_value')
+                self.assertTrue(kvs.has(user_state_key('c_field')))
+            self.assertEqual(self._stored_state(), {'a_field': 'a_value', 'b_field': 'b_value'})
+
+        self.assertEqual(self._stored_state(), {'a_field': 'newer_value', 'b_field': 'b_value', 'c_field': 'c_value'})
+        self.assertEqual(json.loads(XModuleStudentPrefsField.objects.get(field_name='a_pref').value), 'pref_value')
+        self.assertEqual(StudentModule.objects.get().studentmodulehistory_set.count(), 1)
+
+        # Once the unit of work is over, writes are immediate again
+        kvs.set(user_state_key('a_field'), 'final_value')
+        self.assertEqual(self._stored_state()['a_field'], 'final_value')
+
+    def test_writes_discarded_on_error(self):
+        with self.assertRaises(ValueError):
+            with field_data_unit_of_work():
+                kvs = DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user))
+                kvs.set(user_state_key('a_field'), 'new_value')
+                kvs.set(prefs_key('a_pref'), 'pref_value')
+                raise ValueError("handler failed")
+        self.assertEqual(self._stored_state(), {'a_field': 'a_value', 'b_field': 'b_value'})
+        self.assertFalse(XModuleStudentPrefsField.objects.exists())
+
+        # Writes are immediate again after the failed unit of work
+        kvs.set(user_state_key('a_field'), 'final_value')
+        self.assertEqual(self._stored_state()['a_field'], 'final_value')
+
+    def test_delete_pending_field(self):
+        with field_data_unit_of_work():
+            kvs = DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user))
+            kvs.set(user_state_key('c_field'), 'c_value')
+            kvs.delete(user_state_key('c_field'))
+            self.assertFalse(kvs.has(user_state_key('c_field')))
+        self.assertEqual(self._stored_state(), {'a_field': 'a_value', 'b_field': 'b_value'})
+
+    def test_new_cache_reads_pending_writes(self):
+        with field_data_unit_of_work():
+            kvs = DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user))
+            kvs.set(user_state_key('a_field'), 'new_value')
+            other_kvs = DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user))
+            self.assertEqual(other_kvs.get(user_state_key('a_field')), 'new_value')
+
+    def test_cache_outside_unit_of_work(self):
+        kvs = DjangoKeyValueStore(FieldDataCache([self.descriptor], course_id, self.user))
+        with field_data_unit_of_work():
+            kvs.set(user_state_key('a_field'), 'new_value')
+            self.assertEqual(self._stored_state()['a_field'], 'new_value')
+
+
+class TestBulkScoresClient(TestCase):
+    """
+    Tests of fetching the scores of many users at once.
+    """
+    def setUp(self):
+        super(TestBulkScoresClient, self).setUp()
+        self.users = [UserFactory.create() for _ in range(3)]
+        for user in self.users[:2]:
+            for name, grade in (('p1', 1), ('p2', 2)):
+                cmfStudentModuleFactory.create(
+                    student=user, course_id=course_id, module_state_key=location(name), grade=grade, max_grade=2
+                )
+
+    def test_client_for(self):
+        bulk_client = BulkScoresClient(course_id, [user.id for user in self.users], chunk_size=2)
+        with self.assertNumQueries(2):
+            bulk_client.fetch_scores()
+
+        for user in self.users[:2]:
+            client = bulk_client.client_for(user.id)
+            self.assertEqual(client.get(location('p1')), ScoresClient.Score(1, 2))
+            self.assertEqual(client.get(location('p2')), ScoresClient.Score(2, 2))
+        self.assertIsNone(bulk_client.client_for(self.users[2].id).get(location('p1')))
+
+    def test_fetch_locations(self):
+        bulk_client = BulkScoresClient(course_id, [user.id for user in self.users])
+        bulk_client.fetch_scores(locations=[location('p2')])
+        client = bulk_client.client_for(self.users[0].id)
+        self.assertNotIn(location('p1'), client)
+        self.assertEqual(client.get(location('p2')), ScoresClient.Score(2, 2))
+
+    def test_client_before_fetch(self):
+        bulk_client = BulkScoresClient(course_id, [user.id for user in self.users])
+        with self.assertRaises(ValueError):
+            bulk_client.client_for(self.users[0].id)
@@ -22,7 +22,7 @@ from pyquery import PyQuery
 from courseware.module_render import hash_resource
 from xblock.field_data import FieldData
 from xblock.runtime import Runtime
-from xblock.fields import ScopeIds
+from xblock.fields import Integer, Scope, ScopeIds
 from xblock.core import XBlock
 from xblock.fragment import Fragment
 
@@ -115,6 +115,23 @@ class GradedStatelessXBlock(XBlock):
         )
 
 
+class FailingHandlerXBlock(XBlock):
+    """
+    This XBlock exists to test that the student state set by a handler which
+    fails is not saved.
+    """
+    count = Integer(scope=Scope.user_state, default=0)
+
+    @XBlock.json_handler
+    def increment_and_fail(self, json_data, suffix):  # pylint: disable=unused-argument
+        """
+        Increment the count, then fail.
+        """
+        self.count += 1
+        self.save()
+        raise ValueError("The handler failed")
+
+
 @attr('shard_1')
 @ddt.ddt
 class ModuleRenderTestCase(ModuleStoreTestCase, LoginEnrollmentTestCase):
@@ -575,6 +592,27 @@ class TestHandleXBlockCallback(ModuleStoreTestCase, LoginEnrollmentTestCase):
         self.assertEquals(student_module.grade, 0.75)
         self.assertEquals(student_module.max_grade, 1)
 
+    @XBlock.register_temp_plugin(FailingHandlerXBlock, identifier='failing_handler')
+    def test_failing_handler_saves_no_state(self):
+        course = CourseFactory.create()
+        block = ItemFactory.create(category='failing_handler', parent=course)
+
+        request = self.request_factory.post('dummy_url', data=json.dumps({}), content_type='application/json')
+        request.user = self.mock_user
+
+        with self.assertRaisesRegexp(ValueError, 'The handler failed'):
+            render.handle_xblock_callback(
+                request,
+                unicode(course.id),
+                quote_slashes(unicode(block.scope_ids.usage_id)),
+                'increment_and_fail',
+                '',
+            )
+        self.assertFalse(StudentModule.objects.filter(
+            student=self.mock_user,
+            module_state_key=block.scope_ids.usage_id,
+        ).exists())
+
     @patch.dict('django.conf.settings.FEATURES', {'ENABLE_XBLOCK_VIEW_ENDPOINT': True})
     def test_xblock_view_handler(self):
         args = [
@@ -1093,6 +1093,24 @@ class TestAnswerDistributions(TestSubmittingProblems):
             }
         )
 
+    def test_merge(self):
+        # Distributions counted separately for different problems, as the
+        # subtasks of the answer distribution report do, merge into the
+        # distribution of the whole course.
+        self.submit_question_answer('p1', {'2_1': u'Correct'})
+        self.submit_question_answer('p2', {'2_1': u'Incorrect'})
+
+        merged = grades.AnswerDistribution(self.course.id)
+        for problem in StudentModule.objects.filter(course_id=self.course.id, module_type='problem'):
+            distribution = grades.AnswerDistribution(self.course.id)
+            distribution.add_modules(
+                grades.submitted_problem_modules(self.course.id, [problem.module_state_key])
+            )
+            merged.merge(distribution)
+
+        self.assertEqual(merged.modules_counted, 2)
+        self.assertEqual(dict(merged.items()), grades.answer_distributions(self.course.id))
+
     def test_other_data_types(self):
         # We'll submit one problem, and then muck with the student_answers
         # dict inside its state to try different data types (str, int, float,
@@ -4,11 +4,12 @@ defined in edx_user_state_client.
 """
 
 from collections import defaultdict
-from unittest import skip
 
 from django.test import TestCase
 
 from edx_user_state_client.tests import UserStateClientTestBase
+from opaque_keys.edx.locator import CourseLocator
+
 from courseware.user_state_client import DjangoXBlockUserStateClient
 from courseware.tests.factories import UserFactory
 
@@ -31,37 +32,25 @@ class TestDjangoUserStateClient(UserStateClientTestBase, TestCase):
         super(TestDjangoUserStateClient, self).setUp()
         self.client = DjangoXBlockUserStateClient()
         self.users = defaultdict(UserFactory.create)
-
-    # We're skipping these tests because the iter_all_by_block and iter_all_by_course
-    # are not implemented in the DjangoXBlockUserStateClient
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_blocks_deleted_block(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_blocks_empty(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_blocks_many_users(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_blocks_single_user(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_course_deleted_block(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_course_empty(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_course_single_user(self):
-        pass
-
-    @skip("Not supported by DjangoXBlockUserStateClient")
-    def test_iter_course_many_users(self):
-        pass
+        self.course_key = CourseLocator('org', 'course', 'run')
+
+    def test_iter_blocks_in_batches(self):
+        block_key = self.course_key.make_usage_key('problem', 'batched')
+        for user_idx in range(5):
+            self.client.set_many(self._user(user_idx), {block_key: {'user_idx': user_idx}})
+
+        with self.assertNumQueries(3):
+            states = list(self.client.iter_all_for_block(block_key, batch_size=2))
+        self.assertItemsEqual(
+            [(state.username, dict(state.state)) for state in states],
+            [(self._user(user_idx), {'user_idx': user_idx}) for user_idx in range(5)],
+        )
+
+    def test_iter_course_by_block_type(self):
+        problem_key = self.course_key.make_usage_key('problem', 'problem')
+        html_key = self.course_key.make_usage_key('html', 'html')
+        self.client.set_many(self._user(0), {problem_key: {'a': 1}, html_key: {'b': 2}})
+
+        states = list(self.client.iter_all_for_course(self.course_key, block_type='problem'))
+        self.assertEqual([state.block_key for state in states], [problem_key])
+        self.assertEqual(dict(states[0].state), {'a': 1})
@@ -4,6 +4,7 @@ data in a Django ORM model.
 """
 
 import itertools
+from collections import Mapping
 from operator import attrgetter
 from time import time
 
@@ -13,12 +14,45 @@ except ImportError:
     import json
 
 import dogstats_wrapper as dog_stats_api
+from django.conf import settings
 from django.contrib.auth.models import User
 from xblock.fields import Scope, ScopeBase
-from courseware.models import StudentModule, StudentModuleHistory
+from courseware.models import StudentModule, StudentModuleHistory, iterate_in_batches
 from edx_user_state_client.interface import XBlockUserStateClient, XBlockUserState
 
 
+class LazyJsonState(Mapping):
+    """
+    A read-only dictionary of XBlock state, which is only decoded from its
+    serialized JSON the first time it is accessed. Streams of many states can
+    then skip decoding the states that are never read, and pass on the
+    serialized ones as they are.
+
+    Raises ValueError when it is first accessed if the JSON is invalid.
+    """
+    def __init__(self, raw):
+        # The serialized JSON of the state
+        self.raw = raw
+        self._state = None
+
+    def _get_state(self):
+        """
+        Return the decoded state.
+        """
+        if self._state is None:
+            self._state = json.loads(self.raw)
+        return self._state
+
+    def __getitem__(self, key):
+        return self._get_state()[key]
+
+    def __iter__(self):
+        return iter(self._get_state())
+
+    def __len__(self):
+        return len(self._get_state())
+
+
 class DjangoXBlockUserStateClient(XBlockUserStateClient):
     """
     An interface that uses the Django ORM StudentModule as a backend.
@@ -341,20 +375,63 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
 
     def iter_all_for_block(self, block_key, scope=Scope.user_state, batch_size=None):
         """
-        You get no ordering guarantees. Fetching will happen in batch_size
-        increments. If you're using this method, you should be running in an
-        async task.
+        Yield XBlockUserState entries for every user's stored state of the
+        specified block, in no particular order. States are fetched
+        batch_size at a time (settings.USER_STATE_BATCH_SIZE by default), and
+        each entry's state is a :class:`LazyJsonState`. If you're using this
+        method, you should be running in an async task.
         """
         if scope != Scope.user_state:
             raise ValueError("Only Scope.user_state is supported")
-        raise NotImplementedError()
+        return self._iter_all(
+            batch_size,
+            scope,
+            course_id=block_key.course_key,
+            module_state_key=block_key,
+        )
 
     def iter_all_for_course(self, course_key, block_type=None, scope=Scope.user_state, batch_size=None):
         """
-        You get no ordering guarantees. Fetching will happen in batch_size
-        increments. If you're using this method, you should be running in an
-        async task.
+        Yield XBlockUserState entries for every user's stored state of all
+        the blocks in the specified course, or only those of block_type, in
+        no particular order. States are fetched batch_size at a time
+        (settings.USER_STATE_BATCH_SIZE by default), and each entry's state is
+        a :class:`LazyJsonState`. If you're using this method, you should be
+        running in an async task.
         """
         if scope != Scope.user_state:
             raise ValueError("Only Scope.user_state is supported")
-        raise NotImplementedError()
+        filters = {'course_id': course_key}
+        if block_type is not None:
+            filters['module_type'] = block_type
+        return self._iter_all(batch_size, scope, **filters)
+
+    def _iter_all(self, batch_size, scope, **filters):
+        """
+        Yield XBlockUserState entries for the stored state of the
+        :class:`~StudentModule`s matching ``filters``, reading them from
+        a read-replica database if one is available.
+        """
+        if batch_size is None:
+            batch_size = settings.USER_STATE_BATCH_SIZE
+
+        queryset = StudentModule.objects.filter(**filters).select_related('student').only(
+            'student__username', 'course_id', 'module_state_key', 'state', 'modified',
+        )
+        if "read_replica" in settings.DATABASES:
+            queryset = queryset.using("read_replica")
+
+        for student_module in iterate_in_batches(queryset, batch_size):
+            # A state of "{}" has been deleted, and so conformant
+            # UserStateClients should treat it as if it doesn't exist.
+            if student_module.state is None or student_module.state == "{}":
+                continue
+
+            usage_key = student_module.module_state_key.map_into_course(student_module.course_id)
+            yield XBlockUserState(
+                student_module.student.username,
+                usage_key,
+                LazyJsonState(student_module.state),
+                student_module.modified,
+                scope,
+            )
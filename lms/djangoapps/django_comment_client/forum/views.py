@@ -185,6 +185,7 @@ def use_bulk_ops(view_func):
 
 @login_required
 @use_bulk_ops
+@cc.utils.memoize_requests
 def inline_discussion(request, course_key, discussion_id):
     """
     Renders JSON for DiscussionModules
@@ -220,6 +221,7 @@ def inline_discussion(request, course_key, discussion_id):
 
 @login_required
 @use_bulk_ops
+@cc.utils.memoize_requests
 def forum_form_discussion(request, course_key):
     """
     Renders the main Discussion page, potentially filtered by a search query
@@ -295,6 +297,7 @@ def forum_form_discussion(request, course_key):
 @require_GET
 @login_required
 @use_bulk_ops
+@cc.utils.memoize_requests
 def single_thread(request, course_key, discussion_id, thread_id):
     """
     Renders a response to display a single discussion thread.
@@ -404,6 +407,7 @@ def single_thread(request, course_key, discussion_id, thread_id):
 @require_GET
 @login_required
 @use_bulk_ops
+@cc.utils.memoize_requests
 def user_profile(request, course_key, user_id):
     """
     Renders a response to display the user profile page (shown after clicking
@@ -430,10 +434,13 @@ def user_profile(request, course_key, user_id):
         else:
             profiled_user = cc.User(id=user_id, course_id=course_key)
 
-        threads, page, num_pages = profiled_user.active_threads(query_params)
+        cc_user = cc.User.from_django_user(request.user)
+        (threads, page, num_pages), user_info = cc.utils.fetch_concurrently(
+            lambda: profiled_user.active_threads(query_params),
+            cc_user.to_dict,
+        )
         query_params['page'] = page
         query_params['num_pages'] = num_pages
-        user_info = cc.User.from_django_user(request.user).to_dict()
 
         with newrelic.agent.FunctionTrace(nr_transaction, "get_metadata_for_threads"):
             annotated_content_info = utils.get_metadata_for_threads(course_key, threads, request.user, user_info)
@@ -469,6 +476,7 @@ def user_profile(request, course_key, user_id):
 
 @login_required
 @use_bulk_ops
+@cc.utils.memoize_requests
 def followed_threads(request, course_key, user_id):
     """
     Ajax-only endpoint retrieving the threads followed by a specific user.
@@ -511,10 +519,13 @@ def followed_threads(request, course_key, user_id):
         if group_id is not None:
             query_params['group_id'] = group_id
 
-        threads, page, num_pages = profiled_user.subscribed_threads(query_params)
+        cc_user = cc.User.from_django_user(request.user)
+        (threads, page, num_pages), user_info = cc.utils.fetch_concurrently(
+            lambda: profiled_user.subscribed_threads(query_params),
+            cc_user.to_dict,
+        )
         query_params['page'] = page
         query_params['num_pages'] = num_pages
-        user_info = cc.User.from_django_user(request.user).to_dict()
 
         with newrelic.agent.FunctionTrace(nr_transaction, "get_metadata_for_threads"):
             annotated_content_info = utils.get_metadata_for_threads(course_key, threads, request.user, user_info)
@@ -272,6 +272,22 @@ class CachedDiscussionIdMapTestCase(ModuleStoreTestCase):
         metadata = utils.get_cached_discussion_id_map(self.course, ['bad_discussion_id'], self.user)
         self.assertEqual(metadata, {})
 
+    def test_get_discussion_id_map_for_repeated_ids(self):
+        with mock.patch.object(utils, 'has_access', wraps=utils.has_access) as mock_has_access:
+            metadata = utils.get_cached_discussion_id_map(
+                self.course,
+                ['test_discussion_id', 'test_discussion_id', 'test_discussion_id_2', 'test_discussion_id'],
+                self.user
+            )
+        self.assertEqual(set(metadata), {'test_discussion_id', 'test_discussion_id_2'})
+        self.assertEqual(mock_has_access.call_count, 2)
+
+    def test_discussion_id_map_loaded_once(self):
+        with mock.patch.object(CourseStructure.objects, 'only', wraps=CourseStructure.objects.only) as mock_only:
+            utils.get_cached_discussion_id_map(self.course, ['test_discussion_id'], self.user)
+            self.assertTrue(utils.discussion_category_id_access(self.course, self.user, 'test_discussion_id_2'))
+        self.assertEqual(mock_only.call_count, 1)
+
     def test_discussion_id_accessible(self):
         self.assertTrue(utils.discussion_category_id_access(self.course, self.user, 'test_discussion_id'))
 
@@ -627,6 +643,28 @@ class CategoryMapTestCase(CategoryMapTestMixin, ModuleStoreTestCase):
         self.assertEqual(set(subsection1["children"]), subsection1_discussions)
         self.assertEqual(set(subsection1["entries"].keys()), subsection1_discussions)
 
+    def test_cached_category_index(self):
+        student = UserFactory.create()
+        self.create_discussion("Chapter", "Discussion")
+        self.create_discussion("Chapter", "Staff Only", visible_to_staff_only=True)
+        self.create_discussion("Chapter", "Future", start=datetime.datetime(datetime.MAXYEAR, 1, 1, tzinfo=UTC))
+
+        with mock.patch.object(utils, 'get_accessible_discussion_modules') as mock_get_modules:
+            student_map = utils.get_discussion_category_map(self.course, student, exclude_unstarted=False)
+            instructor_map = utils.get_discussion_category_map(self.course, self.instructor, exclude_unstarted=False)
+        self.assertFalse(mock_get_modules.called)
+        self.assertEqual(student_map["subcategories"]["Chapter"]["children"], ["Discussion"])
+        self.assertItemsEqual(
+            instructor_map["subcategories"]["Chapter"]["children"],
+            ["Discussion", "Staff Only", "Future"]
+        )
+
+    def test_category_map_without_cache(self):
+        self.create_discussion("Chapter", "Discussion")
+        CourseStructure.objects.all().delete()
+        category_map = utils.get_discussion_category_map(self.course, self.instructor)
+        self.assertEqual(category_map["subcategories"]["Chapter"]["children"], ["Discussion"])
+
     def test_start_date_filter(self):
         now = datetime.datetime.now()
         later = datetime.datetime.max
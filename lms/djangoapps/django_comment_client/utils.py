@@ -15,6 +15,7 @@ from opaque_keys.edx.locations import i4xEncoder
 from opaque_keys.edx.keys import CourseKey
 from xmodule.modulestore.django import modulestore
 from ccx.overrides import get_current_ccx
+from request_cache.middleware import RequestCache
 
 from django_comment_common.models import Role, FORUM_ROLE_STUDENT
 from django_comment_client.permissions import check_permissions_by_view, has_permission, get_team
@@ -23,6 +24,7 @@ from edxmako import lookup_template
 
 from courseware import courses
 from courseware.access import has_access
+from courseware.access_utils import check_start_date
 from openedx.core.djangoapps.content.course_structures.models import CourseStructure
 from openedx.core.djangoapps.course_groups.cohorts import (
     get_course_cohort_settings, get_cohort_by_id, get_cohort_id, is_course_cohorted
@@ -155,19 +157,70 @@ class DiscussionIdMapIsNotCached(Exception):
     pass
 
 
+def _get_cached_course_structure(course):
+    """
+    Returns the CourseStructure of course with only its discussion fields loaded, or None if it does not exist. The
+    course structure is only loaded once per request.
+    """
+    request_cache_dict = RequestCache.get_request_cache().data
+    cache_key = "django_comment_client.utils.course_structure.{}".format(course.id)
+    if cache_key not in request_cache_dict:
+        try:
+            # Only load the discussion fields, not the whole course structure
+            request_cache_dict[cache_key] = CourseStructure.objects.only(
+                'course_id', 'discussion_id_map_json', 'discussion_category_index_json'
+            ).get(course_id=course.id)
+        except CourseStructure.DoesNotExist:
+            request_cache_dict[cache_key] = None
+    return request_cache_dict[cache_key]
+
+
+def get_cached_discussion_id_mapping(course):
+    """
+    Returns the cached mapping of discussion ids to the usage keys of the discussion modules of course. The mapping is
+    only loaded once per request. If the discussion id map is not cached for course, raises a
+    DiscussionIdMapIsNotCached exception.
+    """
+    request_cache_dict = RequestCache.get_request_cache().data
+    cache_key = "django_comment_client.utils.discussion_id_map.{}".format(course.id)
+    if cache_key not in request_cache_dict:
+        course_structure = _get_cached_course_structure(course)
+        request_cache_dict[cache_key] = course_structure.discussion_id_map if course_structure else None
+
+    cached_mapping = request_cache_dict[cache_key]
+    if not cached_mapping:
+        raise DiscussionIdMapIsNotCached()
+    return cached_mapping
+
+
 def get_cached_discussion_key(course, discussion_id):
     """
     Returns the usage key of the discussion module associated with discussion_id if it is cached. If the discussion id
     map is cached but does not contain discussion_id, returns None. If the discussion id map is not cached for course,
     raises a DiscussionIdMapIsNotCached exception.
     """
-    try:
-        cached_mapping = CourseStructure.objects.get(course_id=course.id).discussion_id_map
-        if not cached_mapping:
-            raise DiscussionIdMapIsNotCached()
-        return cached_mapping.get(discussion_id)
-    except CourseStructure.DoesNotExist:
-        raise DiscussionIdMapIsNotCached()
+    return get_cached_discussion_id_mapping(course).get(discussion_id)
+
+
+def get_cached_discussion_modules(course, discussion_ids, user):
+    """
+    Returns a dict mapping those of discussion_ids which are in the cached discussion id map to their discussion
+    modules, if they have the required keys and are accessible to the user. Each distinct discussion id is looked up,
+    fetched and checked once, however many times it is given. If the discussion id map is not cached for course,
+    raises a DiscussionIdMapIsNotCached exception.
+    """
+    cached_mapping = get_cached_discussion_id_mapping(course)
+    store = modulestore()
+    modules = {}
+    with store.bulk_operations(course.id):
+        for discussion_id in set(discussion_ids):
+            key = cached_mapping.get(discussion_id)
+            if not key:
+                continue
+            module = store.get_item(key)
+            if has_required_keys(module) and has_access(user, 'load', module, course.id):
+                modules[discussion_id] = module
+    return modules
 
 
 def get_cached_discussion_id_map(course, discussion_ids, user):
@@ -176,16 +229,8 @@ def get_cached_discussion_id_map(course, discussion_ids, user):
     user. If not, returns the result of get_discussion_id_map
     """
     try:
-        entries = []
-        for discussion_id in discussion_ids:
-            key = get_cached_discussion_key(course, discussion_id)
-            if not key:
-                continue
-            module = modulestore().get_item(key)
-            if not (has_required_keys(module) and has_access(user, 'load', module, course.id)):
-                continue
-            entries.append(get_discussion_id_map_entry(module))
-        return dict(entries)
+        modules = get_cached_discussion_modules(course, discussion_ids, user)
+        return dict(get_discussion_id_map_entry(module) for module in modules.itervalues())
     except DiscussionIdMapIsNotCached:
         return get_discussion_id_map(course, user)
 
@@ -198,6 +243,50 @@ def get_discussion_id_map(course, user):
     return dict(map(get_discussion_id_map_entry, get_accessible_discussion_modules(course, user)))
 
 
+def get_cached_discussion_category_entries(course, user):
+    """
+    Returns a list of (category, entry) tuples for the discussion modules of course which are accessible to the user,
+    built from the discussion category index computed when the course was published. Only the modules which are
+    restricted to staff or to some groups are fetched and checked with has_access; for the others, checking the start
+    date is enough. If the discussion category index is not cached for course, raises a DiscussionIdMapIsNotCached
+    exception.
+    """
+    course_structure = _get_cached_course_structure(course)
+    category_index = course_structure.discussion_category_index if course_structure else None
+    if not category_index:
+        raise DiscussionIdMapIsNotCached()
+
+    is_staff = bool(has_access(user, 'staff', course, course.id))
+    store = modulestore()
+    entries = []
+    with store.bulk_operations(course.id):
+        for index_entry in category_index:
+            if is_staff:
+                accessible = True
+            elif index_entry["restricted"]:
+                accessible = has_access(user, 'load', store.get_item(index_entry["usage_key"]), course.id)
+            else:
+                accessible = check_start_date(user, index_entry["days_early_for_beta"], index_entry["start"], course.id)
+            if accessible:
+                entries.append(_get_discussion_category_entry(
+                    index_entry["category"],
+                    index_entry["id"],
+                    index_entry["title"],
+                    index_entry["sort_key"],
+                    index_entry["start"],
+                ))
+    return entries
+
+
+def _get_discussion_category_entry(category, discussion_id, title, sort_key, start):
+    """
+    Returns a (category, entry) tuple for the given discussion, as consumed by get_discussion_category_map.
+    """
+    # Handle case where start is None
+    entry_start_date = start if start else datetime.max.replace(tzinfo=pytz.UTC)
+    return category, {"title": title, "id": discussion_id, "sort_key": sort_key, "start_date": entry_start_date}
+
+
 def _filter_unstarted_categories(category_map):
     """
     Returns a subset of categories from the provided map which have not yet met the start date
@@ -301,18 +390,24 @@ def get_discussion_category_map(course, user, cohorted_if_in_list=False, exclude
     """
     unexpanded_category_map = defaultdict(list)
 
-    modules = get_accessible_discussion_modules(course, user)
+    try:
+        category_entries = get_cached_discussion_category_entries(course, user)
+    except DiscussionIdMapIsNotCached:
+        category_entries = [
+            _get_discussion_category_entry(
+                " / ".join([x.strip() for x in module.discussion_category.split("/")]),
+                module.discussion_id,
+                module.discussion_target,
+                module.sort_key,
+                module.start,
+            )
+            for module in get_accessible_discussion_modules(course, user)
+        ]
 
     course_cohort_settings = get_course_cohort_settings(course.id)
 
-    for module in modules:
-        id = module.discussion_id
-        title = module.discussion_target
-        sort_key = module.sort_key
-        category = " / ".join([x.strip() for x in module.discussion_category.split("/")])
-        # Handle case where module.start is None
-        entry_start_date = module.start if module.start else datetime.max.replace(tzinfo=pytz.UTC)
-        unexpanded_category_map[category].append({"title": title, "id": id, "sort_key": sort_key, "start_date": entry_start_date})
+    for category, entry in category_entries:
+        unexpanded_category_map[category].append(entry)
 
     category_map = {"entries": defaultdict(dict), "subcategories": defaultdict(dict)}
     for category_path, entries in unexpanded_category_map.items():
@@ -395,11 +490,7 @@ def discussion_category_id_access(course, user, discussion_id):
     if discussion_id in course.top_level_discussion_topic_ids:
         return True
     try:
-        key = get_cached_discussion_key(course, discussion_id)
-        if not key:
-            return False
-        module = modulestore().get_item(key)
-        return has_required_keys(module) and has_access(user, 'load', module, course.id)
+        return discussion_id in get_cached_discussion_modules(course, [discussion_id], user)
     except DiscussionIdMapIsNotCached:
         return discussion_id in get_discussion_categories_ids(course, user)
 
@@ -245,6 +245,7 @@ class TestInstructorAPIDenyLevels(SharedModuleStoreTestCase, LoginEnrollmentTest
             ('get_exec_summary_report', {}),
             ('get_proctored_exam_results', {}),
             ('get_problem_responses', {}),
+            ('answer_distribution_report', {}),
         ]
         # Endpoints that only Instructors can access
         self.instructor_level_endpoints = [
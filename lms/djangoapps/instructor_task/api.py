@@ -21,6 +21,7 @@ from instructor_task.tasks import (
     calculate_problem_responses_csv,
     calculate_grades_csv,
     calculate_problem_grade_report,
+    calculate_answer_distribution_csv,
     calculate_students_features_csv,
     cohort_students,
     enrollment_report_features_csv,
@@ -325,6 +326,20 @@ def submit_problem_grade_report(request, course_key):
     return submit_task(request, task_type, task_class, course_key, task_input, task_key)
 
 
+def submit_calculate_answer_distribution_csv(request, course_key):
+    """
+    Submits a task to generate a CSV with the distribution of the answers
+    submitted to the problems of the course.
+
+    Raises AlreadyRunningError if said CSV is already being generated.
+    """
+    task_type = 'answer_distribution'
+    task_class = calculate_answer_distribution_csv
+    task_input = {}
+    task_key = ""
+    return submit_task(request, task_type, task_class, course_key, task_input, task_key)
+
+
 def submit_calculate_students_features_csv(request, course_key, features):
     """
     Submits a task to generate a CSV containing student profile info.
@@ -14,8 +14,10 @@ ASSUMPTIONS: modules have unique IDs, even across different module_types
 """
 from cStringIO import StringIO
 from gzip import GzipFile
+from tempfile import NamedTemporaryFile, TemporaryFile
 from uuid import uuid4
 import csv
+import errno
 import json
 import hashlib
 import os.path
@@ -184,16 +186,28 @@ class ReportStore(object):
     passing in the whole dataset. Doing that for now just because it's simpler.
     """
     @classmethod
-    def from_config(cls, config_name):
+    def from_config(cls, config_name, sub_path=None):
         """
         Return one of the ReportStore subclasses depending on django
         configuration. Look at subclasses for expected configuration.
+
+        If `sub_path` is given, files are stored below that path of the
+        configured storage, where they won't be listed by `links_for()` of
+        the store for the configuration itself, e.g. for partial reports.
         """
         storage_type = getattr(settings, config_name).get("STORAGE_TYPE")
         if storage_type.lower() == "s3":
-            return S3ReportStore.from_config(config_name)
+            return S3ReportStore.from_config(config_name, sub_path)
         elif storage_type.lower() == "localfs":
-            return LocalFSReportStore.from_config(config_name)
+            return LocalFSReportStore.from_config(config_name, sub_path)
+
+    def _get_utf8_decoded_rows(self, reader):
+        """
+        Given a csv `reader` over utf-8 encoded data, yield its rows as lists
+        of unicode strings.
+        """
+        for row in reader:
+            yield [item.decode('utf-8') for item in row]
 
     def _get_utf8_encoded_rows(self, rows):
         """
@@ -205,6 +219,60 @@ class ReportStore(object):
             yield [unicode(item).encode('utf-8') for item in row]
 
 
+class _MultipartUploadBuffer(object):
+    """
+    A write-only file object for streaming data to an S3 key. Data is
+    buffered until it reaches `part_size`, and then sent as a part of a
+    multipart upload of the key, which must be `complete()`d (or `cancel()`ed)
+    once everything has been written.
+
+    If less than a single part is ever written, no upload is started and the
+    data is left in `buffer` instead.
+    """
+    def __init__(self, key, headers, part_size):
+        self.key = key
+        self.headers = headers
+        self.part_size = part_size
+        self.buffer = StringIO()
+        self._upload = None
+        self._num_parts = 0
+
+    @property
+    def is_multipart(self):
+        """Whether a multipart upload has been started."""
+        return self._upload is not None
+
+    def write(self, data):
+        """Buffer `data`, and upload the buffer as a part once it is large enough."""
+        self.buffer.write(data)
+        if self.buffer.tell() >= self.part_size:
+            self._upload_part()
+
+    def flush(self):
+        """Parts are only uploaded once they are large enough, so this does nothing."""
+        pass
+
+    def _upload_part(self):
+        """Upload the buffered data as the next part of the multipart upload."""
+        if self._upload is None:
+            self._upload = self.key.bucket.initiate_multipart_upload(self.key.key, headers=self.headers)
+        self._num_parts += 1
+        self.buffer.seek(0)
+        self._upload.upload_part_from_file(self.buffer, self._num_parts)
+        self.buffer = StringIO()
+
+    def complete(self):
+        """Upload the remaining data and complete the multipart upload."""
+        if self.buffer.tell():
+            self._upload_part()
+        self._upload.complete_upload()
+
+    def cancel(self):
+        """Cancel the multipart upload, if one was started."""
+        if self._upload is not None:
+            self._upload.cancel_upload()
+
+
 class S3ReportStore(ReportStore):
     """
     Reports store backed by S3. The directory structure we use to store things
@@ -217,6 +285,9 @@ class S3ReportStore(ReportStore):
     conventions on where files are stored to know what to display. Clients using
     this class can name the final file whatever they want.
     """
+    # The size of the parts of multipart uploads. S3 requires at least 5MB.
+    MULTIPART_UPLOAD_PART_SIZE = 8 * 1024 * 1024
+
     def __init__(self, bucket_name, root_path):
         self.root_path = root_path
 
@@ -228,7 +299,7 @@ class S3ReportStore(ReportStore):
         self.bucket = conn.get_bucket(bucket_name)
 
     @classmethod
-    def from_config(cls, config_name):
+    def from_config(cls, config_name, sub_path=None):
         """
         The expected configuration for an `S3ReportStore` is to have a
         `GRADES_DOWNLOAD` dict in settings with the following fields::
@@ -242,10 +313,10 @@ class S3ReportStore(ReportStore):
         Since S3 access relies on boto, you must also define `AWS_ACCESS_KEY_ID`
         and `AWS_SECRET_ACCESS_KEY` in settings.
         """
-        return cls(
-            getattr(settings, config_name).get("BUCKET"),
-            getattr(settings, config_name).get("ROOT_PATH")
-        )
+        root_path = getattr(settings, config_name).get("ROOT_PATH")
+        if sub_path:
+            root_path = "{}/{}".format(root_path, sub_path)
+        return cls(getattr(settings, config_name).get("BUCKET"), root_path)
 
     def key_for(self, course_id, filename):
         """Return the S3 key we would use to store and retrieve the data for the
@@ -299,19 +370,53 @@ class S3ReportStore(ReportStore):
     def store_rows(self, course_id, filename, rows):
         """
         Given a `course_id`, `filename`, and `rows` (each row is an iterable of
-        strings), create a buffer that is a gzip'd csv file, and then `store()`
-        that buffer.
+        strings), write the rows to a gzip'd csv file in S3.
+
+        `rows` can be any iterable, e.g. a generator, and is consumed as the
+        file is written: once the compressed file outgrows a single
+        `MULTIPART_UPLOAD_PART_SIZE` part, it is sent as a multipart upload
+        part by part, so only about one part is ever held in memory. Smaller
+        files are simply `store()`d. Either way, the file only becomes visible
+        once it is complete.
 
         Even though we store it in gzip format, browsers will transparently
         download and decompress it. Filenames should end in `.csv`, not `.gz`.
         """
-        output_buffer = StringIO()
-        gzip_file = GzipFile(fileobj=output_buffer, mode="wb")
-        csvwriter = csv.writer(gzip_file)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
-        gzip_file.close()
+        key = self.key_for(course_id, filename)
+        output = _MultipartUploadBuffer(
+            key, {"Content-Encoding": "gzip", "Content-Type": "text/csv"}, self.MULTIPART_UPLOAD_PART_SIZE
+        )
+        try:
+            gzip_file = GzipFile(fileobj=output, mode="wb")
+            csvwriter = csv.writer(gzip_file)
+            csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+            gzip_file.close()
+            if output.is_multipart:
+                output.complete()
+        except Exception:
+            output.cancel()
+            raise
+
+        if not output.is_multipart:
+            self.store(course_id, filename, output.buffer)
+
+    def iter_rows(self, course_id, filename):
+        """
+        Yield the rows of a csv file stored by `store_rows()`, as lists of
+        unicode strings. The file is downloaded to a temporary file rather than
+        into memory.
+        """
+        key = self.key_for(course_id, filename)
+        with TemporaryFile() as temp_file:
+            key.get_contents_to_file(temp_file)
+            temp_file.seek(0)
+            gzip_file = GzipFile(fileobj=temp_file, mode="rb")
+            for row in self._get_utf8_decoded_rows(csv.reader(gzip_file)):
+                yield row
 
-        self.store(course_id, filename, output_buffer)
+    def delete(self, course_id, filename):
+        """Delete the file `filename` stored for `course_id`."""
+        self.key_for(course_id, filename).delete()
 
     def links_for(self, course_id):
         """
@@ -325,6 +430,16 @@ class S3ReportStore(ReportStore):
         ]
 
 
+def _get_umask():
+    """
+    Return the umask of the process. The umask can only be read by setting it,
+    so it is immediately restored.
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
 class LocalFSReportStore(ReportStore):
     """
     LocalFS implementation of a ReportStore. This is meant for debugging
@@ -345,7 +460,7 @@ class LocalFSReportStore(ReportStore):
             os.makedirs(root_path)
 
     @classmethod
-    def from_config(cls, config_name):
+    def from_config(cls, config_name, sub_path=None):
         """
         Generate an instance of this object from Django settings. It assumes
         that there is a dict in settings named GRADES_DOWNLOAD and that it has
@@ -356,7 +471,10 @@ class LocalFSReportStore(ReportStore):
             STORAGE_TYPE : "localfs"
             ROOT_PATH : /tmp/edx/report-downloads/
         """
-        return cls(getattr(settings, config_name).get("ROOT_PATH"))
+        root_path = getattr(settings, config_name).get("ROOT_PATH")
+        if sub_path:
+            root_path = os.path.join(root_path, sub_path)
+        return cls(root_path)
 
     def path_to(self, course_id, filename):
         """Return the full path to a given file for a given course."""
@@ -381,12 +499,48 @@ class LocalFSReportStore(ReportStore):
         """
         Given a course_id, filename, and rows (each row is an iterable of strings),
         write this data out.
+
+        `rows` can be any iterable, e.g. a generator, and is written out as it
+        is consumed. The rows are written to a temporary file which is then
+        moved into place, so that only complete files are ever visible.
         """
-        output_buffer = StringIO()
-        csvwriter = csv.writer(output_buffer)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+        full_path = self.path_to(course_id, filename)
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            os.mkdir(directory)
 
-        self.store(course_id, filename, output_buffer)
+        temp_file = NamedTemporaryFile(dir=self.root_path, delete=False)
+        try:
+            with temp_file:
+                csvwriter = csv.writer(temp_file)
+                csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+            # Temporary files are only readable by their owner; give the report the
+            # permissions a file opened by `store()` would have.
+            os.chmod(temp_file.name, 0666 & ~_get_umask())
+            os.rename(temp_file.name, full_path)
+        except Exception:
+            os.remove(temp_file.name)
+            raise
+
+    def iter_rows(self, course_id, filename):
+        """
+        Yield the rows of a csv file stored by `store_rows()`, as lists of
+        unicode strings.
+        """
+        with open(self.path_to(course_id, filename), "rb") as f:
+            for row in self._get_utf8_decoded_rows(csv.reader(f)):
+                yield row
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file `filename` stored for `course_id`, if it exists, like
+        deleting a missing key from S3.
+        """
+        try:
+            os.remove(self.path_to(course_id, filename))
+        except OSError as error:
+            if error.errno != errno.ENOENT:
+                raise
 
     def links_for(self, course_id):
         """
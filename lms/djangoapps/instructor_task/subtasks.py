@@ -8,7 +8,7 @@ import psutil
 from contextlib import contextmanager
 import logging
 
-from celery.states import SUCCESS, READY_STATES, RETRY
+from celery.states import SUCCESS, FAILURE, READY_STATES, RETRY
 import dogstats_wrapper as dog_stats_api
 
 from django.db import transaction, DatabaseError
@@ -463,7 +463,7 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
         raise DuplicateTaskException(msg)
 
 
-def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count=0):
+def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count=0, complete_entry=True):
     """
     Update the status of the subtask in the parent InstructorTask object tracking its progress.
 
@@ -474,9 +474,11 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
 
     The subtask lock acquired in the call to check_subtask_is_valid() is released here, only when
     the attempting of retries has concluded.
+
+    Returns True if this was the last of the InstructorTask's subtasks to complete.
     """
     try:
-        _update_subtask_status(entry_id, current_task_id, new_subtask_status)
+        return _update_subtask_status(entry_id, current_task_id, new_subtask_status, complete_entry)
     except DatabaseError:
         # If we fail, try again recursively.
         retry_count += 1
@@ -484,7 +486,7 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
             TASK_LOG.info("Retrying to update status for subtask %s of instructor task %d with status %s:  retry %d",
                           current_task_id, entry_id, new_subtask_status, retry_count)
             dog_stats_api.increment('instructor_task.subtask.retry_after_failed_update')
-            update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count)
+            return update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count, complete_entry)
         else:
             TASK_LOG.info("Failed to update status after %d retries for subtask %s of instructor task %d with status %s",
                           retry_count, current_task_id, entry_id, new_subtask_status)
@@ -498,7 +500,7 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
 
 
 @transaction.atomic
-def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
+def _update_subtask_status(entry_id, current_task_id, new_subtask_status, complete_entry=True):
     """
     Update the status of the subtask in the parent InstructorTask object tracking its progress.
 
@@ -524,6 +526,11 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     information for each subtask.  At the moment, the value for each subtask (keyed by its task_id)
     is the value of the SubtaskStatus.to_dict(), but could be expanded in future to store information
     about failure messages, progress made, etc.
+
+    If `complete_entry` is False, the InstructorTask is left in PROGRESS once all its subtasks are
+    done, for the caller to complete it with `complete_subtasks` when it is finished with them.
+
+    Returns True if this was the last of the subtasks to complete.
     """
     TASK_LOG.info("Preparing to update status for subtask %s for instructor task %d with status %s",
                   current_task_id, entry_id, new_subtask_status)
@@ -574,7 +581,7 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
         # At present, we mark the task as having succeeded.  In future, we should see
         # if there was a catastrophic failure that occurred, and figure out how to
         # report that here.
-        if num_remaining <= 0:
+        if num_remaining <= 0 and complete_entry:
             entry.task_state = SUCCESS
         entry.subtasks = json.dumps(subtask_dict)
         entry.task_output = InstructorTask.create_output_for_success(task_progress)
@@ -583,7 +590,24 @@ def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
         entry.save()
         TASK_LOG.info("Task output updated to %s for subtask %s of instructor task %d",
                       entry.task_output, current_task_id, entry_id)
+        return num_remaining <= 0
     except Exception:
         TASK_LOG.exception("Unexpected error while updating InstructorTask.")
         dog_stats_api.increment('instructor_task.subtask.update_exception')
         raise
+
+
+def complete_subtasks(entry_id, exception=None, traceback_string=None):
+    """
+    Mark the InstructorTask `entry_id`, whose subtasks were all updated with
+    `complete_entry=False`, as having succeeded, or as having failed with
+    `exception` if one is given.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+    if exception is None:
+        entry.task_state = SUCCESS
+    else:
+        TASK_LOG.warning(u"Instructor task %d failed after completing its subtasks", entry_id)
+        entry.task_output = InstructorTask.create_output_for_failure(exception, traceback_string)
+        entry.task_state = FAILURE
+    entry.save_now()
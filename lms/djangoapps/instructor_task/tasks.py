@@ -31,11 +31,15 @@ from instructor_task.tasks_helper import (
     run_main_task,
     BaseInstructorTask,
     perform_module_state_update,
+    prepare_rescore_problem_module_state,
     rescore_problem_module_state,
     reset_attempts_module_state,
     delete_problem_module_state,
     upload_problem_responses_csv,
     upload_grades_csv,
+    upload_grades_csv_part,
+    upload_answer_distribution_csv,
+    upload_answer_distribution_csv_part,
     upload_problem_grade_report,
     upload_students_csv,
     cohort_students_and_upload,
@@ -78,7 +82,8 @@ def rescore_problem(entry_id, xmodule_instance_args):
         """Filter that matches problems which are marked as being done"""
         return modules_to_update.filter(state__contains='"done": true')
 
-    visit_fcn = partial(perform_module_state_update, update_fcn, filter_fcn)
+    prepare_fcn = partial(prepare_rescore_problem_module_state, xmodule_instance_args)
+    visit_fcn = partial(perform_module_state_update, update_fcn, filter_fcn, prepare_fcn=prepare_fcn)
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
@@ -171,10 +176,43 @@ def calculate_grades_csv(entry_id, xmodule_instance_args):
         xmodule_instance_args.get('task_id'), entry_id, action_name
     )
 
-    task_fn = partial(upload_grades_csv, xmodule_instance_args)
+    task_fn = partial(upload_grades_csv, xmodule_instance_args, part_task=calculate_grades_csv_part)
     return run_main_task(entry_id, task_fn, action_name)
 
 
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
+def calculate_grades_csv_part(entry_id, student_ids, subtask_status_dict):
+    """
+    Grade a range of the students of a course for the grade report of a
+    `calculate_grades_csv` task which was split into subtasks.
+    """
+    return upload_grades_csv_part(entry_id, student_ids, subtask_status_dict)
+
+
+@task(base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
+def calculate_answer_distribution_csv(entry_id, xmodule_instance_args):
+    """
+    Count the answers submitted to the problems of a course and push the
+    distribution to an S3 bucket for download.
+    """
+    # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
+    action_name = ugettext_noop('generated')
+    task_fn = partial(
+        upload_answer_distribution_csv, xmodule_instance_args, part_task=calculate_answer_distribution_csv_part
+    )
+    return run_main_task(entry_id, task_fn, action_name)
+
+
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
+def calculate_answer_distribution_csv_part(entry_id, usage_ids, subtask_status_dict):
+    """
+    Count the answers to some of the problems of a course for the answer
+    distribution of a `calculate_answer_distribution_csv` task which was split
+    into subtasks.
+    """
+    return upload_answer_distribution_csv_part(entry_id, usage_ids, subtask_status_dict)
+
+
 @task(base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
 def calculate_problem_grade_report(entry_id, xmodule_instance_args):
     """
@@ -3,14 +3,18 @@ This file contains tasks that are designed to perform background operations on t
 running state of a course.
 
 """
+import heapq
 import json
 import re
+import sys
+import traceback
 from collections import OrderedDict
 from datetime import datetime
 from django.conf import settings
 from eventtracking import tracker
 from itertools import chain
 from time import time
+from uuid import uuid4
 import unicodecsv
 import logging
 
@@ -32,6 +36,7 @@ from shoppingcart.models import (
 from survey.models import SurveyAnswer
 
 from track.views import task_track
+from capa.safe_exec import safe_exec_many
 from util.db import outer_atomic
 from util.file import course_filename_prefix_generator, UniversalNewlineIterator
 from xblock.runtime import KvsFieldData
@@ -46,9 +51,14 @@ from certificates.models import (
 )
 from certificates.api import generate_user_certificates
 from courseware.courses import get_course_by_id, get_problems_in_section
-from courseware.grades import iterate_grades_for
-from courseware.models import StudentModule
-from courseware.model_data import DjangoKeyValueStore, FieldDataCache
+from courseware.grades import (
+    GRADING_BATCH_SIZE,
+    AnswerDistribution,
+    iterate_grades_for_batched,
+    submitted_problem_modules,
+)
+from courseware.models import StudentModule, chunks, iterate_in_batches
+from courseware.model_data import BulkScoresClient, DjangoKeyValueStore, FieldDataCache
 from courseware.module_render import get_module_for_descriptor_internal
 from instructor_analytics.basic import (
     enrolled_students_features,
@@ -58,13 +68,21 @@ from instructor_analytics.basic import (
 )
 from instructor_analytics.csvs import format_dictlist
 from instructor_task.models import ReportStore, InstructorTask, PROGRESS
+from instructor_task.subtasks import (
+    SubtaskStatus,
+    check_subtask_is_valid,
+    complete_subtasks,
+    initialize_subtask_info,
+    queue_subtasks_for_query,
+    update_subtask_status,
+)
 from lms.djangoapps.lms_xblock.runtime import LmsPartitionService
 from openedx.core.djangoapps.course_groups.cohorts import get_cohort
 from openedx.core.djangoapps.course_groups.models import CourseUserGroup
 from openedx.core.djangoapps.content.course_structures.models import CourseStructure
 from opaque_keys.edx.keys import UsageKey
 from openedx.core.djangoapps.course_groups.cohorts import add_user_to_cohort, is_course_cohorted
-from student.models import CourseEnrollment, CourseAccessRole
+from student.models import CourseEnrollment, CourseAccessRole, anonymous_id_for_user
 from lms.djangoapps.teams.models import CourseTeamMembership
 from lms.djangoapps.verify_student.models import SoftwareSecurePhotoVerification
 
@@ -79,6 +97,12 @@ UPDATE_STATUS_SUCCEEDED = 'succeeded'
 UPDATE_STATUS_FAILED = 'failed'
 UPDATE_STATUS_SKIPPED = 'skipped'
 
+# How many StudentModules perform_module_state_update prepares the updates of at once
+MODULE_STATE_UPDATE_CHUNK_SIZE = 1000
+
+# The path below the GRADES_DOWNLOAD storage where grade report subtasks store their partial reports
+GRADE_REPORT_PARTS_PATH = 'partial'
+
 # The setting name used for events when "settings" (account settings, preferences, profile information) change.
 REPORT_REQUESTED_EVENT_NAME = u'edx.instructor.report.requested'
 
@@ -178,6 +202,14 @@ class UpdateProblemModuleStateError(Exception):
     pass
 
 
+class IncompleteReportError(Exception):
+    """
+    Error signaling that some subtasks of a report InstructorTask failed, so
+    that their parts of the report are missing.
+    """
+    pass
+
+
 def _get_current_task():
     """
     Stub to make it easier to test without actually running Celery.
@@ -297,7 +329,8 @@ def run_main_task(entry_id, task_fcn, action_name):
     return task_progress
 
 
-def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, task_input, action_name):
+def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, task_input, action_name,
+                                prepare_fcn=None):
     """
     Performs generic update by visiting StudentModule instances with the update_fcn provided.
 
@@ -315,6 +348,10 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     the update is successful; False indicates the update on the particular student module failed.
     A raised exception indicates a fatal condition -- that no other student modules should be considered.
 
+    If a `prepare_fcn` is not None, it is called on each chunk of MODULE_STATE_UPDATE_CHUNK_SIZE StudentModule
+    instances before `update_fcn` is called on them, so that it can prepare their updates together.  It is
+    passed the dict of module descriptors by usage id, and the list of StudentModules.
+
     The return value is a dict containing the task's results, with the following keys:
 
           'attempted': number of attempts made
@@ -375,23 +412,29 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     task_progress = TaskProgress(action_name, modules_to_update.count(), start_time)
     task_progress.update_task_state()
 
-    for module_to_update in modules_to_update:
-        task_progress.attempted += 1
-        module_descriptor = problems[unicode(module_to_update.module_state_key)]
-        # There is no try here:  if there's an error, we let it throw, and the task will
-        # be marked as FAILED, with a stack trace.
-        with dog_stats_api.timer('instructor_tasks.module.time.step', tags=[u'action:{name}'.format(name=action_name)]):
-            update_status = update_fcn(module_descriptor, module_to_update)
-            if update_status == UPDATE_STATUS_SUCCEEDED:
-                # If the update_fcn returns true, then it performed some kind of work.
-                # Logging of failures is left to the update_fcn itself.
-                task_progress.succeeded += 1
-            elif update_status == UPDATE_STATUS_FAILED:
-                task_progress.failed += 1
-            elif update_status == UPDATE_STATUS_SKIPPED:
-                task_progress.skipped += 1
-            else:
-                raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
+    for modules_chunk in chunks(modules_to_update, MODULE_STATE_UPDATE_CHUNK_SIZE):
+        if prepare_fcn is not None:
+            prepare_fcn(problems, modules_chunk)
+
+        for module_to_update in modules_chunk:
+            task_progress.attempted += 1
+            module_descriptor = problems[unicode(module_to_update.module_state_key)]
+            # There is no try here:  if there's an error, we let it throw, and the task will
+            # be marked as FAILED, with a stack trace.
+            with dog_stats_api.timer(
+                'instructor_tasks.module.time.step', tags=[u'action:{name}'.format(name=action_name)]
+            ):
+                update_status = update_fcn(module_descriptor, module_to_update)
+                if update_status == UPDATE_STATUS_SUCCEEDED:
+                    # If the update_fcn returns true, then it performed some kind of work.
+                    # Logging of failures is left to the update_fcn itself.
+                    task_progress.succeeded += 1
+                elif update_status == UPDATE_STATUS_FAILED:
+                    task_progress.failed += 1
+                elif update_status == UPDATE_STATUS_SKIPPED:
+                    task_progress.skipped += 1
+                else:
+                    raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
 
     return task_progress.update_task_state()
 
@@ -468,6 +511,121 @@ def _get_module_instance_for_task(course_id, student, module_descriptor, xmodule
     )
 
 
+def prepare_rescore_problem_module_state(xmodule_instance_args, problems, student_modules):
+    """
+    Prepares the rescoring of the given `student_modules` for all of them at once.
+
+    The scripts of their problems are executed with `safe_exec_many`, and the results put in the
+    cache used by the problems' scripts, so that instantiating each student's problem in
+    `rescore_problem_module_state` doesn't execute its script in a sandbox of its own.  Then the
+    answers of the students who share a problem and seed are graded together, for the responses
+    which support it, and their scores cached for rescoring.  Each problem is instantiated for one
+    of its students to find its script, and once more for each other seed shared by several
+    students.  Failures are logged, and leave the scripts to be executed and the answers graded for
+    each student.
+    """
+    modules_by_problem = OrderedDict()
+    for student_module in student_modules:
+        modules_by_problem.setdefault(unicode(student_module.module_state_key), []).append(student_module)
+
+    for usage_id, problem_modules in modules_by_problem.iteritems():
+        first_module = problem_modules[0]
+        instance = _get_module_instance_for_task(
+            first_module.course_id,
+            first_module.student,
+            problems[usage_id],
+            xmodule_instance_args,
+            grade_bucket_type='rescore',
+        )
+        lcp = getattr(instance, 'lcp', None)
+        if lcp is None:
+            continue
+
+        if lcp.context.get('script_code'):
+            _prepare_problem_scripts(lcp, usage_id, problem_modules[1:])
+        _prepare_problem_scores(xmodule_instance_args, problems[usage_id], instance, problem_modules)
+
+
+def _prepare_problem_scripts(lcp, usage_id, student_modules):
+    """
+    Executes the script of the problem `lcp` for all of the given `student_modules` at once.
+    """
+    inputs = []
+    for student_module in student_modules:
+        seed = json.loads(student_module.state).get('seed') if student_module.state else None
+        if seed is None:
+            continue
+        # Matches the context in which LoncapaProblem executes the script.
+        context = {
+            'seed': seed,
+            'anonymous_student_id': anonymous_id_for_user(student_module.student, None, save=False),
+        }
+        inputs.append((context, seed))
+
+    try:
+        with dog_stats_api.timer('instructor_tasks.rescore.time.prepare'):
+            safe_exec_many(
+                lcp.context['script_code'],
+                inputs,
+                python_path=lcp.context['python_path'],
+                extra_files=lcp.context['extra_files'],
+                cache=lcp.capa_system.cache,
+                slug=lcp.problem_id,
+                unsafely=lcp.capa_system.can_execute_unsafe_code(),
+            )
+    except Exception:  # pylint: disable=broad-except
+        # The scripts will be executed for each student instead.
+        TASK_LOG.exception(u"failed to prepare the rescoring of problem %s", usage_id)
+
+
+def _prepare_problem_scores(xmodule_instance_args, module_descriptor, first_instance, student_modules):
+    """
+    Grades together the answers of the given `student_modules` to the problem of `module_descriptor`,
+    for each seed shared by several of them, and caches their scores for rescoring.
+
+    `first_instance` is the problem instantiated for the first of the `student_modules`.  Only the
+    responses with a `get_scores` method grade many answers at once.
+    """
+    if not any(hasattr(responder, 'get_scores') for responder in first_instance.lcp.responders.values()):
+        return
+
+    states_by_seed = OrderedDict()
+    for student_module in student_modules:
+        state = json.loads(student_module.state) if student_module.state else {}
+        if state.get('seed') is not None:
+            states_by_seed.setdefault(state['seed'], []).append((student_module, state))
+
+    for seed, module_states in states_by_seed.iteritems():
+        if len(module_states) < 2:
+            # There is nothing to share.
+            continue
+
+        try:
+            with dog_stats_api.timer('instructor_tasks.rescore.time.prepare_scores'):
+                if seed == first_instance.lcp.seed:
+                    instance = first_instance
+                else:
+                    student_module = module_states[0][0]
+                    instance = _get_module_instance_for_task(
+                        student_module.course_id,
+                        student_module.student,
+                        module_descriptor,
+                        xmodule_instance_args,
+                        grade_bucket_type='rescore',
+                    )
+
+                for responder in instance.lcp.responders.values():
+                    if not hasattr(responder, 'get_scores'):
+                        continue
+                    answers = [state.get('student_answers', {}).get(responder.answer_id) for _, state in module_states]
+                    responder.prepare_scores([answer for answer in answers if isinstance(answer, basestring)])
+        except Exception:  # pylint: disable=broad-except
+            # The answers will be graded for each student instead.
+            TASK_LOG.exception(
+                u"failed to prepare the scores of problem %s for seed %s", module_descriptor.location, seed
+            )
+
+
 @outer_atomic
 def rescore_problem_module_state(xmodule_instance_args, module_descriptor, student_module):
     '''
@@ -610,6 +768,8 @@ def upload_csv_to_report_store(rows, csv_name, course_id, timestamp, config_name
                 [row1_colum1, row1_colum2, ...],
                 ...
             ]
+            This can be any iterable, e.g. a generator, which is consumed
+            as the CSV is uploaded.
         csv_name: Name of the resulting CSV
         course_id: ID of the course
     """
@@ -656,7 +816,7 @@ def upload_exec_summary_to_store(data_dict, report_name, course_id, generated_at
     tracker.emit(REPORT_REQUESTED_EVENT_NAME, {"report_type": report_name})
 
 
-def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):  # pylint: disable=too-many-statements
+def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name, part_task=None):
     """
     For a given `course_id`, generate a grades CSV file for all students that
     are enrolled, and store using a `ReportStore`. Once created, the files can
@@ -665,6 +825,10 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
     that are visible in ReportStore will be complete ones.
 
+    If `part_task` is given and more than `GRADES_DOWNLOAD_STUDENTS_PER_TASK`
+    students are enrolled, the students are instead split between `part_task`
+    subtasks, which each run `upload_grades_csv_part` for a range of them.
+
     As we start to add more CSV downloads, it will probably be worthwhile to
     make a more general CSVDoc class instead of building out the rows like we
     do here.
@@ -673,7 +837,14 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     start_date = datetime.now(UTC)
     status_interval = 100
     enrolled_students = CourseEnrollment.objects.users_enrolled_in(course_id)
-    task_progress = TaskProgress(action_name, enrolled_students.count(), start_time)
+    total_enrolled_students = enrolled_students.count()
+
+    if part_task is not None and total_enrolled_students > settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK:
+        return _queue_grade_report_parts(
+            part_task, _entry_id, enrolled_students, total_enrolled_students, action_name
+        )
+
+    task_progress = TaskProgress(action_name, total_enrolled_students, start_time)
 
     fmt = u'Task: {task_id}, InstructorTask ID: {entry_id}, Course: {course_id}, Input: {task_input}'
     task_info_string = fmt.format(
@@ -684,27 +855,11 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     )
     TASK_LOG.info(u'%s, Task type: %s, Starting task execution', task_info_string, action_name)
 
-    course = get_course_by_id(course_id)
-    course_is_cohorted = is_course_cohorted(course.id)
-    teams_enabled = course.teams_enabled
-    cohorts_header = ['Cohort Name'] if course_is_cohorted else []
-    teams_header = ['Team Name'] if teams_enabled else []
-
-    experiment_partitions = get_split_user_partitions(course.user_partitions)
-    group_configs_header = [u'Experiment Group ({})'.format(partition.name) for partition in experiment_partitions]
-
-    certificate_info_header = ['Certificate Eligible', 'Certificate Delivered', 'Certificate Type']
-    certificate_whitelist = CertificateWhitelist.objects.filter(course_id=course_id, whitelist=True)
-    whitelisted_user_ids = [entry.user_id for entry in certificate_whitelist]
-
-    # Loop over all our students and build our CSV lists in memory
-    header = None
-    rows = []
+    # Stream the rows of our students to the report store as they are graded.
+    # Only the error rows are kept in memory.
     err_rows = [["id", "username", "error_msg"]]
     current_step = {'step': 'Calculating Grades'}
 
-    total_enrolled_students = enrolled_students.count()
-    student_counter = 0
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, Starting grade calculation for total students: %s',
         task_info_string,
@@ -713,106 +868,55 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
 
         total_enrolled_students
     )
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
-        # Periodically update task status (this is a cache write)
-        if task_progress.attempted % status_interval == 0:
-            task_progress.update_task_state(extra_meta=current_step)
-        task_progress.attempted += 1
 
-        # Now add a log entry after each student is graded to get a sense
-        # of the task's progress
-        student_counter += 1
-        TASK_LOG.info(
-            u'%s, Task type: %s, Current step: %s, Grade calculation in-progress for students: %s/%s',
-            task_info_string,
-            action_name,
-            current_step,
-            student_counter,
-            total_enrolled_students
-        )
-
-        if gradeset:
-            # We were able to successfully grade this student for this course.
-            task_progress.succeeded += 1
-            if not header:
-                header = [section['label'] for section in gradeset[u'section_breakdown']]
-                rows.append(
-                    ["id", "email", "username", "grade"] + header + cohorts_header +
-                    group_configs_header + teams_header +
-                    ['Enrollment Track', 'Verification Status'] + certificate_info_header
-                )
-
-            percents = {
-                section['label']: section.get('percent', 0.0)
-                for section in gradeset[u'section_breakdown']
-                if 'label' in section
-            }
-
-            cohorts_group_name = []
-            if course_is_cohorted:
-                group = get_cohort(student, course_id, assign=False)
-                cohorts_group_name.append(group.name if group else '')
-
-            group_configs_group_names = []
-            for partition in experiment_partitions:
-                group = LmsPartitionService(student, course_id).get_group(partition, assign=False)
-                group_configs_group_names.append(group.name if group else '')
-
-            team_name = []
-            if teams_enabled:
-                try:
-                    membership = CourseTeamMembership.objects.get(user=student, team__course_id=course_id)
-                    team_name.append(membership.team.name)
-                except CourseTeamMembership.DoesNotExist:
-                    team_name.append('')
+    def grade_report_rows():
+        """Grade the students, yielding the rows of the grade report."""
+        student_counter = 0
+        for student, header, row, err_msg in _iterate_grade_report_rows(course_id, enrolled_students.iterator()):
+            # Periodically update task status (this is a cache write)
+            if task_progress.attempted % status_interval == 0:
+                task_progress.update_task_state(extra_meta=current_step)
+            task_progress.attempted += 1
 
-            enrollment_mode = CourseEnrollment.enrollment_mode_for_user(student, course_id)[0]
-            verification_status = SoftwareSecurePhotoVerification.verification_status_for_user(
-                student,
-                course_id,
-                enrollment_mode
-            )
-            certificate_info = certificate_info_for_user(
-                student,
-                course_id,
-                gradeset['grade'],
-                student.id in whitelisted_user_ids
+            # Now add a log entry after each student is graded to get a sense
+            # of the task's progress
+            student_counter += 1
+            TASK_LOG.info(
+                u'%s, Task type: %s, Current step: %s, Grade calculation in-progress for students: %s/%s',
+                task_info_string,
+                action_name,
+                current_step,
+                student_counter,
+                total_enrolled_students
             )
 
-            # Not everybody has the same gradable items. If the item is not
-            # found in the user's gradeset, just assume it's a 0. The aggregated
-            # grades for their sections and overall course will be calculated
-            # without regard for the item they didn't have access to, so it's
-            # possible for a student to have a 0.0 show up in their row but
-            # still have 100% for the course.
-            row_percents = [percents.get(label, 0.0) for label in header]
-            rows.append(
-                [student.id, student.email, student.username, gradeset['percent']] +
-                row_percents + cohorts_group_name + group_configs_group_names + team_name +
-                [enrollment_mode] + [verification_status] + certificate_info
-            )
-        else:
-            # An empty gradeset means we failed to grade a student.
-            task_progress.failed += 1
-            err_rows.append([student.id, student.username, err_msg])
+            if row is not None:
+                # We were able to successfully grade this student for this course.
+                task_progress.succeeded += 1
+                if task_progress.succeeded == 1:
+                    yield header
+                yield row
+            else:
+                # An empty gradeset means we failed to grade a student.
+                task_progress.failed += 1
+                err_rows.append([student.id, student.username, err_msg])
+
+    # Perform the actual upload, which drives the grading
+    upload_csv_to_report_store(grade_report_rows(), 'grade_report', course_id, start_date)
 
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, Grade calculation completed for students: %s/%s',
         task_info_string,
         action_name,
         current_step,
-        student_counter,
+        task_progress.attempted,
         total_enrolled_students
     )
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
     current_step = {'step': 'Uploading CSVs'}
     task_progress.update_task_state(extra_meta=current_step)
     TASK_LOG.info(u'%s, Task type: %s, Current step: %s', task_info_string, action_name, current_step)
 
-    # Perform the actual upload
-    upload_csv_to_report_store(rows, 'grade_report', course_id, start_date)
-
     # If there are any error rows (don't count the header), write them out as well
     if len(err_rows) > 1:
         upload_csv_to_report_store(err_rows, 'grade_report_err', course_id, start_date)
@@ -822,6 +926,475 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     return task_progress.update_task_state(extra_meta=current_step)
 
 
+def _iterate_grade_report_rows(course_id, students):
+    """
+    Grade `students` for the grade report of `course_id`, yielding a tuple
+    (student, header, row, err_msg) for each of them. If the student could
+    not be graded, `header` and `row` are None and `err_msg` says why.
+    """
+    course = get_course_by_id(course_id)
+    course_is_cohorted = is_course_cohorted(course.id)
+    teams_enabled = course.teams_enabled
+    cohorts_header = ['Cohort Name'] if course_is_cohorted else []
+    teams_header = ['Team Name'] if teams_enabled else []
+
+    experiment_partitions = get_split_user_partitions(course.user_partitions)
+    group_configs_header = [u'Experiment Group ({})'.format(partition.name) for partition in experiment_partitions]
+
+    certificate_info_header = ['Certificate Eligible', 'Certificate Delivered', 'Certificate Type']
+    certificate_whitelist = CertificateWhitelist.objects.filter(course_id=course_id, whitelist=True)
+    whitelisted_user_ids = [entry.user_id for entry in certificate_whitelist]
+
+    header = None
+    header_row = None
+    for student, gradeset, err_msg in iterate_grades_for_batched(course_id, students):
+        if not gradeset:
+            # An empty gradeset means we failed to grade a student.
+            yield student, None, None, err_msg
+            continue
+
+        if not header:
+            header = [section['label'] for section in gradeset[u'section_breakdown']]
+            header_row = (
+                ["id", "email", "username", "grade"] + header + cohorts_header +
+                group_configs_header + teams_header +
+                ['Enrollment Track', 'Verification Status'] + certificate_info_header
+            )
+
+        percents = {
+            section['label']: section.get('percent', 0.0)
+            for section in gradeset[u'section_breakdown']
+            if 'label' in section
+        }
+
+        cohorts_group_name = []
+        if course_is_cohorted:
+            group = get_cohort(student, course_id, assign=False)
+            cohorts_group_name.append(group.name if group else '')
+
+        group_configs_group_names = []
+        for partition in experiment_partitions:
+            group = LmsPartitionService(student, course_id).get_group(partition, assign=False)
+            group_configs_group_names.append(group.name if group else '')
+
+        team_name = []
+        if teams_enabled:
+            try:
+                membership = CourseTeamMembership.objects.get(user=student, team__course_id=course_id)
+                team_name.append(membership.team.name)
+            except CourseTeamMembership.DoesNotExist:
+                team_name.append('')
+
+        enrollment_mode = CourseEnrollment.enrollment_mode_for_user(student, course_id)[0]
+        verification_status = SoftwareSecurePhotoVerification.verification_status_for_user(
+            student,
+            course_id,
+            enrollment_mode
+        )
+        certificate_info = certificate_info_for_user(
+            student,
+            course_id,
+            gradeset['grade'],
+            student.id in whitelisted_user_ids
+        )
+
+        # Not everybody has the same gradable items. If the item is not
+        # found in the user's gradeset, just assume it's a 0. The aggregated
+        # grades for their sections and overall course will be calculated
+        # without regard for the item they didn't have access to, so it's
+        # possible for a student to have a 0.0 show up in their row but
+        # still have 100% for the course.
+        row_percents = [percents.get(label, 0.0) for label in header]
+        row = (
+            [student.id, student.email, student.username, gradeset['percent']] +
+            row_percents + cohorts_group_name + group_configs_group_names + team_name +
+            [enrollment_mode] + [verification_status] + certificate_info
+        )
+        yield student, header_row, row, ''
+
+
+def _queue_grade_report_parts(part_task, entry_id, enrolled_students, total_enrolled_students, action_name):
+    """
+    Split the grade report between `part_task` subtasks, which each grade a
+    range of `GRADES_DOWNLOAD_STUDENTS_PER_TASK` of the enrolled students.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+
+    # Subtasks may already have been queued if this task got requeued, e.g.
+    # after a loss of connection to the broker. Don't queue them again.
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning(u"Task %s has already queued its grade report subtasks!", entry.task_id)
+        return json.loads(entry.task_output)
+
+    def create_part_subtask(student_list, initial_subtask_status):
+        """Create a subtask to grade the students of `student_list`."""
+        return part_task.subtask(
+            (
+                entry_id,
+                [student['pk'] for student in student_list],
+                initial_subtask_status.to_dict(),
+            ),
+            task_id=initial_subtask_status.task_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
+
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        create_part_subtask,
+        [enrolled_students.order_by('id')],
+        [],
+        settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK,
+        total_enrolled_students,
+    )
+
+
+def _grade_report_part_name(csv_name, subtask_id):
+    """Return the filename of the part of the `csv_name` report written by a subtask."""
+    return u"{csv_name}_part_{subtask_id}.csv".format(csv_name=csv_name, subtask_id=subtask_id)
+
+
+def upload_grades_csv_part(entry_id, student_ids, subtask_status_dict):
+    """
+    Grade the students with ids `student_ids` for the grade report of the
+    InstructorTask `entry_id`, and store their rows as a partial report.
+
+    The subtask which completes last merges all the parts into the final
+    grade report, see `_merge_grade_report_parts`.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    course_id = InstructorTask.objects.get(pk=entry_id).course_id
+    parts_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_PARTS_PATH)
+    try:
+        err_rows = [["id", "username", "error_msg"]]
+        students = User.objects.filter(id__in=student_ids).order_by('id')
+
+        def grade_report_rows():
+            """Grade the students, yielding the rows of their part of the grade report."""
+            for student, header, row, err_msg in _iterate_grade_report_rows(course_id, students):
+                if row is not None:
+                    subtask_status.increment(succeeded=1)
+                    if subtask_status.succeeded == 1:
+                        yield header
+                    yield row
+                else:
+                    subtask_status.increment(failed=1)
+                    err_rows.append([student.id, student.username, err_msg])
+
+        parts_store.store_rows(course_id, _grade_report_part_name('grade_report', current_task_id), grade_report_rows())
+        if len(err_rows) > 1:
+            parts_store.store_rows(course_id, _grade_report_part_name('grade_report_err', current_task_id), err_rows)
+        subtask_status.increment(state=SUCCESS)
+    except Exception:
+        exc_info = sys.exc_info()
+        TASK_LOG.exception(u"Grade report subtask %s of instructor task %s failed", current_task_id, entry_id)
+        # Drop whatever was stored for this part, so all of its students failed.
+        _delete_report_parts(parts_store, course_id, [
+            _grade_report_part_name('grade_report', current_task_id),
+            _grade_report_part_name('grade_report_err', current_task_id),
+        ])
+        subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+        subtask_status.increment(failed=len(student_ids), state=FAILURE)
+        _complete_report_part_after_failure(entry_id, current_task_id, subtask_status, _merge_grade_report_parts)
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+    _complete_report_part(entry_id, current_task_id, subtask_status, _merge_grade_report_parts)
+    return subtask_status.to_dict()
+
+
+def _complete_report_part(entry_id, current_task_id, subtask_status, merge_parts):
+    """
+    Record the `subtask_status` of the subtask `current_task_id` of the report
+    InstructorTask `entry_id`, and if it is the last subtask to complete, merge
+    the partial reports with `merge_parts(entry_id)`.
+
+    The InstructorTask only succeeds once the report has been merged; if the
+    merge raises, the InstructorTask fails and the error is re-raised.
+    """
+    if not update_subtask_status(entry_id, current_task_id, subtask_status, complete_entry=False):
+        return
+    try:
+        merge_parts(entry_id)
+    except Exception as exception:  # pylint: disable=broad-except
+        exc_info = sys.exc_info()
+        TASK_LOG.exception(u"Failed to merge the partial reports of instructor task %s", entry_id)
+        try:
+            complete_subtasks(entry_id, exception, traceback.format_exc())
+        except Exception:  # pylint: disable=broad-except
+            TASK_LOG.exception(u"Failed to mark instructor task %s as failed", entry_id)
+        raise exc_info[0], exc_info[1], exc_info[2]
+    complete_subtasks(entry_id)
+
+
+def _complete_report_part_after_failure(entry_id, current_task_id, subtask_status, merge_parts):
+    """
+    Like `_complete_report_part`, for a subtask which is failing: errors are
+    only logged, so that the subtask can re-raise its own.
+    """
+    try:
+        _complete_report_part(entry_id, current_task_id, subtask_status, merge_parts)
+    except Exception:  # pylint: disable=broad-except
+        TASK_LOG.exception(
+            u"Failed to record the failure of subtask %s of instructor task %s", current_task_id, entry_id
+        )
+
+
+def _delete_report_parts(parts_store, course_id, part_names):
+    """
+    Delete the partial reports `part_names` from `parts_store`, if they exist.
+    Errors are logged rather than raised, as the parts are only left behind.
+    """
+    for part_name in part_names:
+        try:
+            parts_store.delete(course_id, part_name)
+        except Exception:  # pylint: disable=broad-except
+            TASK_LOG.exception(u"Failed to delete partial report %s of course %s", part_name, course_id)
+
+
+def _merge_grade_report_parts(entry_id):
+    """
+    Concatenate the partial reports written by the subtasks of the grade
+    report InstructorTask `entry_id` into the final report, and delete them.
+
+    The rows of a part are written against the header of that part, which
+    only differs from the others if its students have different graded
+    sections, so they are realigned to the header of the first part.
+
+    Raises IncompleteReportError, without storing a report, if any of the
+    subtasks failed.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+    course_id = entry.course_id
+    subtask_statuses = sorted(
+        (SubtaskStatus.from_dict(status) for status in json.loads(entry.subtasks)['status'].itervalues()),
+        key=lambda status: status.task_id
+    )
+    parts_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_PARTS_PATH)
+    timestamp = entry.created or datetime.now(UTC)
+
+    def merged_rows(part_names):
+        """Yield the rows of the parts `part_names`, with a single header."""
+        header = None
+        for part_name in part_names:
+            part_rows = parts_store.iter_rows(course_id, part_name)
+            part_header = next(part_rows, None)
+            if part_header is None:
+                continue
+            if header is None:
+                header = part_header
+                yield header
+            for row in part_rows:
+                if part_header != header:
+                    values = dict(zip(part_header, row))
+                    row = [values.get(column, u'0.0') for column in header]
+                yield row
+
+    grade_parts = [_grade_report_part_name('grade_report', status.task_id) for status in subtask_statuses]
+    err_parts = [
+        _grade_report_part_name('grade_report_err', status.task_id)
+        for status in subtask_statuses if status.failed > 0
+    ]
+    try:
+        num_failed = len([status for status in subtask_statuses if status.state != SUCCESS])
+        if num_failed:
+            raise IncompleteReportError(
+                u"Grade report is missing the students of {num_failed} failed subtasks".format(num_failed=num_failed)
+            )
+
+        upload_csv_to_report_store(merged_rows(grade_parts), 'grade_report', course_id, timestamp)
+        if err_parts:
+            upload_csv_to_report_store(merged_rows(err_parts), 'grade_report_err', course_id, timestamp)
+    finally:
+        _delete_report_parts(parts_store, course_id, grade_parts + err_parts)
+
+
+ANSWER_DISTRIBUTION_HEADER = ['url_name', 'display name', 'answer id', 'answer', 'count']
+
+
+def upload_answer_distribution_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name,
+                                   part_task=None):
+    """
+    For a given `course_id`, generate a CSV file with the distribution of
+    the answers submitted to each part of each problem, and store it using a
+    `ReportStore`.
+
+    The StudentModules of the submitted problems are streamed a batch at a
+    time, and only the counts of the answers are kept in memory.
+
+    If `part_task` is given and more than `ANSWER_DISTRIBUTION_MODULES_PER_TASK`
+    problems were submitted, the problems of the course are instead split
+    between `part_task` subtasks, which each run
+    `upload_answer_distribution_csv_part` for some of them.
+    """
+    start_time = time()
+    start_date = datetime.now(UTC)
+    status_interval = 1000
+    submitted_modules = submitted_problem_modules(course_id)
+    total_modules = submitted_modules.count()
+
+    if part_task is not None and total_modules > settings.ANSWER_DISTRIBUTION_MODULES_PER_TASK:
+        progress = _queue_answer_distribution_parts(part_task, _entry_id, course_id, total_modules, action_name)
+        if progress is not None:
+            return progress
+
+    task_progress = TaskProgress(action_name, total_modules, start_time)
+    current_step = {'step': 'Counting answers'}
+
+    distribution = AnswerDistribution(course_id)
+    for module in iterate_in_batches(submitted_modules, settings.USER_STATE_BATCH_SIZE):
+        # Periodically update task status (this is a cache write)
+        if task_progress.attempted % status_interval == 0:
+            task_progress.update_task_state(extra_meta=current_step)
+        task_progress.attempted += 1
+        distribution.add_module(module)
+
+    task_progress.succeeded = distribution.modules_counted
+    task_progress.skipped = distribution.modules_skipped
+    current_step = {'step': 'Uploading CSV'}
+    task_progress.update_task_state(extra_meta=current_step)
+
+    rows = chain([ANSWER_DISTRIBUTION_HEADER], _answer_distribution_rows(distribution))
+    upload_csv_to_report_store(rows, 'answer_distribution', course_id, start_date)
+    return task_progress.update_task_state(extra_meta=current_step)
+
+
+def _answer_distribution_rows(distribution):
+    """
+    Yield the rows of the answer distribution report for the AnswerDistribution
+    `distribution`, sorted by problem, problem part and answer.
+    """
+    for (url_name, display_name, answer_id), answers in sorted(distribution.items()):
+        for answer, count in sorted(answers.iteritems()):
+            yield [url_name, display_name, answer_id, answer, count]
+
+
+def _queue_answer_distribution_parts(part_task, entry_id, course_id, total_modules, action_name):
+    """
+    Split the answer distribution report between `part_task` subtasks, which
+    each count the answers to some of the problems of the course, so that
+    each counts about `ANSWER_DISTRIBUTION_MODULES_PER_TASK` StudentModules.
+
+    Returns None if the course has no problems to split.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+
+    # Subtasks may already have been queued if this task got requeued, e.g.
+    # after a loss of connection to the broker. Don't queue them again.
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning(u"Task %s has already queued its answer distribution subtasks!", entry.task_id)
+        return json.loads(entry.task_output)
+
+    usage_ids = [
+        unicode(problem.location)
+        for problem in modulestore().get_items(course_id, qualifiers={'category': 'problem'})
+    ]
+    modules_per_task = settings.ANSWER_DISTRIBUTION_MODULES_PER_TASK
+    num_subtasks = min(len(usage_ids), (total_modules + modules_per_task - 1) // modules_per_task)
+    if num_subtasks == 0:
+        return None
+
+    subtask_id_list = [str(uuid4()) for _ in range(num_subtasks)]
+    # Make sure this is committed to database before handing off subtasks to celery.
+    with outer_atomic():
+        progress = initialize_subtask_info(entry, action_name, total_modules, subtask_id_list)
+
+    for index, subtask_id in enumerate(subtask_id_list):
+        part_task.subtask(
+            (
+                entry_id,
+                usage_ids[index::num_subtasks],
+                SubtaskStatus.create(subtask_id).to_dict(),
+            ),
+            task_id=subtask_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        ).apply_async()
+
+    return progress
+
+
+def upload_answer_distribution_csv_part(entry_id, usage_ids, subtask_status_dict):
+    """
+    Count the answers to the problems `usage_ids` for the answer distribution
+    report of the InstructorTask `entry_id`, and store their rows as a partial
+    report.
+
+    The subtask which completes last merges all the parts into the final
+    report, see `_merge_answer_distribution_parts`.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    course_id = InstructorTask.objects.get(pk=entry_id).course_id
+    parts_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_PARTS_PATH)
+    try:
+        distribution = AnswerDistribution(course_id)
+        usage_keys = [UsageKey.from_string(usage_id) for usage_id in usage_ids]
+        distribution.add_modules(
+            iterate_in_batches(submitted_problem_modules(course_id, usage_keys), settings.USER_STATE_BATCH_SIZE)
+        )
+        parts_store.store_rows(
+            course_id,
+            _grade_report_part_name('answer_distribution', current_task_id),
+            _answer_distribution_rows(distribution),
+        )
+        subtask_status.increment(
+            succeeded=distribution.modules_counted,
+            skipped=distribution.modules_skipped,
+            state=SUCCESS,
+        )
+    except Exception:
+        exc_info = sys.exc_info()
+        TASK_LOG.exception(u"Answer distribution subtask %s of instructor task %s failed", current_task_id, entry_id)
+        _delete_report_parts(parts_store, course_id, [_grade_report_part_name('answer_distribution', current_task_id)])
+        subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+        subtask_status.increment(state=FAILURE)
+        _complete_report_part_after_failure(entry_id, current_task_id, subtask_status, _merge_answer_distribution_parts)
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+    _complete_report_part(entry_id, current_task_id, subtask_status, _merge_answer_distribution_parts)
+    return subtask_status.to_dict()
+
+
+def _merge_answer_distribution_parts(entry_id):
+    """
+    Merge the sorted partial reports written by the subtasks of the answer
+    distribution InstructorTask `entry_id` into the final report, and delete
+    them.  Each problem is counted by a single subtask, so the parts are
+    merged without adding up any counts.
+
+    Raises IncompleteReportError, without storing a report, if any of the
+    subtasks failed.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+    course_id = entry.course_id
+    subtask_statuses = [
+        SubtaskStatus.from_dict(status) for status in json.loads(entry.subtasks)['status'].itervalues()
+    ]
+    parts_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_PARTS_PATH)
+    timestamp = entry.created or datetime.now(UTC)
+
+    part_names = [_grade_report_part_name('answer_distribution', status.task_id) for status in subtask_statuses]
+    try:
+        num_failed = len([status for status in subtask_statuses if status.state != SUCCESS])
+        if num_failed:
+            raise IncompleteReportError(
+                u"Answer distribution is missing the problems of {num_failed} failed subtasks".format(
+                    num_failed=num_failed
+                )
+            )
+
+        rows = heapq.merge(*[parts_store.iter_rows(course_id, part_name) for part_name in part_names])
+        upload_csv_to_report_store(
+            chain([ANSWER_DISTRIBUTION_HEADER], rows), 'answer_distribution', course_id, timestamp
+        )
+    finally:
+        _delete_report_parts(parts_store, course_id, part_names)
+
+
 def _order_problems(blocks):
     """
     Sort the problems by the assignment type and assignment that it belongs to.
@@ -884,25 +1457,26 @@ def upload_problem_responses_csv(_xmodule_instance_args, _entry_id, course_id, t
     current_step = {'step': 'Calculating students answers to problem'}
     task_progress.update_task_state(extra_meta=current_step)
 
-    # Compute result table and format it
+    # Stream the students' answers to the report store as they are read
     problem_location = task_input.get('problem_location')
-    student_data = list_problem_responses(course_id, problem_location)
     features = ['username', 'state']
-    header, rows = format_dictlist(student_data, features)
-
-    task_progress.attempted = task_progress.succeeded = len(rows)
-    task_progress.skipped = task_progress.total - task_progress.attempted
 
-    rows.insert(0, header)
+    def problem_responses_rows():
+        """Yield the rows of the problem responses report."""
+        yield features
+        for student_data in list_problem_responses(course_id, problem_location):
+            task_progress.attempted += 1
+            task_progress.succeeded += 1
+            yield [student_data[feature] for feature in features]
 
     current_step = {'step': 'Uploading CSV'}
     task_progress.update_task_state(extra_meta=current_step)
 
     # Perform the upload
-    problem_location = re.sub(r'[:/]', '_', problem_location)
-    csv_name = 'student_state_from_{}'.format(problem_location)
-    upload_csv_to_report_store(rows, csv_name, course_id, start_date)
+    csv_name = 'student_state_from_{}'.format(re.sub(r'[:/]', '_', problem_location))
+    upload_csv_to_report_store(problem_responses_rows(), csv_name, course_id, start_date)
 
+    task_progress.skipped = task_progress.total - task_progress.attempted
     return task_progress.update_task_state(extra_meta=current_step)
 
 
@@ -932,47 +1506,52 @@ def upload_problem_grade_report(_xmodule_instance_args, _entry_id, course_id, _t
         )
 
     # Just generate the static fields for now.
-    rows = [list(header_row.values()) + ['Final Grade'] + list(chain.from_iterable(problems.values()))]
+    header = list(header_row.values()) + ['Final Grade'] + list(chain.from_iterable(problems.values()))
     error_rows = [list(header_row.values()) + ['error_msg']]
     current_step = {'step': 'Calculating Grades'}
 
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students, keep_raw_scores=True):
-        student_fields = [getattr(student, field_name) for field_name in header_row]
-        task_progress.attempted += 1
-
-        if 'percent' not in gradeset or 'raw_scores' not in gradeset:
-            # There was an error grading this student.
-            # Generally there will be a non-empty err_msg, but that is not always the case.
-            if not err_msg:
-                err_msg = u"Unknown error"
-            error_rows.append(student_fields + [err_msg])
-            task_progress.failed += 1
-            continue
+    def problem_grade_rows():
+        """Grade the students, yielding the rows of the students who could be graded."""
+        students = enrolled_students.iterator()
+        for student, gradeset, err_msg in iterate_grades_for_batched(course_id, students, keep_raw_scores=True):
+            student_fields = [getattr(student, field_name) for field_name in header_row]
+            task_progress.attempted += 1
 
-        final_grade = gradeset['percent']
-        # Only consider graded problems
-        problem_scores = {unicode(score.module_id): score for score in gradeset['raw_scores'] if score.graded}
-        earned_possible_values = list()
-        for problem_id in problems:
-            try:
-                problem_score = problem_scores[problem_id]
-                earned_possible_values.append([problem_score.earned, problem_score.possible])
-            except KeyError:
-                # The student has not been graded on this problem.  For example,
-                # iterate_grades_for skips problems that students have never
-                # seen in order to speed up report generation.  It could also be
-                # the case that the student does not have access to it (e.g. A/B
-                # test or cohorted courseware).
-                earned_possible_values.append(['N/A', 'N/A'])
-        rows.append(student_fields + [final_grade] + list(chain.from_iterable(earned_possible_values)))
-
-        task_progress.succeeded += 1
-        if task_progress.attempted % status_interval == 0:
-            task_progress.update_task_state(extra_meta=current_step)
+            if 'percent' not in gradeset or 'raw_scores' not in gradeset:
+                # There was an error grading this student.
+                # Generally there will be a non-empty err_msg, but that is not always the case.
+                if not err_msg:
+                    err_msg = u"Unknown error"
+                error_rows.append(student_fields + [err_msg])
+                task_progress.failed += 1
+                continue
 
-    # Perform the upload if any students have been successfully graded
-    if len(rows) > 1:
-        upload_csv_to_report_store(rows, 'problem_grade_report', course_id, start_date)
+            final_grade = gradeset['percent']
+            # Only consider graded problems
+            problem_scores = {unicode(score.module_id): score for score in gradeset['raw_scores'] if score.graded}
+            earned_possible_values = list()
+            for problem_id in problems:
+                try:
+                    problem_score = problem_scores[problem_id]
+                    earned_possible_values.append([problem_score.earned, problem_score.possible])
+                except KeyError:
+                    # The student has not been graded on this problem.  For example,
+                    # iterate_grades_for_batched skips problems that students have never
+                    # seen in order to speed up report generation.  It could also be
+                    # the case that the student does not have access to it (e.g. A/B
+                    # test or cohorted courseware).
+                    earned_possible_values.append(['N/A', 'N/A'])
+            task_progress.succeeded += 1
+            if task_progress.attempted % status_interval == 0:
+                task_progress.update_task_state(extra_meta=current_step)
+            yield student_fields + [final_grade] + list(chain.from_iterable(earned_possible_values))
+
+    # Perform the upload if any students have been successfully graded. The
+    # rows are streamed to the report store as the students are graded.
+    rows = problem_grade_rows()
+    first_row = next(rows, None)
+    if first_row is not None:
+        upload_csv_to_report_store(chain([header, first_row], rows), 'problem_grade_report', course_id, start_date)
     # If there are any error rows, write them out as well
     if len(error_rows) > 1:
         upload_csv_to_report_store(error_rows, 'problem_grade_report_err', course_id, start_date)
@@ -1034,13 +1613,10 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
     )
     TASK_LOG.info(u'%s, Task type: %s, Starting task execution', task_info_string, action_name)
 
-    # Loop over all our students and build our CSV lists in memory
-    rows = []
-    header = None
+    # Loop over all our students, streaming their rows to the report store
     current_step = {'step': 'Gathering Profile Information'}
     enrollment_report_provider = PaidCourseEnrollmentReportProvider()
     total_students = students_in_course.count()
-    student_counter = 0
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, generating detailed enrollment report for total students: %s',
         task_info_string,
@@ -1049,86 +1625,89 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
         total_students
     )
 
-    for student in students_in_course:
-        # Periodically update task status (this is a cache write)
-        if task_progress.attempted % status_interval == 0:
-            task_progress.update_task_state(extra_meta=current_step)
-        task_progress.attempted += 1
-
-        # Now add a log entry after certain intervals to get a hint that task is in progress
-        student_counter += 1
-        if student_counter % 100 == 0:
-            TASK_LOG.info(
-                u'%s, Task type: %s, Current step: %s, gathering enrollment profile for students in progress: %s/%s',
-                task_info_string,
-                action_name,
-                current_step,
-                student_counter,
-                total_students
-            )
+    def enrollment_report_rows():
+        """Yield the rows of the enrollment report."""
+        for student in students_in_course.iterator():
+            # Periodically update task status (this is a cache write)
+            if task_progress.attempted % status_interval == 0:
+                task_progress.update_task_state(extra_meta=current_step)
+            task_progress.attempted += 1
 
-        user_data = enrollment_report_provider.get_user_profile(student.id)
-        course_enrollment_data = enrollment_report_provider.get_enrollment_info(student, course_id)
-        payment_data = enrollment_report_provider.get_payment_info(student, course_id)
-
-        # display name map for the column headers
-        enrollment_report_headers = {
-            'User ID': _('User ID'),
-            'Username': _('Username'),
-            'Full Name': _('Full Name'),
-            'First Name': _('First Name'),
-            'Last Name': _('Last Name'),
-            'Company Name': _('Company Name'),
-            'Title': _('Title'),
-            'Language': _('Language'),
-            'Year of Birth': _('Year of Birth'),
-            'Gender': _('Gender'),
-            'Level of Education': _('Level of Education'),
-            'Mailing Address': _('Mailing Address'),
-            'Goals': _('Goals'),
-            'City': _('City'),
-            'Country': _('Country'),
-            'Enrollment Date': _('Enrollment Date'),
-            'Currently Enrolled': _('Currently Enrolled'),
-            'Enrollment Source': _('Enrollment Source'),
-            'Manual (Un)Enrollment Reason': _('Manual (Un)Enrollment Reason'),
-            'Enrollment Role': _('Enrollment Role'),
-            'List Price': _('List Price'),
-            'Payment Amount': _('Payment Amount'),
-            'Coupon Codes Used': _('Coupon Codes Used'),
-            'Registration Code Used': _('Registration Code Used'),
-            'Payment Status': _('Payment Status'),
-            'Transaction Reference Number': _('Transaction Reference Number')
-        }
+            # Now add a log entry after certain intervals to get a hint that task is in progress
+            if task_progress.attempted % 100 == 0:
+                TASK_LOG.info(
+                    u'%s, Task type: %s, Current step: %s, '
+                    u'gathering enrollment profile for students in progress: %s/%s',
+                    task_info_string,
+                    action_name,
+                    current_step,
+                    task_progress.attempted,
+                    total_students
+                )
 
-        if not header:
-            header = user_data.keys() + course_enrollment_data.keys() + payment_data.keys()
-            display_headers = []
-            for header_element in header:
-                # translate header into a localizable display string
-                display_headers.append(enrollment_report_headers.get(header_element, header_element))
-            rows.append(display_headers)
+            user_data = enrollment_report_provider.get_user_profile(student.id)
+            course_enrollment_data = enrollment_report_provider.get_enrollment_info(student, course_id)
+            payment_data = enrollment_report_provider.get_payment_info(student, course_id)
+
+            # display name map for the column headers
+            enrollment_report_headers = {
+                'User ID': _('User ID'),
+                'Username': _('Username'),
+                'Full Name': _('Full Name'),
+                'First Name': _('First Name'),
+                'Last Name': _('Last Name'),
+                'Company Name': _('Company Name'),
+                'Title': _('Title'),
+                'Language': _('Language'),
+                'Year of Birth': _('Year of Birth'),
+                'Gender': _('Gender'),
+                'Level of Education': _('Level of Education'),
+                'Mailing Address': _('Mailing Address'),
+                'Goals': _('Goals'),
+                'City': _('City'),
+                'Country': _('Country'),
+                'Enrollment Date': _('Enrollment Date'),
+                'Currently Enrolled': _('Currently Enrolled'),
+                'Enrollment Source': _('Enrollment Source'),
+                'Manual (Un)Enrollment Reason': _('Manual (Un)Enrollment Reason'),
+                'Enrollment Role': _('Enrollment Role'),
+                'List Price': _('List Price'),
+                'Payment Amount': _('Payment Amount'),
+                'Coupon Codes Used': _('Coupon Codes Used'),
+                'Registration Code Used': _('Registration Code Used'),
+                'Payment Status': _('Payment Status'),
+                'Transaction Reference Number': _('Transaction Reference Number')
+            }
 
-        rows.append(user_data.values() + course_enrollment_data.values() + payment_data.values())
-        task_progress.succeeded += 1
+            task_progress.succeeded += 1
+            if task_progress.succeeded == 1:
+                header = user_data.keys() + course_enrollment_data.keys() + payment_data.keys()
+                display_headers = []
+                for header_element in header:
+                    # translate header into a localizable display string
+                    display_headers.append(enrollment_report_headers.get(header_element, header_element))
+                yield display_headers
+
+            yield user_data.values() + course_enrollment_data.values() + payment_data.values()
+
+    # Perform the actual upload, which drives the gathering of the rows
+    upload_csv_to_report_store(
+        enrollment_report_rows(), 'enrollment_report', course_id, start_date, config_name='FINANCIAL_REPORTS'
+    )
 
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, Detailed enrollment report generated for students: %s/%s',
         task_info_string,
         action_name,
         current_step,
-        student_counter,
+        task_progress.attempted,
         total_students
     )
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
     current_step = {'step': 'Uploading CSVs'}
     task_progress.update_task_state(extra_meta=current_step)
     TASK_LOG.info(u'%s, Task type: %s, Current step: %s', task_info_string, action_name, current_step)
 
-    # Perform the actual upload
-    upload_csv_to_report_store(rows, 'enrollment_report', course_id, start_date, config_name='FINANCIAL_REPORTS')
-
     # One last update before we close out...
     TASK_LOG.info(u'%s, Task type: %s, Finalizing detailed enrollment task', task_info_string, action_name)
     return task_progress.update_task_state(extra_meta=current_step)
@@ -1435,19 +2014,24 @@ def generate_students_certificates(
     task_progress.update_task_state(extra_meta=current_step)
 
     course = modulestore().get_course(course_id, depth=0)
-    # Generate certificate for each student
-    for student in students_require_certs:
-        task_progress.attempted += 1
-        status = generate_user_certificates(
-            student,
-            course_id,
-            course=course
-        )
+    # Generate certificate for each student, fetching the scores of a batch
+    # of students at a time for their grading
+    for students_batch in chunks(students_require_certs, GRADING_BATCH_SIZE):
+        scores_client = BulkScoresClient(course_id, [student.id for student in students_batch])
+        scores_client.fetch_scores(block_types=course.block_types_affecting_grading)
+        for student in students_batch:
+            task_progress.attempted += 1
+            status = generate_user_certificates(
+                student,
+                course_id,
+                course=course,
+                scores_client=scores_client.client_for(student.id)
+            )
 
-        if status in [CertificateStatuses.generating, CertificateStatuses.downloadable]:
-            task_progress.succeeded += 1
-        else:
-            task_progress.failed += 1
+            if status in [CertificateStatuses.generating, CertificateStatuses.downloadable]:
+                task_progress.succeeded += 1
+            else:
+                task_progress.failed += 1
 
     return task_progress.update_task_state(extra_meta=current_step)
 
@@ -12,11 +12,13 @@ import textwrap
 
 from celery.states import SUCCESS, FAILURE
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 
 from openedx.core.djangoapps.util.testing import TestConditionalContent
 from capa.tests.response_xml_factory import (CodeResponseXMLFactory,
-                                             CustomResponseXMLFactory)
+                                             CustomResponseXMLFactory,
+                                             NumericalResponseXMLFactory)
 from xmodule.modulestore.tests.factories import ItemFactory
 from xmodule.modulestore import ModuleStoreEnum
 
@@ -34,7 +36,7 @@ from instructor_task.tests.test_base import (
     OPTION_1,
     OPTION_2,
 )
-from capa.responsetypes import StudentInputError
+from capa.responsetypes import NumericalResponse, StudentInputError
 from lms.djangoapps.lms_xblock.runtime import quote_slashes
 
 
@@ -336,6 +338,57 @@ class TestRescoringTask(TestIntegrationTask):
         for username in userlist:
             self.check_state(username, descriptor, 0, 1, 2)
 
+    def define_numerical_problem(self, problem_url_name, answer, redefine=False):
+        """
+        Defines a numerical problem with two responses, whose correct answer is `answer`.
+
+        If the `redefine` flag is set, then change the answer of the existing problem.
+        """
+        factory = NumericalResponseXMLFactory()
+        problem_xml = factory.build_xml(answer=answer, tolerance=0.1, num_responses=2)
+        if redefine:
+            descriptor = self.module_store.get_item(
+                InstructorTaskModuleTestCase.problem_location(problem_url_name)
+            )
+            descriptor.data = problem_xml
+            course_key = descriptor.location.course_key
+            with self.module_store.branch_setting(ModuleStoreEnum.Branch.draft_preferred, course_key):
+                self.module_store.update_item(descriptor, self.user.id)
+                self.module_store.publish(descriptor.location, self.user.id)
+        else:
+            ItemFactory.create(parent_location=self.problem_section.location,
+                               category="problem",
+                               display_name=str(problem_url_name),
+                               data=problem_xml)
+
+    def test_rescoring_numerical_problem(self):
+        """Run rescore scenario on numerical problem, whose answers are graded together"""
+        problem_url_name = 'H1P1'
+        self.define_numerical_problem(problem_url_name, "42")
+        location = InstructorTaskModuleTestCase.problem_location(problem_url_name)
+        descriptor = self.module_store.get_item(location)
+
+        self.submit_student_answer('u1', problem_url_name, ["42", "42"])
+        self.submit_student_answer('u2', problem_url_name, ["42", "43"])
+        self.submit_student_answer('u3', problem_url_name, ["43", "42"])
+        self.submit_student_answer('u4', problem_url_name, ["43", "43"])
+        self.check_state('u1', descriptor, 2, 2, 1)
+        self.check_state('u4', descriptor, 0, 2, 1)
+
+        self.define_numerical_problem(problem_url_name, "43", redefine=True)
+        cache.clear()
+        with patch.object(
+            NumericalResponse, 'get_score', autospec=True, side_effect=NumericalResponse.get_score
+        ) as mock_get_score:
+            self.submit_rescore_all_student_answers('instructor', problem_url_name)
+
+        # Each of the two distinct answers to each response is graded once, for all the students.
+        self.assertEqual(mock_get_score.call_count, 4)
+        self.check_state('u1', descriptor, 0, 2, 1)
+        self.check_state('u2', descriptor, 1, 2, 1)
+        self.check_state('u3', descriptor, 1, 2, 1)
+        self.check_state('u4', descriptor, 2, 2, 1)
+
 
 class TestResetAttemptsTask(TestIntegrationTask):
     """
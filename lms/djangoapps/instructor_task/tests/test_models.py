@@ -3,10 +3,14 @@ Tests for instructor_task/models.py.
 """
 
 from cStringIO import StringIO
+from gzip import GzipFile
 import mock
+import os
+import stat
 import time
 from datetime import datetime
 from unittest import TestCase
+from uuid import uuid4
 
 from instructor_task.models import LocalFSReportStore, S3ReportStore
 from instructor_task.tests.test_base import TestReportMixin
@@ -30,10 +34,39 @@ class MockKey(object):
         return "http://fake-edx-s3.edx.org/"
 
 
+class MockMultiPartUpload(object):
+    """ Mocking a boto S3 MultiPartUpload object. """
+    def __init__(self, key_name):
+        self.key_name = key_name
+        self.parts = []
+        self.completed = False
+        self.cancelled = False
+
+    def upload_part_from_file(self, fp, part_num):
+        """ Expected method on a MultiPartUpload object. """
+        assert part_num == len(self.parts) + 1
+        self.parts.append(fp.read())
+
+    def complete_upload(self):
+        """ Expected method on a MultiPartUpload object. """
+        self.completed = True
+
+    def cancel_upload(self):
+        """ Expected method on a MultiPartUpload object. """
+        self.cancelled = True
+
+
 class MockBucket(object):
     """ Mocking a boto S3 Bucket object. """
     def __init__(self, _name):
         self.keys = []
+        self.uploads = []
+
+    def initiate_multipart_upload(self, key_name, headers):  # pylint: disable=unused-argument
+        """ Expected method on a Bucket object. """
+        upload = MockMultiPartUpload(key_name)
+        self.uploads.append(upload)
+        return upload
 
     def store_key(self, key):
         """ Not a Bucket method, created just to store the keys in the Bucket for testing purposes. """
@@ -93,6 +126,29 @@ class LocalFSReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, TestCase
         """ Create and return a LocalFSReportStore. """
         return LocalFSReportStore.from_config(config_name='GRADES_DOWNLOAD')
 
+    def test_store_rows_from_generator(self):
+        """
+        Test that rows can be streamed from a generator, and are read back unchanged.
+        """
+        report_store = self.create_report_store()
+        rows = [[u'id', u'name']] + [[unicode(i), u'ni\xf1o {}'.format(i)] for i in xrange(10)]
+        report_store.store_rows(self.course_id, 'report.csv', (row for row in rows))
+        self.assertEqual(list(report_store.iter_rows(self.course_id, 'report.csv')), rows)
+        self.assertEqual([link[0] for link in report_store.links_for(self.course_id)], ['report.csv'])
+
+    def test_store_rows_follows_umask(self):
+        """
+        Test that files written by store_rows get the same permissions as files written by store.
+        """
+        report_store = self.create_report_store()
+        old_umask = os.umask(0022)
+        try:
+            report_store.store_rows(self.course_id, 'report.csv', [[u'id']])
+        finally:
+            os.umask(old_umask)
+        mode = stat.S_IMODE(os.stat(report_store.path_to(self.course_id, 'report.csv')).st_mode)
+        self.assertEqual(mode, 0644)
+
 
 @mock.patch('instructor_task.models.S3Connection', new=MockS3Connection)
 @mock.patch('instructor_task.models.Key', new=MockKey)
@@ -105,3 +161,41 @@ class S3ReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, TestCase):
     def create_report_store(self):
         """ Create and return a S3ReportStore. """
         return S3ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+
+    def test_store_rows_multipart(self):
+        """
+        Test that large files are streamed to S3 as a multipart upload.
+        """
+        report_store = self.create_report_store()
+        report_store.MULTIPART_UPLOAD_PART_SIZE = 1024
+        rows = ([str(i), uuid4().hex] for i in xrange(2000))
+        report_store.store_rows(self.course_id, 'report.csv', rows)
+
+        self.assertEqual(report_store.bucket.keys, [])
+        upload = report_store.bucket.uploads[0]
+        self.assertTrue(upload.completed)
+        self.assertGreater(len(upload.parts), 1)
+        lines = GzipFile(fileobj=StringIO(''.join(upload.parts))).read().splitlines()
+        self.assertEqual(len(lines), 2000)
+        self.assertTrue(lines[-1].startswith('1999,'))
+
+    def test_store_rows_multipart_complete_failure(self):
+        """
+        Test that the multipart upload is cancelled if it cannot be completed.
+        """
+        report_store = self.create_report_store()
+        report_store.MULTIPART_UPLOAD_PART_SIZE = 1024
+        rows = ([str(i), uuid4().hex] for i in xrange(2000))
+        with mock.patch.object(MockMultiPartUpload, 'complete_upload', side_effect=IOError):
+            with self.assertRaises(IOError):
+                report_store.store_rows(self.course_id, 'report.csv', rows)
+        self.assertTrue(report_store.bucket.uploads[0].cancelled)
+
+    def test_store_rows_single_part(self):
+        """
+        Test that small files are stored without a multipart upload.
+        """
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', [['id', 'name'], ['1', 'name']])
+        self.assertEqual(report_store.bucket.uploads, [])
+        self.assertEqual(len(report_store.bucket.keys), 1)
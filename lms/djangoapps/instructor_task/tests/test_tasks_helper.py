@@ -7,9 +7,11 @@ Tests that CSV grade report generation works with unicode emails.
 
 """
 import ddt
+from celery.states import SUCCESS, FAILURE
 from mock import Mock, patch
 import tempfile
 import json
+from uuid import uuid4
 from openedx.core.djangoapps.course_groups import cohorts
 import unicodecsv
 from django.core.urlresolvers import reverse
@@ -20,6 +22,7 @@ from certificates.models import CertificateStatuses, GeneratedCertificate
 from certificates.tests.factories import GeneratedCertificateFactory, CertificateWhitelistFactory
 from course_modes.models import CourseMode
 from courseware.tests.factories import InstructorFactory
+from instructor_task.tests.factories import InstructorTaskFactory
 from instructor_task.tests.test_base import InstructorTaskCourseTestCase, TestReportMixin, InstructorTaskModuleTestCase
 from openedx.core.djangoapps.course_groups.models import CourseUserGroupPartitionGroup, CohortMembership
 from openedx.core.djangoapps.course_groups.tests.helpers import CohortFactory
@@ -32,12 +35,15 @@ from student.models import CourseEnrollment, CourseEnrollmentAllowed, ManualEnro
 from lms.djangoapps.verify_student.tests.factories import SoftwareSecurePhotoVerificationFactory
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.partitions.partitions import Group, UserPartition
-from instructor_task.models import ReportStore
+from instructor_task.models import InstructorTask, ReportStore, PROGRESS
 from survey.models import SurveyForm, SurveyAnswer
 from instructor_task.tasks_helper import (
     cohort_students_and_upload,
     upload_problem_responses_csv,
     upload_grades_csv,
+    upload_grades_csv_part,
+    upload_answer_distribution_csv,
+    upload_answer_distribution_csv_part,
     upload_problem_grade_report,
     upload_students_csv,
     upload_may_enroll_csv,
@@ -45,6 +51,8 @@ from instructor_task.tasks_helper import (
     upload_exec_summary_report,
     upload_course_survey_report,
     generate_students_certificates,
+    GRADE_REPORT_PARTS_PATH,
+    IncompleteReportError,
 )
 from instructor_analytics.basic import UNAVAILABLE
 from openedx.core.djangoapps.util.testing import ContentGroupTestCase, TestConditionalContent
@@ -95,13 +103,13 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         self.assertDictContainsSubset({'attempted': num_students, 'succeeded': num_students, 'failed': 0}, result)
 
     @patch('instructor_task.tasks_helper._get_current_task')
-    @patch('instructor_task.tasks_helper.iterate_grades_for')
+    @patch('instructor_task.tasks_helper.iterate_grades_for_batched')
     def test_grading_failure(self, mock_iterate_grades_for, _mock_current_task):
         """
         Test that any grading errors are properly reported in the
         progress dict and uploaded to the report store.
         """
-        # mock an error response from `iterate_grades_for`
+        # mock an error response from `iterate_grades_for_batched`
         mock_iterate_grades_for.return_value = [
             (self.create_student('username', 'student@example.com'), {}, 'Cannot grade student')
         ]
@@ -111,6 +119,108 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
         self.assertTrue(any('grade_report_err' in item[0] for item in report_store.links_for(self.course.id)))
 
+    @override_settings(GRADES_DOWNLOAD_STUDENTS_PER_TASK=2)
+    def test_grade_report_subtasks(self):
+        """
+        Test that the grade report of a course with many students is split
+        between subtasks, whose partial reports are merged into one.
+        """
+        students = [self.create_student('student{0}'.format(i)) for i in range(5)]
+        entry = InstructorTaskFactory.create(
+            course_id=self.course.id,
+            task_id=str(uuid4()),
+            task_key='dummy_task_key',
+            task_type='grade_course',
+        )
+        part_task = Mock()
+        with patch('instructor_task.tasks_helper._get_current_task'):
+            upload_grades_csv(None, entry.id, self.course.id, None, 'graded', part_task=part_task)
+
+        subtask_args = [call[0][0] for call in part_task.subtask.call_args_list]
+        self.assertEqual([len(student_ids) for __, student_ids, __ in subtask_args], [2, 2, 1])
+        for args in subtask_args:
+            upload_grades_csv_part(*args)
+
+        entry = InstructorTask.objects.get(pk=entry.id)
+        self.assertEqual(entry.task_state, SUCCESS)
+        self.assertDictContainsSubset({'attempted': 5, 'succeeded': 5, 'failed': 0}, json.loads(entry.task_output))
+
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        links = report_store.links_for(self.course.id)
+        self.assertEqual(len(links), 1)
+        with open(report_store.path_to(self.course.id, links[0][0])) as csv_file:
+            usernames = [row['username'] for row in unicodecsv.DictReader(csv_file)]
+        self.assertItemsEqual(usernames, [student.username for student in students])
+
+        parts_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_PARTS_PATH)
+        self.assertEqual(parts_store.links_for(self.course.id), [])
+
+    def _queue_grade_report_subtasks(self):
+        """
+        Queue the subtasks of a grade report of a course with 5 students,
+        returning its InstructorTask and the arguments of the subtasks.
+        """
+        for i in range(5):
+            self.create_student('student{0}'.format(i))
+        entry = InstructorTaskFactory.create(
+            course_id=self.course.id,
+            task_id=str(uuid4()),
+            task_key='dummy_task_key',
+            task_type='grade_course',
+        )
+        part_task = Mock()
+        with patch('instructor_task.tasks_helper._get_current_task'):
+            upload_grades_csv(None, entry.id, self.course.id, None, 'graded', part_task=part_task)
+        return entry, [call[0][0] for call in part_task.subtask.call_args_list]
+
+    @override_settings(GRADES_DOWNLOAD_STUDENTS_PER_TASK=2)
+    def test_grade_report_subtask_failure(self):
+        """
+        Test that the grade report fails without being stored if one of its
+        subtasks fails, and that no partial reports are left behind.
+        """
+        entry, subtask_args = self._queue_grade_report_subtasks()
+        with patch('instructor_task.tasks_helper._iterate_grade_report_rows', side_effect=ValueError('boom')):
+            with self.assertRaisesRegexp(ValueError, 'boom'):
+                upload_grades_csv_part(*subtask_args[0])
+        upload_grades_csv_part(*subtask_args[1])
+        with self.assertRaises(IncompleteReportError):
+            upload_grades_csv_part(*subtask_args[2])
+
+        entry = InstructorTask.objects.get(pk=entry.id)
+        self.assertEqual(entry.task_state, FAILURE)
+        self.assertEqual(json.loads(entry.task_output)['exception'], 'IncompleteReportError')
+        self.assertEqual(ReportStore.from_config(config_name='GRADES_DOWNLOAD').links_for(self.course.id), [])
+        parts_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_PARTS_PATH)
+        self.assertEqual(parts_store.links_for(self.course.id), [])
+
+    @override_settings(GRADES_DOWNLOAD_STUDENTS_PER_TASK=2)
+    def test_grade_report_merge_failure(self):
+        """
+        Test that the grade report only succeeds once its parts are merged,
+        and fails, removing the parts, if the merge does.
+        """
+        entry, subtask_args = self._queue_grade_report_subtasks()
+        for args in subtask_args[:-1]:
+            upload_grades_csv_part(*args)
+
+        merge_states = []
+
+        def failing_upload(*_args, **_kwargs):
+            """Record the state of the task while merging, then fail."""
+            merge_states.append(InstructorTask.objects.get(pk=entry.id).task_state)
+            raise IOError('report store is down')
+
+        with patch('instructor_task.tasks_helper.upload_csv_to_report_store', side_effect=failing_upload):
+            with self.assertRaisesRegexp(IOError, 'report store is down'):
+                upload_grades_csv_part(*subtask_args[-1])
+
+        self.assertEqual(merge_states, [PROGRESS])
+        entry = InstructorTask.objects.get(pk=entry.id)
+        self.assertEqual(entry.task_state, FAILURE)
+        parts_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_PARTS_PATH)
+        self.assertEqual(parts_store.links_for(self.course.id), [])
+
     def test_cohort_data_in_grading(self):
         """
         Test that cohort data is included in grades csv if cohort configuration is enabled for course.
@@ -273,12 +383,12 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         )
 
     @patch('instructor_task.tasks_helper._get_current_task')
-    @patch('instructor_task.tasks_helper.iterate_grades_for')
+    @patch('instructor_task.tasks_helper.iterate_grades_for_batched')
     def test_unicode_in_csv_header(self, mock_iterate_grades_for, _mock_current_task):
         """
         Tests that CSV grade report works if unicode in headers.
         """
-        # mock a response from `iterate_grades_for`
+        # mock a response from `iterate_grades_for_batched`
         mock_iterate_grades_for.return_value = [
             (
                 self.create_student('username', 'student@example.com'),
@@ -624,14 +734,14 @@ class TestProblemGradeReport(TestReportMixin, InstructorTaskModuleTestCase):
         ])
 
     @patch('instructor_task.tasks_helper._get_current_task')
-    @patch('instructor_task.tasks_helper.iterate_grades_for')
+    @patch('instructor_task.tasks_helper.iterate_grades_for_batched')
     @ddt.data(u'Cannöt grade student', '')
     def test_grading_failure(self, error_message, mock_iterate_grades_for, _mock_current_task):
         """
         Test that any grading errors are properly reported in the progress
         dict and uploaded to the report store.
         """
-        # mock an error response from `iterate_grades_for`
+        # mock an error response from `iterate_grades_for_batched`
         student = self.create_student(u'username', u'student@example.com')
         mock_iterate_grades_for.return_value = [
             (student, {}, error_message)
@@ -651,6 +761,110 @@ class TestProblemGradeReport(TestReportMixin, InstructorTaskModuleTestCase):
         ])
 
 
+class TestAnswerDistributionReport(TestReportMixin, InstructorTaskModuleTestCase):
+    """
+    Test that the answer distribution CSV generation works.
+    """
+    def setUp(self):
+        super(TestAnswerDistributionReport, self).setUp()
+        self.initialize_course()
+        self.define_option_problem(u'Pröblem1')
+        self.define_option_problem(u'Pröblem2')
+        self.student_1 = self.create_student(u'üser_1')
+        self.student_2 = self.create_student(u'üser_2')
+        self.submit_student_answer(self.student_1.username, u'Pröblem1', ['Option 1', 'Option 1'])
+        self.submit_student_answer(self.student_2.username, u'Pröblem1', ['Option 1', 'Option 2'])
+        self.submit_student_answer(self.student_1.username, u'Pröblem2', ['Option 2', 'Option 2'])
+
+    def _report_rows(self):
+        """
+        Return the rows of the last answer distribution report.
+        """
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        report_csv_filename = report_store.links_for(self.course.id)[0][0]
+        with open(report_store.path_to(self.course.id, report_csv_filename)) as csv_file:
+            return list(unicodecsv.reader(csv_file))
+
+    @patch('instructor_task.tasks_helper._get_current_task')
+    def test_answer_distribution(self, _get_current_task):
+        result = upload_answer_distribution_csv(None, None, self.course.id, None, 'generated')
+        self.assertDictContainsSubset({'attempted': 3, 'succeeded': 3, 'failed': 0}, result)
+        rows = self._report_rows()
+        self.assertEqual(rows[0], ['url_name', 'display name', 'answer id', 'answer', 'count'])
+        self.assertItemsEqual(
+            [(row[1], row[3], row[4]) for row in rows[1:]],
+            [
+                (u'Pröblem1', 'Option 1', '2'),
+                (u'Pröblem1', 'Option 1', '1'),
+                (u'Pröblem1', 'Option 2', '1'),
+                (u'Pröblem2', 'Option 2', '1'),
+                (u'Pröblem2', 'Option 2', '1'),
+            ]
+        )
+
+    @override_settings(ANSWER_DISTRIBUTION_MODULES_PER_TASK=1)
+    def test_answer_distribution_subtasks(self):
+        """
+        Test that the answer distribution of a course with many submissions
+        is split between subtasks per problem, and merged into the same report.
+        """
+        with patch('instructor_task.tasks_helper._get_current_task'):
+            upload_answer_distribution_csv(None, None, self.course.id, None, 'generated')
+        expected_rows = self._report_rows()
+
+        entry = InstructorTaskFactory.create(
+            course_id=self.course.id,
+            task_id=str(uuid4()),
+            task_key='dummy_task_key',
+            task_type='answer_distribution',
+        )
+        part_task = Mock()
+        with patch('instructor_task.tasks_helper._get_current_task'):
+            upload_answer_distribution_csv(None, entry.id, self.course.id, None, 'generated', part_task=part_task)
+
+        subtask_args = [call[0][0] for call in part_task.subtask.call_args_list]
+        self.assertEqual([len(usage_ids) for __, usage_ids, __ in subtask_args], [1, 1])
+        for args in subtask_args:
+            upload_answer_distribution_csv_part(*args)
+
+        entry = InstructorTask.objects.get(pk=entry.id)
+        self.assertEqual(entry.task_state, SUCCESS)
+        self.assertDictContainsSubset({'attempted': 3, 'succeeded': 3, 'failed': 0}, json.loads(entry.task_output))
+        self.assertEqual(self._report_rows(), expected_rows)
+
+        parts_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_PARTS_PATH)
+        self.assertEqual(parts_store.links_for(self.course.id), [])
+
+    @override_settings(ANSWER_DISTRIBUTION_MODULES_PER_TASK=1)
+    def test_answer_distribution_subtask_failure(self):
+        """
+        Test that the answer distribution fails without being stored if one of
+        its subtasks fails, and that no partial reports are left behind.
+        """
+        entry = InstructorTaskFactory.create(
+            course_id=self.course.id,
+            task_id=str(uuid4()),
+            task_key='dummy_task_key',
+            task_type='answer_distribution',
+        )
+        part_task = Mock()
+        with patch('instructor_task.tasks_helper._get_current_task'):
+            upload_answer_distribution_csv(None, entry.id, self.course.id, None, 'generated', part_task=part_task)
+        subtask_args = [call[0][0] for call in part_task.subtask.call_args_list]
+
+        with patch('instructor_task.tasks_helper._answer_distribution_rows', side_effect=ValueError('boom')):
+            with self.assertRaisesRegexp(ValueError, 'boom'):
+                upload_answer_distribution_csv_part(*subtask_args[0])
+        with self.assertRaises(IncompleteReportError):
+            upload_answer_distribution_csv_part(*subtask_args[1])
+
+        entry = InstructorTask.objects.get(pk=entry.id)
+        self.assertEqual(entry.task_state, FAILURE)
+        self.assertEqual(ReportStore.from_config(config_name='GRADES_DOWNLOAD').links_for(self.course.id), [])
+        parts_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_PARTS_PATH)
+        self.assertEqual(parts_store.links_for(self.course.id), [])
+
+
 class TestProblemReportSplitTestContent(TestReportMixin, TestConditionalContent, InstructorTaskModuleTestCase):
     """
     Test the problem report on a course that has split tests.
@@ -13,7 +13,7 @@ from opaque_keys.edx.keys import UsageKey
 from opaque_keys import InvalidKeyError
 
 from courseware.access import is_mobile_available_for_user
-from courseware.model_data import FieldDataCache
+from courseware.model_data import FieldDataCache, field_data_unit_of_work
 from courseware.module_render import get_module_for_descriptor
 from courseware.views import get_current_child, save_positions_recursively_up
 from student.models import CourseEnrollment, User
@@ -196,7 +196,9 @@ class UserCourseStatus(views.APIView):
             except InvalidKeyError:
                 return Response(errors.ERROR_INVALID_MODULE_ID, status=400)
 
-            return self._update_last_visited_module_id(request, course, module_key, modification_date)
+            # Write the positions saved up the course tree together.
+            with field_data_unit_of_work():
+                return self._update_last_visited_module_id(request, course, module_key, modification_date)
         else:
             # The arguments are optional, so if there's no argument just succeed
             return self._get_course_info(request, course)
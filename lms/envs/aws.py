@@ -192,6 +192,9 @@ MEDIA_URL = ENV_TOKENS['MEDIA_URL']
 LOG_DIR = ENV_TOKENS['LOG_DIR']
 
 CACHES = ENV_TOKENS['CACHES']
+COURSE_STRUCTURE_LOCAL_CACHE_BYTES = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_LOCAL_CACHE_BYTES', COURSE_STRUCTURE_LOCAL_CACHE_BYTES
+)
 # Cache used for location mapping -- called many times with the same key/value
 # in a given request.
 if 'loc_cache' not in CACHES:
@@ -277,6 +280,9 @@ VIRTUAL_UNIVERSITIES = ENV_TOKENS.get('VIRTUAL_UNIVERSITIES', [])
 META_UNIVERSITIES = ENV_TOKENS.get('META_UNIVERSITIES', {})
 COMMENTS_SERVICE_URL = ENV_TOKENS.get("COMMENTS_SERVICE_URL", '')
 COMMENTS_SERVICE_KEY = ENV_TOKENS.get("COMMENTS_SERVICE_KEY", '')
+COMMENTS_SERVICE_POOL_SIZE = ENV_TOKENS.get("COMMENTS_SERVICE_POOL_SIZE", COMMENTS_SERVICE_POOL_SIZE)
+COMMENTS_SERVICE_RETRIES = ENV_TOKENS.get("COMMENTS_SERVICE_RETRIES", COMMENTS_SERVICE_RETRIES)
+COMMENTS_SERVICE_TIMEOUT = ENV_TOKENS.get("COMMENTS_SERVICE_TIMEOUT", COMMENTS_SERVICE_TIMEOUT)
 CERT_QUEUE = ENV_TOKENS.get("CERT_QUEUE", 'test-pull')
 ZENDESK_URL = ENV_TOKENS.get("ZENDESK_URL")
 FEEDBACK_SUBMISSION_EMAIL = ENV_TOKENS.get("FEEDBACK_SUBMISSION_EMAIL")
@@ -523,6 +529,18 @@ VERIFY_STUDENT = AUTH_TOKENS.get("VERIFY_STUDENT", VERIFY_STUDENT)
 GRADES_DOWNLOAD_ROUTING_KEY = HIGH_MEM_QUEUE
 
 GRADES_DOWNLOAD = ENV_TOKENS.get("GRADES_DOWNLOAD", GRADES_DOWNLOAD)
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = ENV_TOKENS.get("GRADES_DOWNLOAD_STUDENTS_PER_TASK", GRADES_DOWNLOAD_STUDENTS_PER_TASK)
+ANSWER_DISTRIBUTION_MODULES_PER_TASK = ENV_TOKENS.get(
+    "ANSWER_DISTRIBUTION_MODULES_PER_TASK", ANSWER_DISTRIBUTION_MODULES_PER_TASK
+)
+
+# StudentModuleHistory writes
+STUDENT_MODULE_HISTORY_ROUTING_KEY = LOW_PRIORITY_QUEUE
+STUDENT_MODULE_HISTORY_WRITER = ENV_TOKENS.get("STUDENT_MODULE_HISTORY_WRITER", STUDENT_MODULE_HISTORY_WRITER)
+STUDENT_MODULE_HISTORY_MAX_BUFFERED = ENV_TOKENS.get(
+    "STUDENT_MODULE_HISTORY_MAX_BUFFERED",
+    STUDENT_MODULE_HISTORY_MAX_BUFFERED
+)
 
 # financial reports
 FINANCIAL_REPORTS = ENV_TOKENS.get("FINANCIAL_REPORTS", FINANCIAL_REPORTS)
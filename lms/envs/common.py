@@ -60,6 +60,13 @@ DISCUSSION_SETTINGS = {
     'MAX_COMMENT_DEPTH': 2,
 }
 
+# Connections to the comments service are kept alive in a pool of this size
+# per process. Failed connections (and reads of idempotent requests) are
+# retried COMMENTS_SERVICE_RETRIES times; timeouts are in seconds.
+COMMENTS_SERVICE_POOL_SIZE = 10
+COMMENTS_SERVICE_RETRIES = 1
+COMMENTS_SERVICE_TIMEOUT = 5
+
 
 # Features
 FEATURES = {
@@ -309,6 +316,10 @@ FEATURES = {
     # Enable temporary APIs required for xBlocks on Mobile
     'ENABLE_COURSE_BLOCKS_NAVIGATION_API': False,
 
+    # Cache the course blocks accessible to each user, so that repeated
+    # course blocks requests skip re-running the access transformers
+    'ENABLE_COURSE_BLOCKS_TRANSFORM_CACHE': False,
+
     # Enable the combined login/registration form
     'ENABLE_COMBINED_LOGIN_REGISTRATION': False,
 
@@ -395,6 +406,10 @@ FEATURES = {
     # Enable the max score cache to speed up grading
     'ENABLE_MAX_SCORE_CACHE': True,
 
+    # Persist per-subsection grades so that grading only recomputes the
+    # subsections whose scores changed since the student was last graded
+    'ENABLE_PERSISTENT_GRADES': False,
+
     # Enable LTI Provider feature.
     'ENABLE_LTI_PROVIDER': False,
     
@@ -769,6 +784,10 @@ MODULESTORE = {
     }
 }
 
+# Byte budget of the process-local cache of serialized course structures
+# that sits in front of the 'course_structure_cache'. 0 disables it.
+COURSE_STRUCTURE_LOCAL_CACHE_BYTES = 64 * 1024 * 1024
+
 #################### Python sandbox ############################################
 
 CODE_JAIL = {
@@ -782,6 +801,19 @@ CODE_JAIL = {
         # How many CPU seconds can jailed code use?
         'CPU': 1,
     },
+
+    # Persistent sandboxed Python processes that capa's safe_exec reuses,
+    # see capa.safe_exec.pool.  A size of 0 disables the pool.
+    'pool': {
+        # How many processes can each LMS process start?
+        'size': 0,
+        # How many executions can a process run before it's replaced?
+        'max_runs': 100,
+        # How large, in bytes, can a process grow before it's replaced?
+        'max_memory': 256 * 1024 * 1024,
+        # How many seconds to wait for a process before running in a new one.
+        'wait_timeout': 5,
+    },
 }
 
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
@@ -1163,6 +1195,9 @@ MIDDLEWARE_CLASSES = (
     # to redirected unenrolled students to the course info page
     'courseware.middleware.RedirectUnenrolledMiddleware',
 
+    # to write the StudentModuleHistory entries buffered during requests
+    'courseware.middleware.HistoryWriterMiddleware',
+
     'course_wiki.middleware.WikiAccessMiddleware',
 
     # This must be last
@@ -2176,6 +2211,30 @@ GRADES_DOWNLOAD = {
     'ROOT_PATH': '/tmp/edx-s3/grades',
 }
 
+# Grade reports for courses with more enrolled students than this are split
+# into subtasks which each grade this many students.
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = 5000
+
+# Number of rows fetched per query when reports iterate over all the
+# student state of a block or course.
+USER_STATE_BATCH_SIZE = 5000
+
+# Answer distribution reports for courses with more submitted problems than
+# this are split into subtasks which each count the answers to some of the
+# problems, about this many submitted problems each.
+ANSWER_DISTRIBUTION_MODULES_PER_TASK = 100000
+
+###################### Student Module History ######################
+# How StudentModuleHistory entries are written: 'immediate', 'request' or
+# 'celery'.  See courseware/history_writer.py.
+STUDENT_MODULE_HISTORY_WRITER = 'immediate'
+
+# Buffered StudentModuleHistory entries are flushed early once there are
+# this many of them.
+STUDENT_MODULE_HISTORY_MAX_BUFFERED = 100
+
+STUDENT_MODULE_HISTORY_ROUTING_KEY = LOW_PRIORITY_QUEUE
+
 FINANCIAL_REPORTS = {
     'STORAGE_TYPE': 'localfs',
     'BUCKET': 'edx-financial-reports',
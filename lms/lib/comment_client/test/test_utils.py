@@ -0,0 +1,145 @@
+"""
+Tests for the comments service client utilities.
+"""
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import threading
+import time
+from unittest import TestCase
+
+import ddt
+import mock
+
+from lms.lib.comment_client import utils
+from lms.lib.comment_client.utils import CommentServiceSession
+
+
+class CommentServiceSessionTestCase(TestCase):
+    """
+    Tests of the pooled session to the comments service.
+    """
+    def start_server(self):
+        """
+        Start an HTTP server which sets a cookie on every response, and return
+        its URL and the list of the Cookie headers it receives.
+        """
+        received_cookies = []
+
+        class Handler(BaseHTTPRequestHandler):  # pylint: disable=missing-docstring
+            def do_GET(self):  # pylint: disable=invalid-name
+                received_cookies.append(self.headers.get('Cookie'))
+                self.send_response(200)
+                self.send_header('Set-Cookie', 'sessionid=secret; Path=/')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return 'http://127.0.0.1:{}/'.format(server.server_port), received_cookies
+
+    def test_cookies_not_sent_back(self):
+        url, received_cookies = self.start_server()
+        session = CommentServiceSession(pool_size=1, retries=0)
+
+        for __ in range(2):
+            response = session.request('get', url)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(received_cookies, [None, None])
+        self.assertEqual(len(session.session.cookies), 0)
+
+
+class FetchConcurrentlyTestCase(TestCase):
+    """
+    Tests of fetch_concurrently.
+    """
+    def test_results_in_order(self):
+        def fetch(value, delay):  # pylint: disable=missing-docstring
+            time.sleep(delay)
+            return value
+
+        results = utils.fetch_concurrently(
+            lambda: fetch(1, 0.2),
+            lambda: fetch(2, 0.1),
+            lambda: fetch(3, 0),
+        )
+        self.assertEqual(results, [1, 2, 3])
+
+    def test_no_fetches(self):
+        self.assertEqual(utils.fetch_concurrently(), [])
+
+    def test_error_raised_after_all_fetches(self):
+        finished = []
+
+        def fail():  # pylint: disable=missing-docstring
+            raise ValueError("first")
+
+        def fetch():  # pylint: disable=missing-docstring
+            time.sleep(0.1)
+            finished.append(True)
+            raise KeyError("second")
+
+        with self.assertRaises(ValueError):
+            utils.fetch_concurrently(lambda: 1, fail, fetch)
+        self.assertEqual(finished, [True])
+
+    def test_memo_shared_with_threads(self):
+        with utils.memoized_requests():
+            memo = utils._local.memo  # pylint: disable=protected-access
+            results = utils.fetch_concurrently(
+                lambda: utils._local.memo,  # pylint: disable=protected-access
+                lambda: utils._local.memo,  # pylint: disable=protected-access
+            )
+        self.assertEqual(results, [memo, memo])
+
+
+@ddt.ddt
+@mock.patch('lms.lib.comment_client.utils._perform_request')
+class MemoizedRequestsTestCase(TestCase):
+    """
+    Tests of the memoization of comments service requests.
+    """
+    URL = 'http://localhost:4567/api/v1/users/1'
+
+    def test_not_memoized_outside_block(self, mock_perform_request):
+        mock_perform_request.return_value = {'id': '1'}
+        for __ in range(2):
+            utils.perform_request('get', self.URL)
+        self.assertEqual(mock_perform_request.call_count, 2)
+
+    def test_get_memoized(self, mock_perform_request):
+        mock_perform_request.return_value = {'id': '1'}
+        with utils.memoized_requests():
+            for __ in range(2):
+                self.assertEqual(utils.perform_request('get', self.URL, {'course_id': 'a/b/c'}), {'id': '1'})
+            utils.perform_request('get', self.URL, {'course_id': 'd/e/f'})
+        self.assertEqual(mock_perform_request.call_count, 2)
+
+    @ddt.data('post', 'put', 'delete')
+    def test_write_clears_memo(self, method, mock_perform_request):
+        mock_perform_request.return_value = {'id': '1'}
+        with utils.memoized_requests():
+            utils.perform_request('get', self.URL)
+            utils.perform_request(method, self.URL, {'username': 'changed'})
+            utils.perform_request('get', self.URL)
+        self.assertEqual(
+            [call[0][0] for call in mock_perform_request.call_args_list],
+            ['get', method, 'get']
+        )
+
+    def test_memoized_responses_isolated(self, mock_perform_request):
+        mock_perform_request.return_value = {'id': '1', 'roles': ['student']}
+        with utils.memoized_requests():
+            first = utils.perform_request('get', self.URL)
+            first['roles'].append('moderator')
+            second = utils.perform_request('get', self.URL)
+            second['id'] = '2'
+            third = utils.perform_request('get', self.URL)
+        self.assertEqual(second, {'id': '2', 'roles': ['student']})
+        self.assertEqual(third, {'id': '1', 'roles': ['student']})
+        self.assertEqual(mock_perform_request.call_count, 1)
@@ -1,11 +1,18 @@
 from contextlib import contextmanager
+from cookielib import CookiePolicy
+from copy import deepcopy
 import dogstats_wrapper as dog_stats_api
+from functools import wraps
 import logging
 import requests
+import sys
+import threading
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 from time import time
 from uuid import uuid4
-from django.utils.translation import get_language
+from django.utils.translation import get_language, override
 
 log = logging.getLogger(__name__)
 
@@ -50,8 +57,234 @@ def request_timer(request_id, method, url, tags=None):
     )
 
 
+class BlockAllCookies(CookiePolicy):
+    """
+    A cookie policy which neither accepts nor returns any cookie.
+    """
+    netscape = True
+    rfc2965 = hide_cookie2 = False
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+    def domain_return_ok(self, domain, request):
+        return False
+
+    def path_return_ok(self, path, request):
+        return False
+
+
+class CommentServiceSession(object):
+    """
+    A pool of keep-alive HTTP connections to the comments service, shared by
+    all the threads of the process, so that each request doesn't have to open
+    a new (possibly TLS) connection.
+
+    Up to `pool_size` connections are kept open; when more requests than that
+    are in flight, the extra ones use throwaway connections, which is
+    reported as pool saturation. Connection errors are retried `retries`
+    times, and so are read errors of idempotent requests.
+
+    The requests made for all the users share the session, so it doesn't
+    keep the cookies set by the comments service.
+    """
+    def __init__(self, pool_size, retries):
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        self.session.cookies.set_policy(BlockAllCookies())
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=Retry(total=retries))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request over the pool, with the arguments of `requests.request`.
+        """
+        return self.session.request(method, url, **kwargs)
+
+    @contextmanager
+    def usage(self, tags=None):
+        """
+        Track a request in flight, and report the pool usage it finds.
+        """
+        with self._lock:
+            self._in_flight += 1
+            in_flight = self._in_flight
+        dog_stats_api.histogram('comment_client.pool.in_flight', value=in_flight, tags=tags)
+        if in_flight > self.pool_size:
+            dog_stats_api.increment('comment_client.pool.saturated', tags=tags)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the process-wide CommentServiceSession, creating it on first use.
+    """
+    global _session  # pylint: disable=global-statement
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = CommentServiceSession(
+                    pool_size=getattr(settings, "COMMENTS_SERVICE_POOL_SIZE", 10),
+                    retries=getattr(settings, "COMMENTS_SERVICE_RETRIES", 1),
+                )
+    return _session
+
+
+def session_request(method, url, **kwargs):
+    """
+    Send a request to the comments service over the pooled session. Takes
+    the same arguments as `requests.request`.
+    """
+    return get_session().request(method, url, **kwargs)
+
+
+class RequestMemo(object):
+    """
+    The responses to the GET requests made to the comments service while
+    handling a request, which may be shared by several threads.
+
+    Responses are copied in and out of the memo, so callers can modify them.
+    """
+    def __init__(self):
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return the memoized response for `key`, or the result of `fetch()`
+        after memoizing it.
+        """
+        with self._lock:
+            if key in self._responses:
+                return deepcopy(self._responses[key])
+        response = fetch()
+        with self._lock:
+            self._responses[key] = deepcopy(response)
+        return response
+
+    def clear(self):
+        """
+        Forget all the memoized responses.
+        """
+        with self._lock:
+            self._responses.clear()
+
+
+_local = threading.local()
+
+
+@contextmanager
+def memoized_requests():
+    """
+    Memoize the responses to GET requests to the comments service inside the
+    block, so that e.g. the same user is only retrieved once. Any other
+    request clears the memo, since it may change the results of GETs.
+    """
+    if getattr(_local, 'memo', None) is not None:
+        yield
+        return
+    _local.memo = RequestMemo()
+    try:
+        yield
+    finally:
+        _local.memo = None
+
+
+def memoize_requests(view_func):
+    """
+    View decorator which handles the request inside `memoized_requests`.
+    """
+    @wraps(view_func)
+    def wrapped_view(*args, **kwargs):  # pylint: disable=missing-docstring
+        with memoized_requests():
+            return view_func(*args, **kwargs)
+    return wrapped_view
+
+
+def fetch_concurrently(*fetches):
+    """
+    Call the functions `fetches` concurrently, each in a thread of its own
+    but for the first, which is called in the calling thread. Returns the
+    list of their results, in order, or raises the first of the exceptions
+    they raised.
+
+    The calls share the request memo and the language of the calling thread.
+    They should only make requests to the comments service: e.g. database
+    connections are per thread in Django, and so not in the caller's
+    transaction.
+    """
+    results = [None] * len(fetches)
+    errors = [None] * len(fetches)
+    memo = getattr(_local, 'memo', None)
+    language = get_language()
+
+    def run(index):
+        """
+        Call fetches[index], recording its result or error.
+        """
+        try:
+            results[index] = fetches[index]()
+        except Exception:  # pylint: disable=broad-except
+            errors[index] = sys.exc_info()
+
+    def run_in_thread(index):
+        """
+        Call fetches[index] in a new thread, in the context of the caller.
+        """
+        _local.memo = memo
+        with override(language):
+            run(index)
+
+    threads = [threading.Thread(target=run_in_thread, args=(index,)) for index in range(1, len(fetches))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    if fetches:
+        run(0)
+    for thread in threads:
+        thread.join()
+
+    for error in errors:
+        if error is not None:
+            raise error[0], error[1], error[2]
+    return results
+
+
 def perform_request(method, url, data_or_params=None, raw=False,
                     metric_action=None, metric_tags=None, paged_results=False):
+    """
+    Perform a request to the comments service, and return its response as
+    text if `raw` or else as parsed JSON. Inside `memoized_requests`, the
+    response to identical GET requests is only fetched once.
+    """
+    def fetch():  # pylint: disable=missing-docstring
+        return _perform_request(method, url, data_or_params, raw, metric_action, metric_tags, paged_results)
+
+    memo = getattr(_local, 'memo', None)
+    if memo is None:
+        return fetch()
+    if method != 'get':
+        memo.clear()
+        return fetch()
+    key = (url, raw, repr(sorted((data_or_params or {}).items())))
+    return memo.get_or_fetch(key, fetch)
+
+
+def _perform_request(method, url, data_or_params, raw, metric_action, metric_tags, paged_results):
 
     if metric_tags is None:
         metric_tags = []
@@ -75,14 +308,14 @@ def perform_request(method, url, data_or_params=None, raw=False,
     else:
         data = None
         params = merge_dict(data_or_params, request_id_dict)
-    with request_timer(request_id, method, url, metric_tags):
-        response = requests.request(
+    with request_timer(request_id, method, url, metric_tags), get_session().usage(metric_tags):
+        response = session_request(
             method,
             url,
             data=data,
             params=params,
             headers=headers,
-            timeout=5
+            timeout=getattr(settings, "COMMENTS_SERVICE_TIMEOUT", 5)
         )
 
     metric_tags.append(u'status_code:{}'.format(response.status_code))
@@ -17,6 +17,7 @@ from monkey_patch import third_party_auth
 
 import xmodule.x_module
 import lms_xblock.runtime
+from capa.safe_exec import configure_pool
 
 log = logging.getLogger(__name__)
 
@@ -37,6 +38,8 @@ def run():
 
     add_mimetypes()
 
+    configure_sandbox_pool()
+
     if settings.FEATURES.get('USE_CUSTOM_THEME', False):
         enable_stanford_theme()
 
@@ -68,6 +71,13 @@ def run():
     xmodule.x_module.descriptor_global_local_resource_url = lms_xblock.runtime.local_resource_url
 
 
+def configure_sandbox_pool():
+    """
+    Configure the pool of sandboxed Python processes used by capa problems.
+    """
+    configure_pool(**settings.CODE_JAIL.get('pool', {}))
+
+
 def add_mimetypes():
     """
     Add extra mimetypes. Used in xblock_resource.
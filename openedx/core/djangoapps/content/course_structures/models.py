@@ -8,6 +8,7 @@ from collections import OrderedDict
 from model_utils.models import TimeStampedModel
 
 from util.models import CompressedTextField
+from xmodule.fields import Date
 from xmodule_django.models import CourseKeyField, UsageKey
 
 
@@ -34,6 +35,11 @@ class CourseStructure(TimeStampedModel):
     # JSON mapping of discussion ids to usage keys for the corresponding discussion modules
     discussion_id_map_json = CompressedTextField(verbose_name='Discussion ID Map JSON', blank=True, null=True)
 
+    # JSON list of the user-independent metadata of the discussion modules, used to build discussion category maps
+    discussion_category_index_json = CompressedTextField(
+        verbose_name='Discussion Category Index JSON', blank=True, null=True
+    )
+
     @property
     def structure(self):
         """
@@ -66,6 +72,20 @@ class CourseStructure(TimeStampedModel):
             return result
         return None
 
+    @property
+    def discussion_category_index(self):
+        """
+        Return a list of the category metadata of the discussion modules, in the order in which they were found in the
+        course, with usage keys and start dates deserialized.
+        """
+        if self.discussion_category_index_json is not None:
+            result = json.loads(self.discussion_category_index_json)
+            for entry in result:
+                entry['usage_key'] = UsageKey.from_string(entry['usage_key']).map_into_course(self.course_id)
+                entry['start'] = Date().from_json(entry['start'])
+            return result
+        return None
+
     def _traverse_tree(self, block, unordered_structure, ordered_blocks, parent=None):
         """
         Traverses the tree and fills in the ordered_blocks OrderedDict with the blocks in
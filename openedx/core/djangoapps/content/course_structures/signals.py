@@ -16,10 +16,11 @@ def listen_for_course_publish(sender, course_key, **kwargs):  # pylint: disable=
     # Import tasks here to avoid a circular import.
     from .tasks import update_course_structure
 
-    # Delete the existing discussion id map cache to avoid inconsistencies
+    # Delete the existing discussion id map and category index caches to avoid inconsistencies
     try:
         structure = CourseStructure.objects.get(course_id=course_key)
         structure.discussion_id_map_json = None
+        structure.discussion_category_index_json = None
         structure.save()
     except CourseStructure.DoesNotExist:
         pass
@@ -6,12 +6,33 @@ import logging
 
 from celery.task import task
 from opaque_keys.edx.keys import CourseKey
+from xmodule.fields import Date
 from xmodule.modulestore.django import modulestore
 
 
 log = logging.getLogger('edx.celery.task')
 
 
+def _get_discussion_category_entry(block):
+    """
+    Returns the metadata of the discussion block needed to place it in a discussion category map, or None if the block
+    lacks a category or target. Whether a user can see the block is left to request time, but blocks which are only
+    visible to staff or to some groups are marked as restricted.
+    """
+    if block.discussion_category is None or block.discussion_target is None:
+        return None
+    return {
+        "id": block.discussion_id,
+        "usage_key": unicode(block.scope_ids.usage_id),
+        "category": " / ".join([x.strip() for x in block.discussion_category.split("/")]),
+        "title": block.discussion_target,
+        "sort_key": block.sort_key,
+        "start": Date().to_json(block.start),
+        "days_early_for_beta": block.days_early_for_beta,
+        "restricted": bool(block.visible_to_staff_only or block.merged_group_access),
+    }
+
+
 def _generate_course_structure(course_key):
     """
     Generates a course structure dictionary for the specified course.
@@ -21,6 +42,7 @@ def _generate_course_structure(course_key):
         blocks_stack = [course]
         blocks_dict = {}
         discussions = {}
+        discussion_categories = []
         while blocks_stack:
             curr_block = blocks_stack.pop()
             children = curr_block.get_children() if curr_block.has_children else []
@@ -36,6 +58,9 @@ def _generate_course_structure(course_key):
                     hasattr(curr_block, 'discussion_id') and
                     curr_block.discussion_id):
                 discussions[curr_block.discussion_id] = unicode(curr_block.scope_ids.usage_id)
+                discussion_category_entry = _get_discussion_category_entry(curr_block)
+                if discussion_category_entry:
+                    discussion_categories.append(discussion_category_entry)
 
             # Retrieve these attributes separately so that we can fail gracefully
             # if the block doesn't have the attribute.
@@ -56,7 +81,8 @@ def _generate_course_structure(course_key):
                 "root": unicode(course.scope_ids.usage_id),
                 "blocks": blocks_dict
             },
-            'discussion_id_map': discussions
+            'discussion_id_map': discussions,
+            'discussion_category_index': discussion_categories
         }
 
 
@@ -83,16 +109,19 @@ def update_course_structure(course_key):
 
     structure_json = json.dumps(structure['structure'])
     discussion_id_map_json = json.dumps(structure['discussion_id_map'])
+    discussion_category_index_json = json.dumps(structure['discussion_category_index'])
 
     structure_model, created = CourseStructure.objects.get_or_create(
         course_id=course_key,
         defaults={
             'structure_json': structure_json,
-            'discussion_id_map_json': discussion_id_map_json
+            'discussion_id_map_json': discussion_id_map_json,
+            'discussion_category_index_json': discussion_category_index_json
         }
     )
 
     if not created:
         structure_model.structure_json = structure_json
         structure_model.discussion_id_map_json = discussion_id_map_json
+        structure_model.discussion_category_index_json = discussion_category_index_json
         structure_model.save()
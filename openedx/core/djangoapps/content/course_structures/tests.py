@@ -187,6 +187,24 @@ class CourseStructureTaskTests(ModuleStoreTestCase):
         actual = _generate_course_structure(self.course.id)
         self.assertEqual(actual['discussion_id_map'], id_map)
 
+    def test_generate_discussion_category_index(self):
+        staff_discussion = ItemFactory.create(
+            parent=self.course,
+            category='discussion',
+            discussion_id='test_discussion_id_3',
+            visible_to_staff_only=True
+        )
+
+        actual = _generate_course_structure(self.course.id)['discussion_category_index']
+        self.assertItemsEqual(
+            [(entry['id'], entry['usage_key'], entry['restricted']) for entry in actual],
+            [
+                ('test_discussion_id_1', unicode(self.discussion_module_1.location), False),
+                ('test_discussion_id_2', unicode(self.discussion_module_2.location), False),
+                ('test_discussion_id_3', unicode(staff_discussion.location), True),
+            ]
+        )
+
     def test_discussion_id_map_json(self):
         id_map = {
             'discussion_id_1': 'module_location_1',
@@ -235,3 +253,7 @@ class CourseStructureTaskTests(ModuleStoreTestCase):
             [unicode(value) for value in structure.discussion_id_map.values()],
             expected_structure['discussion_id_map'].values()
         )
+        self.assertEqual(
+            [(entry['id'], unicode(entry['usage_key'])) for entry in structure.discussion_category_index],
+            [(entry['id'], entry['usage_key']) for entry in expected_structure['discussion_category_index']]
+        )
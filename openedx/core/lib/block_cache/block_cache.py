@@ -44,6 +44,26 @@ def get_blocks(cache, modulestore, usage_info, root_block_usage_key, transformer
             given usage_info.
     """
 
+    root_block_structure = get_collected_blocks(cache, modulestore, root_block_usage_key, transformers)
+    transform_blocks(usage_info, root_block_structure, transformers)
+    return root_block_structure
+
+
+def get_collected_blocks(cache, modulestore, root_block_usage_key, transformers):
+    """
+    Returns the block structure starting at root_block_usage_key with
+    the data collected by all registered transformers, loading it from
+    the cache or, at cache miss, collecting it from the modulestore
+    and updating the cache.
+
+    Arguments:
+        See the description in get_blocks.
+
+    Returns:
+        BlockStructureBlockData - The collected, untransformed block
+            structure starting at root_block_usage_key.
+    """
+
     # Verify that all requested transformers are registered in the
     # Transformer Registry.
     unregistered_transformers = TransformerRegistry.find_unregistered(transformers)
@@ -72,14 +92,24 @@ def get_blocks(cache, modulestore, usage_info, root_block_usage_key, transformer
         # Cache this information.
         BlockStructureFactory.serialize_to_cache(root_block_structure, cache)
 
+    return root_block_structure
+
+
+def transform_blocks(usage_info, block_structure, transformers):
+    """
+    Mutates the given collected block structure by executing the
+    transform methods of the given transformers with the given
+    usage_info, and pruning any blocks that are no longer reachable.
+
+    Arguments:
+        See the description in get_blocks.
+    """
     # Execute requested transforms on block structure.
     for transformer in transformers:
-        transformer.transform(usage_info, root_block_structure)
+        transformer.transform(usage_info, block_structure)
 
     # Prune the block structure to remove any unreachable blocks.
-    root_block_structure._prune_unreachable()  # pylint: disable=protected-access
-
-    return root_block_structure
+    block_structure._prune_unreachable()  # pylint: disable=protected-access
 
 
 def clear_block_cache(cache, root_block_usage_key):
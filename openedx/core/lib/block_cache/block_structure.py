@@ -4,10 +4,18 @@ Module with family of classes for block structures.
     BlockStructureBlockData - responsible for block & transformer data.
     BlockStructureModulestoreData - responsible for xBlock data.
 
+Block structures intern the usage keys of their blocks to integer ids,
+which index the arrays and columns in which their relations and data
+are stored, so that structures of large courses remain compact in memory
+and fast to (de)serialize.
+
 The following internal data structures are implemented:
-    _BlockRelations - Data structure for a single block's relations.
-    _BlockData - Data structure for a single block's data.
+    _BlockRelations - Data structure for a single block's modified
+        relations.
+    _BlockRelationsTable - Data structure for the relations of all the
+        blocks in a structure.
 """
+from array import array
 from collections import defaultdict
 from logging import getLogger
 
@@ -22,21 +30,235 @@ logger = getLogger(__name__)  # pylint: disable=invalid-name
 # A dictionary key value for storing a transformer's version number.
 TRANSFORMER_VERSION_KEY = '_version'
 
+# Typecode of the arrays storing block ids.
+BLOCK_ID_TYPECODE = 'i'
+
+
+class _Missing(object):
+    """
+    Type of the _MISSING marker, which fills the entries of data columns
+    for blocks without a value.  It is pickled by reference, so that
+    unpickled columns still contain the _MISSING singleton.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return '_MISSING'
+
+    def __repr__(self):
+        return '_MISSING'
+
+
+_MISSING = _Missing()
+
 
 class _BlockRelations(object):
     """
     Data structure to encapsulate relationships for a single block,
     including its children and parents.
     """
-    def __init__(self):
+    __slots__ = ('parents', 'children')
 
-        # List of usage keys of this block's parents.
-        # list [UsageKey]
-        self.parents = []
+    def __init__(self, parents=None, children=None):
 
-        # List of usage keys of this block's children.
-        # list [UsageKey]
-        self.children = []
+        # List of ids of this block's parents.
+        # list [int]
+        self.parents = parents if parents is not None else []
+
+        # List of ids of this block's children.
+        # list [int]
+        self.children = children if children is not None else []
+
+
+class _BlockRelationsTable(object):
+    """
+    Data structure to encapsulate the relationships between all the
+    blocks of a block structure, identified by their ids.
+
+    The relations are stored in CSR form: the children of the block
+    with id i are _children[_children_offsets[i]:_children_offsets[i + 1]].
+    The parents are stored likewise, and are only computed from the
+    children when they are first needed.
+
+    Once the relations of a block are modified, they are moved to a
+    _BlockRelations, which takes precedence over the arrays.  Only the
+    arrays are pickled, after merging any modified relations into them.
+    """
+    __slots__ = ('_present', '_children_offsets', '_children', '_parents_offsets', '_parents', '_modified')
+
+    def __init__(self, present=None, children_offsets=None, children=None):
+
+        # Whether the block with each id is in the structure.
+        # bytearray
+        self._present = present if present is not None else bytearray()
+
+        # CSR arrays of the children of each block.
+        # array [int], array [int]
+        self._children_offsets = children_offsets if children_offsets is not None else array(BLOCK_ID_TYPECODE, [0])
+        self._children = children if children is not None else array(BLOCK_ID_TYPECODE)
+
+        # CSR arrays of the parents of each block, computed on demand.
+        # array [int], array [int]
+        self._parents_offsets = None
+        self._parents = None
+
+        # Map of a block's id to its modified relations.
+        # dict {int: _BlockRelations}
+        self._modified = {}
+
+    @classmethod
+    def from_children(cls, num_ids, block_children):
+        """
+        Returns a table containing the blocks in the given map of a
+        block's id to the list of ids of its children.  All ids must be
+        less than num_ids.
+        """
+        present = bytearray(num_ids)
+        children_offsets = array(BLOCK_ID_TYPECODE, [0])
+        children = array(BLOCK_ID_TYPECODE)
+        for block_id in xrange(num_ids):
+            children_ids = block_children.get(block_id)
+            if children_ids is not None:
+                present[block_id] = 1
+                children.extend(children_ids)
+            children_offsets.append(len(children))
+        return cls(present, children_offsets, children)
+
+    def __getstate__(self):
+        if self._modified:
+            table = self.from_children(
+                len(self._present),
+                {block_id: self.get_children(block_id) for block_id in self.iter_ids()},
+            )
+        else:
+            table = self
+        return table._present, table._children_offsets, table._children  # pylint: disable=protected-access
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def has(self, block_id):
+        """
+        Returns whether the block with the given id is in the table.
+        """
+        return block_id < len(self._present) and self._present[block_id] == 1
+
+    def iter_ids(self):
+        """
+        Returns an iterator of the ids of all the blocks in the table.
+        """
+        return (block_id for block_id, present in enumerate(self._present) if present)
+
+    def get_children(self, block_id):
+        """
+        Returns the list of ids of the children of the block with the
+        given id.
+        """
+        relations = self._modified.get(block_id)
+        if relations is not None:
+            return relations.children
+        return self._get_from_arrays(self._children_offsets, self._children, block_id)
+
+    def get_parents(self, block_id):
+        """
+        Returns the list of ids of the parents of the block with the
+        given id.
+        """
+        relations = self._modified.get(block_id)
+        if relations is not None:
+            return relations.parents
+        if self._parents is None:
+            self._compute_parents()
+        return self._get_from_arrays(self._parents_offsets, self._parents, block_id)
+
+    def add_block(self, block_id):
+        """
+        Adds the block with the given id to the table, without any
+        relations.
+        """
+        if block_id >= len(self._present):
+            self._present.extend(bytearray(block_id + 1 - len(self._present)))
+        self._present[block_id] = 1
+        self._modified[block_id] = _BlockRelations()
+
+    def add_relation(self, parent_id, child_id):
+        """
+        Adds a parent to child relationship to the table, adding the
+        blocks if they are not in it yet.
+        """
+        for block_id in (parent_id, child_id):
+            if not self.has(block_id):
+                self.add_block(block_id)
+        self._get_modified(child_id).parents.append(parent_id)
+        self._get_modified(parent_id).children.append(child_id)
+
+    def remove_block(self, block_id):
+        """
+        Removes the block with the given id and its relations from the
+        table.
+
+        Returns:
+            _BlockRelations - The removed block's relations.
+        """
+        if not self.has(block_id):
+            return _BlockRelations()
+
+        relations = self._get_modified(block_id)
+        for child_id in relations.children:
+            self._get_modified(child_id).parents.remove(block_id)
+        for parent_id in relations.parents:
+            self._get_modified(parent_id).children.remove(block_id)
+
+        self._present[block_id] = 0
+        del self._modified[block_id]
+        return relations
+
+    def _get_modified(self, block_id):
+        """
+        Returns the modifiable relations of the block with the given id.
+        """
+        relations = self._modified.get(block_id)
+        if relations is None:
+            relations = _BlockRelations(list(self.get_parents(block_id)), list(self.get_children(block_id)))
+            self._modified[block_id] = relations
+        return relations
+
+    def _compute_parents(self):
+        """
+        Computes the CSR arrays of the parents of each block from the
+        arrays of their children.
+        """
+        children_offsets = self._children_offsets
+        children = self._children
+        num_ids = len(children_offsets) - 1
+
+        num_parents = [0] * num_ids
+        for child_id in children:
+            num_parents[child_id] += 1
+
+        parents_offsets = array(BLOCK_ID_TYPECODE, [0])
+        for count in num_parents:
+            parents_offsets.append(parents_offsets[-1] + count)
+
+        parents = array(BLOCK_ID_TYPECODE, [0]) * len(children)
+        positions = list(parents_offsets[:-1])
+        for parent_id in xrange(num_ids):
+            for child_id in children[children_offsets[parent_id]:children_offsets[parent_id + 1]]:
+                parents[positions[child_id]] = parent_id
+                positions[child_id] += 1
+
+        self._parents_offsets = parents_offsets
+        self._parents = parents
+
+    @staticmethod
+    def _get_from_arrays(offsets, values, block_id):
+        """
+        Returns the list of values for the given block id from the
+        given CSR arrays.
+        """
+        if block_id + 1 >= len(offsets):
+            return []
+        return values[offsets[block_id]:offsets[block_id + 1]].tolist()
 
 
 class BlockStructure(object):
@@ -55,14 +277,22 @@ class BlockStructure(object):
         # UsageKey
         self.root_block_usage_key = root_block_usage_key
 
-        # Map of a block's usage key to its block relations. The
-        # existence of a block in the structure is determined by its
-        # presence in this map.
-        # defaultdict {UsageKey: _BlockRelations}
-        self._block_relations = defaultdict(_BlockRelations)
+        # List of the usage keys known to this structure, indexed by
+        # the ids they are interned to.
+        # list [UsageKey]
+        self._block_keys = []
+
+        # Map of a usage key to the id it is interned to.
+        # dict {UsageKey: int}
+        self._block_ids = {}
+
+        # Table of the blocks' relations. The existence of a block in
+        # the structure is determined by its presence in this table.
+        # _BlockRelationsTable
+        self._block_relations = _BlockRelationsTable()
 
         # Add the root block.
-        self._add_block(self._block_relations, root_block_usage_key)
+        self._block_relations.add_block(self._get_or_add_block_id(root_block_usage_key))
 
     def __iter__(self):
         """
@@ -86,7 +316,10 @@ class BlockStructure(object):
         Returns:
             [UsageKey] - A list of usage keys of the block's parents.
         """
-        return self._block_relations[usage_key].parents if self.has_block(usage_key) else []
+        block_id = self._block_ids.get(usage_key)
+        if block_id is None or not self._block_relations.has(block_id):
+            return []
+        return self._get_block_keys(self._block_relations.get_parents(block_id))
 
     def get_children(self, usage_key):
         """
@@ -100,7 +333,10 @@ class BlockStructure(object):
         Returns:
             [UsageKey] - A list of usage keys of the block's children.
         """
-        return self._block_relations[usage_key].children if self.has_block(usage_key) else []
+        block_id = self._block_ids.get(usage_key)
+        if block_id is None or not self._block_relations.has(block_id):
+            return []
+        return self._get_block_keys(self._block_relations.get_children(block_id))
 
     def has_block(self, usage_key):
         """
@@ -115,7 +351,8 @@ class BlockStructure(object):
             bool - Whether or not a block with the given usage_key
                 is present in this block structure.
         """
-        return usage_key in self._block_relations
+        block_id = self._block_ids.get(usage_key)
+        return block_id is not None and self._block_relations.has(block_id)
 
     def get_block_keys(self):
         """
@@ -125,7 +362,8 @@ class BlockStructure(object):
             iterator(UsageKey) - An iterator of the usage
             keys of all the blocks in the block structure.
         """
-        return self._block_relations.iterkeys()
+        block_keys = self._block_keys
+        return (block_keys[block_id] for block_id in self._block_relations.iter_ids())
 
     #--- Block structure traversal methods ---#
 
@@ -183,29 +421,46 @@ class BlockStructure(object):
         """
         Mutates this block structure by removing any unreachable blocks.
         """
+        block_relations = self._block_relations
+        block_ids = self._block_ids
 
-        # Create a new block relations map to store only those blocks
-        # that are still linked
-        pruned_block_relations = defaultdict(_BlockRelations)
-        old_block_relations = self._block_relations
-
-        # Build the structure from the leaves up by doing a post-order
-        # traversal of the old structure, thereby encountering only
-        # reachable blocks.
+        # Keep only the blocks encountered by a post-order traversal,
+        # and their relations to each other.
+        pruned_block_children = {}
         for block_key in self.post_order_traversal():
-            # If the block is in the old structure,
-            if block_key in old_block_relations:
-                # Add it to the new pruned structure
-                self._add_block(pruned_block_relations, block_key)
+            block_id = block_ids[block_key]
+            if not block_relations.has(block_id):
+                continue
+            pruned_block_children[block_id] = [
+                child_id for child_id in block_relations.get_children(block_id)
+                if child_id in pruned_block_children
+            ]
 
-                # Add a relationship to only those old children that
-                # were also added to the new pruned structure.
-                for child in old_block_relations[block_key].children:
-                    if child in pruned_block_relations:
-                        self._add_to_relations(pruned_block_relations, block_key, child)
+        self._block_relations = _BlockRelationsTable.from_children(len(self._block_keys), pruned_block_children)
 
-        # Replace this structure's relations with the newly pruned one.
-        self._block_relations = pruned_block_relations
+    def _get_block_children(self):
+        """
+        Returns a map of each block's usage key to the list of usage
+        keys of its children, from which the structure's relations can
+        be restored by _set_block_children.
+        """
+        return {
+            self._block_keys[block_id]: self._get_block_keys(self._block_relations.get_children(block_id))
+            for block_id in self._block_relations.iter_ids()
+        }
+
+    def _set_block_children(self, block_children):
+        """
+        Replaces this block structure's relations with the given map of
+        each block's usage key to the list of usage keys of its
+        children, as returned by _get_block_children.
+        """
+        children_by_id = {}
+        for block_key, children in block_children.iteritems():
+            children_by_id[self._get_or_add_block_id(block_key)] = [
+                self._get_or_add_block_id(child) for child in children
+            ]
+        self._block_relations = _BlockRelationsTable.from_children(len(self._block_keys), children_by_id)
 
     def _add_relation(self, parent_key, child_key):
         """
@@ -215,69 +470,53 @@ class BlockStructure(object):
             parent_key (UsageKey) - Usage key of the parent block.
             child_key (UsageKey) - Usage key of the child block.
         """
-        self._add_to_relations(self._block_relations, parent_key, child_key)
+        self._block_relations.add_relation(
+            self._get_or_add_block_id(parent_key),
+            self._get_or_add_block_id(child_key),
+        )
 
-    @staticmethod
-    def _add_to_relations(block_relations, parent_key, child_key):
+    def _get_or_add_block_id(self, usage_key):
         """
-        Adds a parent to child relationship in the given block
-        relations map.
-
-        Arguments:
-            block_relations (defaultdict({UsageKey: _BlockRelations})) -
-                Internal map of a block's usage key to its
-                parents/children relations.
-
-            parent_key (UsageKey) - Usage key of the parent block.
-
-            child_key (UsageKey) - Usage key of the child block.
+        Returns the id that the given usage_key is interned to,
+        interning it if it isn't yet.  Interning a usage key does not
+        add its block to the structure.
         """
-        block_relations[child_key].parents.append(parent_key)
-        block_relations[parent_key].children.append(child_key)
+        block_id = self._block_ids.get(usage_key)
+        if block_id is None:
+            block_id = len(self._block_keys)
+            self._block_keys.append(usage_key)
+            self._block_ids[usage_key] = block_id
+        return block_id
 
-    @staticmethod
-    def _add_block(block_relations, usage_key):
+    def _get_block_keys(self, block_ids):
         """
-        Adds the given usage_key to the given block_relations map.
-
-        Arguments:
-            block_relations (defaultdict({UsageKey: _BlockRelations})) -
-                Internal map of a block's usage key to its
-                parents/children relations.
-
-            usage_key (UsageKey) - Usage key of the block that is to
-                be added to the given block_relations.
+        Returns the list of usage keys that the given ids are interned
+        from.
         """
-        block_relations[usage_key] = _BlockRelations()
-
-
-class _BlockData(object):
-    """
-    Data structure to encapsulate collected data for a single block.
-    """
-    def __init__(self):
-        # Map of xblock field name to the field's value for this block.
-        # dict {string: any picklable type}
-        self.xblock_fields = {}
-
-        # Map of transformer name to the transformer's data for this
-        # block.
-        # defaultdict {string: dict}
-        self.transformer_data = defaultdict(dict)
+        block_keys = self._block_keys
+        return [block_keys[block_id] for block_id in block_ids]
 
 
 class BlockStructureBlockData(BlockStructure):
     """
     Subclass of BlockStructure that is responsible for managing block
     and transformer data.
+
+    Block data is stored in columns: lists indexed by block id, holding
+    _MISSING for blocks without a value.
     """
     def __init__(self, root_block_usage_key):
         super(BlockStructureBlockData, self).__init__(root_block_usage_key)
 
-        # Map of a block's usage key to its collected data, including
-        # its xBlock fields and block-specific transformer data.
-        # defaultdict {UsageKey: _BlockData}
-        self._block_data_map = defaultdict(_BlockData)
+        # Map of an xBlock field name to the column of the field's
+        # values.
+        # dict {string: list}
+        self._xblock_field_columns = {}
+
+        # Map of a transformer's name to a map of each of its block
+        # data keys to the column of the key's values.
+        # defaultdict {string: dict {string: list}}
+        self._transformer_block_columns = defaultdict(dict)
 
         # Map of a transformer's name to its non-block-specific data.
         # defaultdict {string: dict}
@@ -299,8 +538,10 @@ class BlockStructureBlockData(BlockStructure):
             default (any type) - The value to return if a field value is
                 not found.
         """
-        block_data = self._block_data_map.get(usage_key)
-        return block_data.xblock_fields.get(field_name, default) if block_data else default
+        column = self._xblock_field_columns.get(field_name)
+        if column is None:
+            return default
+        return self._get_column_value(column, self._block_ids.get(usage_key), default)
 
     def get_transformer_data(self, transformer, key, default=None):
         """
@@ -351,8 +592,10 @@ class BlockStructureBlockData(BlockStructure):
             default (any type) - The value to return if a dictionary
                 entry is not found.
         """
-        transformer_data = self.get_transformer_block_data(usage_key, transformer)
-        return transformer_data.get(key, default)
+        column = self._transformer_block_columns.get(transformer.name(), {}).get(key)
+        if column is None:
+            return default
+        return self._get_column_value(column, self._block_ids.get(usage_key), default)
 
     def set_transformer_block_field(self, usage_key, transformer, key, value):
         """
@@ -372,7 +615,8 @@ class BlockStructureBlockData(BlockStructure):
                 given key for the given transformer's data for the
                 requested block.
         """
-        self._block_data_map[usage_key].transformer_data[transformer.name()][key] = value
+        column = self._transformer_block_columns[transformer.name()].setdefault(key, [])
+        self._set_column_value(column, self._get_or_add_block_id(usage_key), value)
 
     def get_transformer_block_data(self, usage_key, transformer):
         """
@@ -390,12 +634,13 @@ class BlockStructureBlockData(BlockStructure):
             key (string) - A dictionary key to the transformer's data
                 that is requested.
         """
-        default = {}
-        block_data = self._block_data_map.get(usage_key)
-        if not block_data:
-            return default
-        else:
-            return block_data.transformer_data.get(transformer.name(), default)
+        block_id = self._block_ids.get(usage_key)
+        transformer_data = {}
+        for key, column in self._transformer_block_columns.get(transformer.name(), {}).iteritems():
+            value = self._get_column_value(column, block_id, _MISSING)
+            if value is not _MISSING:
+                transformer_data[key] = value
+        return transformer_data
 
     def remove_transformer_block_field(self, usage_key, transformer, key):
         """
@@ -409,8 +654,10 @@ class BlockStructureBlockData(BlockStructure):
             transformer (BlockStructureTransformer) - The transformer
                 whose data entry is to be deleted.
         """
-        transformer_block_data = self.get_transformer_block_data(usage_key, transformer)
-        transformer_block_data.pop(key, None)
+        column = self._transformer_block_columns.get(transformer.name(), {}).get(key)
+        block_id = self._block_ids.get(usage_key)
+        if column is not None and block_id is not None and block_id < len(column):
+            column[block_id] = _MISSING
 
     def remove_block(self, usage_key, keep_descendants):
         """
@@ -432,26 +679,19 @@ class BlockStructureBlockData(BlockStructure):
                 removed block's children become children of the
                 removed block's parents.
         """
-        children = self._block_relations[usage_key].children
-        parents = self._block_relations[usage_key].parents
-
-        # Remove block from its children.
-        for child in children:
-            self._block_relations[child].parents.remove(usage_key)
-
-        # Remove block from its parents.
-        for parent in parents:
-            self._block_relations[parent].children.remove(usage_key)
+        block_id = self._block_ids.get(usage_key)
+        if block_id is None:
+            return
 
-        # Remove block.
-        self._block_relations.pop(usage_key, None)
-        self._block_data_map.pop(usage_key, None)
+        # Remove block and its data.
+        relations = self._block_relations.remove_block(block_id)
+        self._remove_block_data([block_id])
 
         # Recreate the graph connections if descendants are to be kept.
         if keep_descendants:
-            for child in children:
-                for parent in parents:
-                    self._add_relation(parent, child)
+            for child_id in relations.children:
+                for parent_id in relations.parents:
+                    self._block_relations.add_relation(parent_id, child_id)
 
     def remove_block_if(self, removal_condition, keep_descendants=False, **kwargs):
         """
@@ -488,18 +728,53 @@ class BlockStructureBlockData(BlockStructure):
         for _ in self.topological_traversal(filter_func=filter_func, **kwargs):
             pass
 
-    def get_block_keys(self):
+    #--- Internal methods ---#
+    # To be used within the block_cache framework or by tests.
+
+    def _set_block_children(self, block_children):
         """
-        Returns the block keys in the block structure.
+        Replaces this block structure's relations as described in
+        BlockStructure._set_block_children, and removes the data of
+        any blocks that are no longer in the structure.
+        """
+        super(BlockStructureBlockData, self)._set_block_children(block_children)
+        self._remove_block_data([
+            block_id for block_id in xrange(len(self._block_keys))
+            if not self._block_relations.has(block_id)
+        ])
 
-        Returns:
-            iterator(UsageKey) - An iterator of the usage
-            keys of all the blocks in the block structure.
+    def _remove_block_data(self, block_ids):
+        """
+        Removes all the data of the blocks with the given ids.
         """
-        return self._block_relations.iterkeys()
+        columns = self._xblock_field_columns.values()
+        for transformer_columns in self._transformer_block_columns.itervalues():
+            columns.extend(transformer_columns.itervalues())
+        for column in columns:
+            for block_id in block_ids:
+                if block_id < len(column):
+                    column[block_id] = _MISSING
 
-    #--- Internal methods ---#
-    # To be used within the block_cache framework or by tests.
+    @staticmethod
+    def _get_column_value(column, block_id, default):
+        """
+        Returns the value in the given column for the block with the
+        given id; returns default if there is none.
+        """
+        if block_id is None or block_id >= len(column):
+            return default
+        value = column[block_id]
+        return default if value is _MISSING else value
+
+    @staticmethod
+    def _set_column_value(column, block_id, value):
+        """
+        Sets the value in the given column for the block with the given
+        id, extending the column if needed.
+        """
+        if block_id >= len(column):
+            column.extend([_MISSING] * (block_id + 1 - len(column)))
+        column[block_id] = value
 
     def _get_transformer_data_version(self, transformer):
         """
@@ -619,4 +894,5 @@ class BlockStructureModulestoreData(BlockStructureBlockData):
                 being collected and stored.
         """
         if hasattr(xblock, field_name):
-            self._block_data_map[usage_key].xblock_fields[field_name] = getattr(xblock, field_name)
+            column = self._xblock_field_columns.setdefault(field_name, [])
+            self._set_column_value(column, self._get_or_add_block_id(usage_key), getattr(xblock, field_name))
@@ -70,9 +70,10 @@ class BlockStructureFactory(object):
         Store a compressed and pickled serialization of the given
         block structure into the given cache.
 
-        The key in the cache is 'root.key.<root_block_usage_key>'.
+        The key in the cache is 'root.key.v2.<root_block_usage_key>'.
         The data stored in the cache includes the structure's
-        block relations, transformer data, and block data.
+        interned block keys, block relations, transformer data, and
+        block data columns.
 
         Arguments:
             block_structure (BlockStructure) - The block structure
@@ -83,9 +84,11 @@ class BlockStructureFactory(object):
                 is to be serialized.
         """
         data_to_cache = (
+            block_structure._block_keys,
             block_structure._block_relations,
             block_structure._transformer_data,
-            block_structure._block_data_map
+            block_structure._xblock_field_columns,
+            block_structure._transformer_block_columns,
         )
         zp_data_to_cache = zpickle(data_to_cache)
         cache.set(
@@ -145,11 +148,16 @@ class BlockStructureFactory(object):
             )
 
         # Deserialize and construct the block structure.
-        block_relations, transformer_data, block_data_map = zunpickle(zp_data_from_cache)
+        (
+            block_keys, block_relations, transformer_data, xblock_field_columns, transformer_block_columns,
+        ) = zunpickle(zp_data_from_cache)
         block_structure = BlockStructureBlockData(root_block_usage_key)
+        block_structure._block_keys = block_keys
+        block_structure._block_ids = {block_key: block_id for block_id, block_key in enumerate(block_keys)}
         block_structure._block_relations = block_relations
         block_structure._transformer_data = transformer_data
-        block_structure._block_data_map = block_data_map
+        block_structure._xblock_field_columns = xblock_field_columns
+        block_structure._transformer_block_columns = transformer_block_columns
 
         # Verify that the cached data for all the given transformers are
         # for their latest versions.
@@ -194,4 +202,4 @@ class BlockStructureFactory(object):
         Returns the cache key to use for storing the block structure
         for the given root_block_usage_key.
         """
-        return "root.key." + unicode(root_block_usage_key)
+        return "root.key.v2." + unicode(root_block_usage_key)
@@ -4,6 +4,7 @@ Tests for block_structure.py
 # pylint: disable=protected-access
 from collections import namedtuple
 from copy import deepcopy
+import cPickle as pickle
 import ddt
 import itertools
 from unittest import TestCase
@@ -42,6 +43,26 @@ class TestBlockStructure(TestCase, ChildrenMapTestMixin):
             self.assertTrue(block_structure.has_block(node))
         self.assertFalse(block_structure.has_block(len(children_map) + 1))
 
+    @ddt.data(
+        ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+        ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+        ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+    )
+    def test_pickled_relations(self, children_map):
+        block_structure = self.create_block_structure(BlockStructure, children_map)
+        block_structure._block_relations = pickle.loads(pickle.dumps(block_structure._block_relations))
+        self.assert_block_structure(block_structure, children_map)
+
+        # modify the relations after unpickling them
+        block_structure._add_relation(0, len(children_map))
+        modified_children_map = deepcopy(children_map)
+        modified_children_map[0].append(len(children_map))
+        modified_children_map.append([])
+        self.assert_block_structure(block_structure, modified_children_map)
+
+        block_structure._block_relations = pickle.loads(pickle.dumps(block_structure._block_relations))
+        self.assert_block_structure(block_structure, modified_children_map)
+
 
 @ddt.ddt
 class TestBlockStructureData(TestCase, ChildrenMapTestMixin):
@@ -216,3 +237,25 @@ class TestBlockStructureData(TestCase, ChildrenMapTestMixin):
         block_structure = self.create_block_structure(BlockStructureBlockData, ChildrenMapTestMixin.LINEAR_CHILDREN_MAP)
         block_structure.remove_block_if(lambda block: block == 2)
         self.assert_block_structure(block_structure, [[1], [], [], []], missing_blocks=[2])
+
+    def test_set_block_children(self):
+        block_structure = self.create_block_structure(BlockStructureBlockData, ChildrenMapTestMixin.DAG_CHILDREN_MAP)
+        block_structure.remove_block_if(lambda block: block == 2)
+        block_structure._prune_unreachable()
+        block_children = block_structure._get_block_children()
+
+        restored_structure = self.create_block_structure(BlockStructureBlockData, ChildrenMapTestMixin.DAG_CHILDREN_MAP)
+        transformer = MockTransformer()
+        for block in range(len(ChildrenMapTestMixin.DAG_CHILDREN_MAP)):
+            restored_structure.set_transformer_block_field(block, transformer, 'key', block)
+        restored_structure._set_block_children(block_children)
+
+        self.assertSetEqual(set(restored_structure.get_block_keys()), set(block_structure.get_block_keys()))
+        for block in block_structure.get_block_keys():
+            self.assertEqual(restored_structure.get_children(block), block_structure.get_children(block))
+            self.assertSetEqual(set(restored_structure.get_parents(block)), set(block_structure.get_parents(block)))
+        for block in range(len(ChildrenMapTestMixin.DAG_CHILDREN_MAP)):
+            self.assertEqual(
+                restored_structure.get_transformer_block_field(block, transformer, 'key'),
+                block if block_structure.has_block(block) else None,
+            )